@@ -0,0 +1,324 @@
+"""
+Micro-benchmarks of the GreenPulse hot paths, run offline against the
+stand-ins in standins.py.
+
+    python benchmarks/bench.py --output bench.json
+    python benchmarks/bench.py --compare bench.json --threshold 0.15
+
+--compare exits with status 1 if any benchmark's median got slower than
+the baseline by more than the threshold (a fraction, 0.15 = 15%).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import types
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BENCH_DIR, "../src"))
+
+from standins import SQLiteDatabase, OWMStubServer, MQTTMessage, forecast_payload
+
+BENCHMARKS = []
+
+
+def benchmark(name, repeat=20, warmup=2):
+    """Register fn(ctx) -> items processed per run (for the throughput figure)."""
+    def register(fn):
+        BENCHMARKS.append((name, fn, repeat, warmup))
+        return fn
+    return register
+
+
+class Context:
+    """The app modules wired to the stand-ins; shared by all benchmarks."""
+
+    def __init__(self, history_days):
+        self.db = SQLiteDatabase()
+        self.rows = self.db.seed(history_days)
+        sys.modules["database"] = types.ModuleType("database")
+        sys.modules["database"].db = self.db
+
+        import httpx
+        import calculation
+        import ingest
+        import mqtt_client
+        import weather
+        from web import app as web_app
+        self.httpx = httpx
+        self.calculation = calculation
+        self.ingest = ingest
+        self.mqtt_client = mqtt_client
+        self.weather = weather
+        self.web_app = web_app
+
+        self.owm = OWMStubServer().__enter__()
+        weather.weather_service.BASE_URL = self.owm.base_url
+
+    def close(self):
+        self.owm.__exit__(None, None, None)
+
+    def get(self, *paths):
+        async def scenario():
+            transport = self.httpx.ASGITransport(app=self.web_app.app)
+            async with self.httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                return [await client.get(path) for path in paths]
+        responses = asyncio.run(scenario())
+        for response in responses:
+            response.raise_for_status()
+        return responses
+
+
+# --- Calculation -------------------------------------------------------------
+
+def _samples(n):
+    import numpy as np
+    rng = np.random.default_rng(3)
+    return (rng.uniform(0, 30, n), rng.uniform(0, 38, n), rng.uniform(20, 95, n), rng.uniform(0, 12, n),
+            rng.choice([0.0, 0.0, 0.4, 2.0], n), rng.choice([0.0, 3.0, 8.0], n), rng.choice([0.5, 1.0, 2.0], n))
+
+
+@benchmark("calculate_needs.scalar_1k")
+def bench_calculate_scalar(ctx):
+    import logging
+    engine = ctx.calculation.CalculationEngine()
+    deficit, temp, humidity, wind, rain, forecast, hours = (column.tolist() for column in _samples(1000))
+    logging.disable(logging.INFO)
+    try:
+        for i in range(1000):
+            engine.calculate_needs(deficit[i], {"temperature": temp[i], "humidity": humidity[i], "wind_speed": wind[i],
+                                                "rain_amount": rain[i]},
+                                   {"total_rain_next_24h": forecast[i]}, hours[i])
+    finally:
+        logging.disable(logging.NOTSET)
+    return 1000
+
+
+@benchmark("calculate_needs.batch_100k")
+def bench_calculate_batch(ctx):
+    engine = ctx.calculation.CalculationEngine()
+    engine.calculate_needs_batch(*_samples(100_000))
+    return 100_000
+
+
+# --- OWM ---------------------------------------------------------------------
+
+FORECAST = forecast_payload()
+
+
+@benchmark("get_forecast.parse", repeat=50)
+def bench_parse_forecast(ctx):
+    service = ctx.weather.weather_service
+    for _ in range(1000):
+        service._parse_forecast(FORECAST)
+    return 1000
+
+
+@benchmark("get_forecast.http_stub")
+def bench_get_forecast(ctx):
+    service = ctx.weather.weather_service
+    service.cache_ttl["forecast"] = 0
+    for _ in range(20):
+        if service.get_forecast(allow_stale=False) is None:
+            raise RuntimeError("forecast request to the OWM stub failed")
+    return 20
+
+
+# --- Web ---------------------------------------------------------------------
+
+def _chart(ctx, days):
+    to_date = datetime.now().strftime("%Y-%m-%d")
+    from_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    ctx.web_app.chart_cache.invalidate()
+    response, = ctx.get(f"/api/chart-data?from_date={from_date}&to_date={to_date}")
+    return len(response.content)
+
+
+@benchmark("chart_data.30d")
+def bench_chart_30d(ctx):
+    _chart(ctx, 30)
+    return 1
+
+
+@benchmark("chart_data.1y", repeat=10)
+def bench_chart_1y(ctx):
+    _chart(ctx, 365)
+    return 1
+
+
+@benchmark("chart_data.5y", repeat=5, warmup=1)
+def bench_chart_5y(ctx):
+    _chart(ctx, 5 * 365)
+    return 1
+
+
+@benchmark("chart_data.5y_cached")
+def bench_chart_5y_cached(ctx):
+    to_date = datetime.now().strftime("%Y-%m-%d")
+    from_date = (datetime.now() - timedelta(days=5 * 365)).strftime("%Y-%m-%d")
+    ctx.get(*[f"/api/chart-data?from_date={from_date}&to_date={to_date}"] * 10)
+    return 10
+
+
+@benchmark("logs.page")
+def bench_logs_page(ctx):
+    ctx.get("/logs")
+    return 1
+
+
+@benchmark("logs.api_first_page")
+def bench_logs_api(ctx):
+    ctx.get("/api/logs?limit=50", "/api/logs?limit=50&important=true")
+    return 2
+
+
+@benchmark("logs.api_page_20")
+def bench_logs_api_deep(ctx):
+    cursor = ctx.deep_cursor
+    ctx.get(f"/api/logs?limit=50&cursor={cursor}")
+    return 1
+
+
+# --- MQTT ingest -------------------------------------------------------------
+
+@benchmark("on_message.ingest_5k", repeat=5, warmup=1)
+def bench_ingest(ctx):
+    """Messages through MQTTClient.on_message until the writer has stored them all."""
+    writer = ctx.ingest.FeedbackWriter(ctx.db, queue_size=10_000, batch_size=200, flush_interval=0.05)
+    ctx.ingest.feedback_writer = writer
+    client = ctx.mqtt_client.mqtt_client
+    topic = client.topic_feedback or "greenpulse/feedback"
+    run = time.time_ns()
+    messages = [MQTTMessage(topic, json.dumps({"id": f"{run}-{i}", "type": "Automatic", "amount": 4.0}).encode())
+                for i in range(5000)]
+    writer.start()
+    for message in messages:
+        client.on_message(None, None, message)
+    writer.stop()
+    if writer.stats()["written"] != 5000:
+        raise RuntimeError(f"ingest stored {writer.stats()['written']} of 5000 messages")
+    return 5000
+
+
+# --- Runner ------------------------------------------------------------------
+
+def run(selected=None, history_days=5 * 365):
+    ctx = Context(history_days)
+    results = {}
+    try:
+        # Cursor of the 20th /api/logs page for the deep-page benchmark
+        cursor = None
+        for _ in range(19):
+            cursor = ctx.get(f"/api/logs?limit=50" + (f"&cursor={cursor}" if cursor else ""))[0].json()["next_cursor"]
+        ctx.deep_cursor = cursor
+
+        for name, fn, repeat, warmup in BENCHMARKS:
+            if selected and not any(name.startswith(prefix) for prefix in selected):
+                continue
+            for _ in range(warmup):
+                fn(ctx)
+            timings = []
+            items = 1
+            for _ in range(repeat):
+                start = time.perf_counter()
+                items = fn(ctx)
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+            median = statistics.median(timings)
+            results[name] = {
+                "runs": repeat,
+                "items": items,
+                "median_ms": round(median * 1000, 3),
+                "min_ms": round(timings[0] * 1000, 3),
+                "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 3),
+                "items_per_s": round(items / median, 1) if median else None
+            }
+            print(f"{name:<30} {results[name]['median_ms']:>10.3f} ms  ({results[name]['items_per_s']} items/s)")
+    finally:
+        ctx.close()
+
+    return {"meta": _meta(history_days, ctx.rows), "results": results}
+
+
+def _meta(history_days, rows):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                                capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "history_days": history_days,
+        "seeded_log_rows": rows
+    }
+
+
+def compare(baseline, current, threshold=0.15):
+    """
+    Compare medians of two result files. Returns a list of
+    (name, baseline_ms, current_ms, ratio, status) and whether anything regressed.
+    """
+    rows = []
+    regressed = False
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            rows.append((name, None, result["median_ms"], None, "new"))
+            continue
+        ratio = result["median_ms"] / before["median_ms"] if before["median_ms"] else None
+        if ratio is None:
+            status = "ok"
+        elif ratio > 1 + threshold:
+            status = "REGRESSION"
+            regressed = True
+        elif ratio < 1 - threshold:
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append((name, before["median_ms"], result["median_ms"], ratio, status))
+    for name in baseline["results"]:
+        if name not in current["results"]:
+            rows.append((name, baseline["results"][name]["median_ms"], None, None, "missing"))
+    return rows, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GreenPulse hot path benchmarks")
+    parser.add_argument("--output", "-o", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline JSON to compare the new results against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown before failing (default 0.15)")
+    parser.add_argument("--only", action="append", help="Run benchmarks whose name starts with this (repeatable)")
+    parser.add_argument("--days", type=int, default=5 * 365, help="Days of hourly history to seed (default 5 years)")
+    args = parser.parse_args()
+
+    current = run(args.only, args.days)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if args.only:
+            baseline["results"] = {name: result for name, result in baseline["results"].items()
+                                   if any(name.startswith(prefix) for prefix in args.only)}
+        rows, regressed = compare(baseline, current, args.threshold)
+        print(f"\n{'benchmark':<30} {'baseline':>12} {'current':>12} {'ratio':>8}")
+        for name, before, after, ratio, status in rows:
+            fmt = lambda value: f"{value:.3f}" if value is not None else "-"
+            print(f"{name:<30} {fmt(before):>12} {fmt(after):>12} {fmt(ratio):>8}  {status}")
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Offline stand-ins for the services GreenPulse talks to, used by bench.py:
+an SQLite database that accepts the MariaDB statements of the hot paths,
+a local OWM HTTP server and paho-style MQTT messages.
+"""
+import json
+import random
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCHEMA = [
+    """
+    CREATE TABLE irrigation_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        zone_id TEXT NOT NULL DEFAULT 'default',
+        event_type TEXT,
+        water_amount REAL,
+        reason TEXT,
+        notes TEXT,
+        raw_data TEXT,
+        deficit REAL, et0_rate REAL, et_adjusted REAL, effective_rain REAL, current_rain REAL,
+        forecast_rain REAL, temperature REAL, humidity REAL, wind_speed REAL, interval_hours REAL
+    )
+    """,
+    """
+    CREATE TABLE weather_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        temp_max REAL, temp_min REAL, precipitation REAL, humidity REAL, wind_speed REAL, et_value REAL
+    )
+    """,
+    """
+    CREATE TABLE system_state (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        zone_id TEXT NOT NULL UNIQUE DEFAULT 'default',
+        water_deficit REAL,
+        last_calculated DATETIME DEFAULT CURRENT_TIMESTAMP,
+        pending_irrigation REAL NOT NULL DEFAULT 0,
+        watered_day DATE,
+        waterings_today INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE daily_summary (
+        day DATE NOT NULL,
+        zone_id TEXT NOT NULL,
+        et_sum REAL NOT NULL DEFAULT 0,
+        rain_sum REAL NOT NULL DEFAULT 0,
+        irrigation_total REAL NOT NULL DEFAULT 0,
+        irrigation_events INTEGER NOT NULL DEFAULT 0,
+        end_deficit REAL,
+        max_deficit REAL,
+        suggestion_count INTEGER NOT NULL DEFAULT 0,
+        last_suggestion_at DATETIME,
+        PRIMARY KEY (zone_id, day)
+    )
+    """,
+    """
+    CREATE TABLE suggestion_archive (
+        id INTEGER PRIMARY KEY,
+        timestamp DATETIME NOT NULL,
+        zone_id TEXT NOT NULL,
+        water_amount REAL,
+        deficit REAL, et0_rate REAL, et_adjusted REAL, effective_rain REAL, current_rain REAL,
+        forecast_rain REAL, temperature REAL, humidity REAL, wind_speed REAL, interval_hours REAL
+    )
+    """,
+    "CREATE INDEX idx_daily_summary_day ON daily_summary (day)",
+    "CREATE INDEX idx_suggestion_archive_zone_time ON suggestion_archive (zone_id, timestamp)",
+    "CREATE INDEX idx_suggestion_archive_time_deficit ON suggestion_archive (timestamp, deficit)",
+    "CREATE INDEX idx_irrigation_logs_event_time_deficit ON irrigation_logs (event_type, timestamp, deficit)",
+    "CREATE INDEX idx_irrigation_logs_time_id ON irrigation_logs (timestamp, id)",
+    "CREATE INDEX idx_irrigation_logs_zone_event_time ON irrigation_logs (zone_id, event_type, timestamp)",
+    "CREATE INDEX idx_weather_history_time ON weather_history (timestamp)",
+    "INSERT INTO system_state (zone_id, water_deficit) VALUES ('default', 0.0)",
+]
+
+MYSQL_FORMATS = {"%Y": "%Y", "%m": "%m", "%d": "%d", "%H": "%H", "%i": "%M", "%s": "%S"}
+INTERVAL_WEEKDAY = re.compile(r"(\w+) - INTERVAL WEEKDAY\((\w+)\) DAY")
+VALUES_FUNCTION = re.compile(r"\bVALUES\((\w+)\)")
+
+sqlite3.register_adapter(datetime, lambda value: value.strftime("%Y-%m-%d %H:%M:%S"))
+sqlite3.register_converter("DATETIME", lambda value: datetime.fromisoformat(value.decode()))
+
+
+def _date_format(value, fmt):
+    if value is None:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed.strftime(re.sub(r"%[a-zA-Z]", lambda m: MYSQL_FORMATS.get(m.group(0), m.group(0)), fmt))
+
+
+def _weekday(value):
+    return datetime.fromisoformat(value).weekday() if value else None
+
+
+def _translate(query):
+    """MariaDB statement with %s parameters -> SQLite statement with ? parameters."""
+    query = query.replace("%%", "\0").replace("%s", "?").replace("\0", "%")
+    query = INTERVAL_WEEKDAY.sub(r"DATE(\1, '-' || WEEKDAY(\2) || ' days')", query)
+    query = query.replace("ON DUPLICATE KEY UPDATE", "ON CONFLICT DO UPDATE SET")
+    query = VALUES_FUNCTION.sub(r"excluded.\1", query)
+    query = query.replace("FOR UPDATE", "")
+    return query.replace("INSERT IGNORE", "INSERT OR IGNORE")
+
+
+class SQLiteCursor:
+    def __init__(self, cursor, dictionary):
+        self.cursor = cursor
+        self.dictionary = dictionary
+
+    def execute(self, query, params=()):
+        self.cursor.execute(_translate(query), tuple(params or ()))
+
+    def executemany(self, query, rows):
+        self.cursor.executemany(_translate(query), rows)
+
+    def _row(self, row):
+        if row is None or not self.dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self.cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self.cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self.cursor.fetchall()]
+
+    def fetchmany(self, size):
+        return [self._row(row) for row in self.cursor.fetchmany(size)]
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+
+class SQLiteDatabase:
+    """In-memory stand-in for database.Database (cursor(), change listeners)."""
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        self.conn.create_function("DATE_FORMAT", 2, _date_format, deterministic=True)
+        self.conn.create_function("WEEKDAY", 1, _weekday, deterministic=True)
+        self._lock = threading.RLock()
+        self._change_listeners = []
+        for statement in SCHEMA:
+            self.conn.execute(statement)
+        self.conn.commit()
+
+    @contextmanager
+    def cursor(self, dictionary=False):
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                yield SQLiteCursor(cursor, dictionary)
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def pool_stats(self):
+        return {}
+
+    def add_change_listener(self, callback):
+        self._change_listeners.append(callback)
+
+    def notify_change(self, table, day=None):
+        day = day or datetime.now().strftime("%Y-%m-%d")
+        for callback in self._change_listeners:
+            callback(table, day)
+
+    def count(self, table, where="1 = 1"):
+        with self.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}")
+            return cursor.fetchone()[0]
+
+    def seed(self, days, seed=42):
+        """Hourly suggestions, a daily watering and a weather_history row per day, ending today."""
+        rng = random.Random(seed)
+        end = datetime.now().replace(minute=0, second=0, microsecond=0)
+        start = end - timedelta(days=days)
+        suggestions, waterings, history = [], [], []
+        deficit = 0.0
+        t = start
+        while t < end:
+            temp = 18 + 8 * rng.random()
+            rain = 2.0 if rng.random() < 0.02 else 0.0
+            deficit = max(0.0, deficit + 0.15 - rain)
+            details = {"new_deficit": round(deficit, 2), "temperature": temp, "humidity": 55, "wind_speed": 2}
+            suggestions.append((t, "suggestion", 0, "Nincs szükség öntözésre (egyensúlyban).", json.dumps(details),
+                                deficit, temp, 55.0, 2.0, rain, 0.0, 1.0))
+            if t.hour == 5:
+                waterings.append((t + timedelta(minutes=20), "watering_end", 4.0, "", "{}"))
+                deficit = max(0.0, deficit - 4.0)
+                history.append((t.replace(hour=0), temp + 4, temp - 8, rain, 55.0, 2.0))
+            t += timedelta(hours=1)
+
+        with self.cursor() as cursor:
+            cursor.executemany("""
+                INSERT INTO irrigation_logs (timestamp, event_type, water_amount, reason, raw_data,
+                    deficit, temperature, humidity, wind_speed, current_rain, forecast_rain, interval_hours)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, suggestions)
+            cursor.executemany("""
+                INSERT INTO irrigation_logs (timestamp, event_type, water_amount, notes, raw_data)
+                VALUES (%s, %s, %s, %s, %s)
+            """, waterings)
+            cursor.executemany("""
+                INSERT INTO weather_history (timestamp, temp_max, temp_min, precipitation, humidity, wind_speed)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, history)
+            # daily_summary as Database.rebuild_daily_summary would build it
+            cursor.execute("""
+                INSERT INTO daily_summary (day, zone_id, max_deficit, end_deficit, suggestion_count, last_suggestion_at,
+                                           irrigation_total, irrigation_events)
+                SELECT DATE(timestamp), zone_id,
+                       MAX(CASE WHEN event_type = 'suggestion' THEN deficit END),
+                       MAX(CASE WHEN event_type = 'suggestion' THEN deficit END),
+                       SUM(event_type = 'suggestion'),
+                       MAX(CASE WHEN event_type = 'suggestion' THEN timestamp END),
+                       COALESCE(SUM(CASE WHEN event_type <> 'suggestion' THEN water_amount END), 0),
+                       SUM(event_type <> 'suggestion')
+                FROM irrigation_logs GROUP BY DATE(timestamp), zone_id
+            """)
+        return len(suggestions) + len(waterings)
+
+
+def forecast_payload(items=40):
+    """OWM /data/2.5/forecast response with `items` 3 hour steps."""
+    start = datetime.now().replace(minute=0, second=0, microsecond=0)
+    return {
+        "cod": "200",
+        "cnt": items,
+        "list": [{
+            "dt": int((start + timedelta(hours=3 * i)).timestamp()),
+            "main": {"temp": 15 + (i % 8), "feels_like": 14, "humidity": 50 + (i % 5) * 5, "pressure": 1013},
+            "weather": [{"id": 500, "main": "Rain", "description": "enyhe eső", "icon": "10d"}],
+            "wind": {"speed": 2.5 + (i % 3), "deg": 200},
+            "rain": {"3h": 0.4 if i % 6 == 0 else 0},
+            "dt_txt": (start + timedelta(hours=3 * i)).strftime("%Y-%m-%d %H:%M:%S")
+        } for i in range(items)]
+    }
+
+
+def current_payload():
+    return {"main": {"temp": 21.5, "humidity": 55}, "wind": {"speed": 3.1}, "rain": {"1h": 0.0}}
+
+
+class _OWMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path.startswith("/data/2.5/forecast"):
+            body = self.server.forecast_body
+        elif self.path.startswith("/data/2.5/weather"):
+            body = self.server.current_body
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OWMStubServer:
+    """OpenWeatherMap stand-in on 127.0.0.1; use `base_url` as WeatherService.BASE_URL."""
+
+    def __init__(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _OWMHandler)
+        self.server.daemon_threads = True
+        self.server.forecast_body = json.dumps(forecast_payload()).encode()
+        self.server.current_body = json.dumps(current_payload()).encode()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class MQTTMessage:
+    """The attributes of paho's MQTTMessage that on_message uses."""
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+        self.qos = 1
@@ -0,0 +1,289 @@
+"""
+Replay stored weather and irrigation data through the water balance model.
+
+    python src/backtest.py --from 2025-04-01 --to 2025-10-31 \
+        --set et_correction_factor=0.8,1.0,1.2 --set soil_type=Homokos,Vályog
+
+Every combination of the --set values is simulated as one scenario; several
+scenarios run in parallel in a process pool.
+"""
+import argparse
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+from calculation import CalculationEngine
+from downsample import lttb
+
+logger = logging.getLogger("GreenPulse.Backtest")
+
+# Settings a scenario may override, with the type used to parse them
+PARAMETERS = {
+    "grass_type": str,
+    "soil_type": str,
+    "shade_percentage": float,
+    "min_watering_amount": float,
+    "max_watering_amount": float,
+    "et_correction_factor": float,
+    "force_daily_watering": lambda value: str(value).lower() in ("1", "true", "yes", "on"),
+    "force_watering_amount": float,
+}
+
+DEFAULT_MAX_POINTS = 500
+FETCH_SIZE = 5000
+
+# One replay step per element. `day` is the date ordinal (forced watering is
+# once per day); `logged_water` is what was actually watered in the range.
+ReplayInputs = namedtuple("ReplayInputs", [
+    "timestamps", "day", "temperature", "humidity", "wind_speed", "rain_amount",
+    "forecast_rain", "interval_hours", "logged_water"
+])
+
+
+def _stream(cursor, query, params):
+    cursor.execute(query, params)
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        yield from rows
+
+
+def zone_settings(zone_id=None):
+    """The config.zones entry of `zone_id` (the first zone by default), for simulate()."""
+    from config import config
+
+    zones = config.zones
+    if not zone_id:
+        return zones[0]
+    for zone in zones:
+        if zone["id"] == zone_id:
+            return zone
+    raise ValueError(f"Unknown zone: {zone_id}")
+
+
+def load_inputs(from_date, to_date, zone_id=None):
+    """
+    Build the replay steps of a zone from the database.
+
+    Hourly steps come from the inputs stored on suggestion rows, live or
+    archived. Days that
+    have no such rows (e.g. before the typed columns existed) are replayed as
+    one 24 hour step from their weather_history summary. Logged watering is
+    only reported as a total next to the simulated one.
+    """
+    from config import config
+    from database import db
+
+    zone_id = zone_id or config.zones[0]["id"]
+    from_dt = f"{from_date} 00:00:00"
+    to_dt = f"{to_date} 23:59:59"
+    steps = []
+    with db.cursor() as cursor:
+        # Older suggestions live in suggestion_archive (see retention.py)
+        for timestamp, temp, humidity, wind, current_rain, forecast_rain, hours in _stream(cursor, """
+            SELECT timestamp, temperature, humidity, wind_speed, current_rain, forecast_rain, interval_hours
+            FROM irrigation_logs
+            WHERE zone_id = %s AND event_type = 'suggestion'
+              AND timestamp BETWEEN %s AND %s AND temperature IS NOT NULL
+            UNION ALL
+            SELECT timestamp, temperature, humidity, wind_speed, current_rain, forecast_rain, interval_hours
+            FROM suggestion_archive
+            WHERE zone_id = %s AND timestamp BETWEEN %s AND %s AND temperature IS NOT NULL
+            ORDER BY timestamp
+        """, (zone_id, from_dt, to_dt, zone_id, from_dt, to_dt)):
+            hours = float(hours or 1.0)
+            rain = float(current_rain or 0)
+            # current_rain was stored already scaled to the interval
+            if hours != 1.0 and hours > 0:
+                rain = rain / hours
+            steps.append((timestamp, float(temp), float(humidity or 0), float(wind or 0), rain,
+                          float(forecast_rain or 0), hours))
+
+        covered = {step[0].date() for step in steps}
+        for timestamp, temp_max, precipitation, humidity, wind in _stream(cursor, """
+            SELECT timestamp, temp_max, precipitation, humidity, wind_speed
+            FROM weather_history
+            WHERE timestamp BETWEEN %s AND %s
+            ORDER BY timestamp
+        """, (from_dt, to_dt)):
+            if timestamp.date() in covered:
+                continue
+            end_of_day = datetime.combine(timestamp.date(), datetime.max.time()).replace(microsecond=0)
+            steps.append((end_of_day, float(temp_max or 0), float(humidity or 0), float(wind or 0),
+                          float(precipitation or 0) / 24.0, 0.0, 24.0))
+
+        steps.sort(key=lambda step: step[0])
+        cursor.execute("""
+            SELECT COALESCE(SUM(water_amount), 0) FROM irrigation_logs
+            WHERE zone_id = %s AND event_type IN ('manual', 'watering_end')
+              AND timestamp BETWEEN %s AND %s
+        """, (zone_id, from_dt, to_dt))
+        logged_water = float(cursor.fetchone()[0])
+
+    columns = list(zip(*steps)) if steps else [[]] * 7
+    return ReplayInputs(
+        timestamps=[step[0].strftime("%Y-%m-%d %H:%M") for step in steps],
+        day=np.array([step[0].toordinal() for step in steps], dtype=np.int64),
+        temperature=np.array(columns[1], dtype=float),
+        humidity=np.array(columns[2], dtype=float),
+        wind_speed=np.array(columns[3], dtype=float),
+        rain_amount=np.array(columns[4], dtype=float),
+        forecast_rain=np.array(columns[5], dtype=float),
+        interval_hours=np.array(columns[6], dtype=float),
+        logged_water=logged_water
+    )
+
+
+def validate_params(params):
+    """Parse a scenario's overrides, raising ValueError on unknown settings."""
+    unknown = set(params) - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown parameter(s): {', '.join(sorted(unknown))}")
+    return {key: PARAMETERS[key](value) for key, value in params.items()}
+
+
+def simulate(inputs, params=None, start_deficit=0.0, max_points=DEFAULT_MAX_POINTS, zone=None):
+    """
+    Run one scenario. `zone` is the config.zones entry the inputs were loaded
+    for; `params` override its settings. The model's own suggestions are
+    assumed to be watered right after each step, so they count as irrigation
+    in the next step and as "watered today" for forced watering.
+    """
+    started = time.perf_counter()
+    params = params or {}
+    engine = CalculationEngine({**(zone or {}), **params})
+    n = len(inputs.timestamps)
+
+    # ET and effective rain do not depend on the deficit: compute them for
+    # every step at once, only the clamped balance has to run step by step.
+    terms = engine.calculate_needs_batch(0.0, inputs.temperature, inputs.humidity, inputs.wind_speed,
+                                         inputs.rain_amount, 0.0, inputs.interval_hours)
+    et = terms.et_adjusted.tolist()
+    rain = terms.effective_rain.tolist()
+    forecast = inputs.forecast_rain.tolist()
+    days = inputs.day.tolist()
+    decide = engine.decide
+
+    curve = [0.0] * n
+    deficit = float(start_deficit)
+    pending = 0.0
+    watered_day = None
+    total_water = 0.0
+    waterings = 0
+    for i in range(n):
+        deficit = max(0.0, deficit + et[i] - rain[i] - pending)
+        curve[i] = deficit
+        required, amount = decide(deficit, forecast[i], watered_day == days[i])
+        pending = 0.0
+        if required and amount > 0:
+            pending = amount
+            total_water += amount
+            waterings += 1
+            watered_day = days[i]
+
+    curve_t, curve_v = lttb(inputs.timestamps, [round(v, 2) for v in curve], max_points)
+    return {
+        "params": params,
+        "steps": n,
+        "total_water": round(total_water, 1),
+        "waterings": waterings,
+        "logged_water": round(float(inputs.logged_water), 1),
+        "final_deficit": round(deficit, 2),
+        "max_deficit": round(max(curve), 2) if curve else 0.0,
+        "curve": {"t": curve_t, "v": curve_v},
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
+
+
+_worker_inputs = None
+
+
+def _init_worker(inputs):
+    global _worker_inputs
+    _worker_inputs = inputs
+
+
+def _run_in_worker(job):
+    params, start_deficit, max_points, zone = job
+    return simulate(_worker_inputs, params, start_deficit, max_points, zone)
+
+
+def run_scenarios(inputs, scenarios, workers=None, start_deficit=0.0, max_points=DEFAULT_MAX_POINTS, zone=None):
+    """
+    Simulate every parameter set in `scenarios` on top of the `zone`
+    settings (see simulate). More than one scenario runs in a process pool;
+    the inputs are sent to each worker only once.
+    """
+    scenarios = [validate_params(params) for params in scenarios] or [{}]
+    workers = min(workers or os.cpu_count() or 1, len(scenarios))
+    if workers <= 1:
+        return [simulate(inputs, params, start_deficit, max_points, zone) for params in scenarios]
+
+    # spawn: the web server calls this from a thread, forking it is unsafe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(inputs,)) as pool:
+        return list(pool.map(_run_in_worker, [(params, start_deficit, max_points, zone) for params in scenarios]))
+
+
+def _grid_options(values):
+    return [value if isinstance(value, (list, tuple)) else [value] for value in values.values()]
+
+
+def grid_size(values):
+    """Number of combinations expand_grid(values) returns, without building them."""
+    return math.prod(len(options) for options in _grid_options(values))
+
+
+def expand_grid(values):
+    """{"soil_type": ["Homokos", "Vályog"], ...} -> list of parameter dicts, one per combination."""
+    return [dict(zip(values, combination)) for combination in itertools.product(*_grid_options(values))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay stored weather through the GreenPulse water balance model.")
+    parser.add_argument("--from", dest="from_date", default=(datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d"))
+    parser.add_argument("--to", dest="to_date", default=datetime.now().strftime("%Y-%m-%d"))
+    parser.add_argument("--zone", default=None)
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=V1,V2",
+                        help=f"Parameter values to sweep, one of: {', '.join(PARAMETERS)}")
+    parser.add_argument("--start-deficit", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-points", type=int, default=DEFAULT_MAX_POINTS)
+    parser.add_argument("--json", dest="json_path", help="Write the full results (with curves) to this file")
+    args = parser.parse_args()
+
+    grid = {}
+    for item in args.set:
+        name, _, values = item.partition("=")
+        grid[name.strip()] = [value.strip() for value in values.split(",") if value.strip()]
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    started = time.perf_counter()
+    zone = zone_settings(args.zone)
+    inputs = load_inputs(args.from_date, args.to_date, zone["id"])
+    loaded = time.perf_counter()
+    logger.info(f"Loaded {len(inputs.timestamps)} steps in {loaded - started:.2f}s")
+
+    results = run_scenarios(inputs, expand_grid(grid), args.workers, args.start_deficit, args.max_points, zone)
+    logger.info(f"Simulated {len(results)} scenario(s) in {time.perf_counter() - loaded:.2f}s")
+
+    for result in results:
+        params = ", ".join(f"{key}={value}" for key, value in result["params"].items()) or "(current settings)"
+        print(f"{params}: {result['total_water']} mm in {result['waterings']} waterings, "
+              f"max deficit {result['max_deficit']} mm, final {result['final_deficit']} mm "
+              f"({result['elapsed_ms']} ms)")
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,43 @@
 import logging
-from config import config
+import math
+from collections import namedtuple
+import numpy as np
+from config import config, DEFAULT_ZONE_ID
 
 logger = logging.getLogger("GreenPulse.Calc")
 
+# Result of CalculationEngine.calculate_needs_batch, one array element per sample.
+BatchResult = namedtuple("BatchResult", ["required", "amount", "new_deficit", "et_adjusted", "effective_rain"])
+
+
+def _round_amount(value):
+    """
+    Watering amount to 0.1 mm with halves rounded up, for a number or an
+    array. Both calculation paths use it: round() and np.round() disagree on
+    values such as 0.35 (0.3 and 0.4).
+    """
+    if isinstance(value, np.ndarray):
+        return np.floor(value * 10 + 0.5) / 10
+    # Same floating point steps as the array branch, without NumPy's per-call overhead
+    return math.floor(value * 10 + 0.5) / 10
+
 class CalculationEngine:
-    def __init__(self):
-        self.grass_type = config.get("grass_type", "Univerzális keverék")
-        self.soil_type = config.get("soil_type", "Vályog")
-        self.shade_pct = config.get("shade_percentage", 0)
-        self.min_amount = config.get("min_watering_amount", 5)
-        self.max_amount = config.get("max_watering_amount", 25)
-        self.et_correction_factor = config.get("et_correction_factor", 1.0)
-        self.force_daily = config.get("force_daily_watering", False)
-        self.force_amount = config.get("force_watering_amount", 5.0)
+    def __init__(self, zone=None):
+        """`zone` is a dict from config.zones; missing settings come from the top-level options."""
+        zone = zone or {}
+
+        def setting(key, default):
+            return zone[key] if zone.get(key) is not None else config.get(key, default)
+
+        self.zone_id = zone.get("id", DEFAULT_ZONE_ID)
+        self.grass_type = setting("grass_type", "Univerzális keverék")
+        self.soil_type = setting("soil_type", "Vályog")
+        self.shade_pct = setting("shade_percentage", 0)
+        self.min_amount = setting("min_watering_amount", 5)
+        self.max_amount = setting("max_watering_amount", 25)
+        self.et_correction_factor = setting("et_correction_factor", 1.0)
+        self.force_daily = setting("force_daily_watering", False)
+        self.force_amount = setting("force_watering_amount", 5.0)
 
     def get_soil_retention_factor(self):
         """
@@ -26,6 +51,12 @@ class CalculationEngine:
         if "humuszos" in st: return 1.1
         return 1.0
 
+    def get_crop_coefficient(self):
+        """Returns the crop coefficient (Kc) of the configured grass type."""
+        if self.grass_type == "Sportfű": return 1.1
+        if self.grass_type == "Szárazságtűrő": return 0.7
+        return 1.0
+
     def calculate_needs(self, current_deficit, current_weather, forecast, interval_hours, irrigation_amount=0, has_watered_today=False):
         """
         Calculate irrigation needs based on cumulative water balance.
@@ -49,9 +80,7 @@ class CalculationEngine:
         interval_et0 = et0 * (interval_hours / 24.0)
         
         # 2. Crop Coefficient (Kc)
-        kc = 1.0
-        if self.grass_type == "Sportfű": kc = 1.1
-        elif self.grass_type == "Szárazságtűrő": kc = 0.7
+        kc = self.get_crop_coefficient()
         
         # 3. ET Correction Factor
         et_adjusted = interval_et0 * kc * (1 - (self.shade_pct / 200)) * self.et_correction_factor
@@ -73,7 +102,7 @@ class CalculationEngine:
         deficit = new_deficit
         forecast_rain = forecast.get('total_rain_next_24h', 0)
         
-        logger.info(f"Calc: ET={et_adjusted:.2f}, Rain={effective_rain:.2f}, Irr={irrigation_amount:.2f}, Deficit: {current_deficit:.2f} -> {deficit:.2f}")
+        logger.info(f"Calc [{self.zone_id}]: ET={et_adjusted:.2f}, Rain={effective_rain:.2f}, Irr={irrigation_amount:.2f}, Deficit: {current_deficit:.2f} -> {deficit:.2f}")
         
         details = {
             "et0_rate": round(et0, 2),
@@ -103,9 +132,9 @@ class CalculationEngine:
                 weather_amount = min(deficit, self.max_amount)
             
             if weather_amount > self.force_amount:
-                return True, round(weather_amount, 1), f"Időjárás alapú öntözés (több mint a kényszerített {self.force_amount} mm).", deficit, details
+                return True, _round_amount(weather_amount), f"Időjárás alapú öntözés (több mint a kényszerített {self.force_amount} mm).", deficit, details
             else:
-                return True, round(self.force_amount, 1), "Kényszerített napi öntözés.", deficit, details
+                return True, _round_amount(self.force_amount), "Kényszerített napi öntözés.", deficit, details
 
         # Standard Logic
         if deficit > self.min_amount:
@@ -118,11 +147,70 @@ class CalculationEngine:
             if forecast_rain > 5:
                 return False, 0, f"Eső várható a következő 24 órában ({forecast_rain} mm). Vízhiány: {deficit:.2f} mm.", deficit, details
                 
-            return True, round(amount, 1), reason, deficit, details
+            return True, _round_amount(amount), reason, deficit, details
         else:
             if deficit > 0:
                 return False, 0, f"A vízhiány ({deficit:.1f} mm) nem éri el a minimumot ({self.min_amount} mm).", deficit, details
             else:
                 return False, 0, f"Nincs szükség öntözésre (egyensúlyban).", deficit, details
 
+    def calculate_needs_batch(self, current_deficit, temperature, humidity, wind_speed, rain_amount,
+                              forecast_rain, interval_hours, irrigation_amount=0.0, has_watered_today=False):
+        """
+        Vectorized calculate_needs for many independent samples at once.
+
+        Every argument is a NumPy array (or a scalar broadcast to the others),
+        one element per sample. Decisions, amounts and deficits are identical
+        to calling calculate_needs on each sample; reasons and the details
+        dict are not built. Returns a BatchResult of arrays.
+        """
+        (current_deficit, temp, humidity, wind, rain, forecast_rain, interval_hours,
+         irrigation_amount, has_watered_today) = np.broadcast_arrays(
+            *(np.asarray(value, dtype=float) for value in (
+                current_deficit, temperature, humidity, wind_speed, rain_amount,
+                forecast_rain, interval_hours, irrigation_amount)),
+            np.asarray(has_watered_today, dtype=bool))
+
+        # 1. ET0, zero at or below 10 °C and never negative
+        et0 = (0.04 * temp) - (0.01 * humidity) + (0.1 * wind)
+        et0 = np.where(temp > 10, np.maximum(et0, 0.0), 0.0)
+        interval_et0 = et0 * (interval_hours / 24.0)
+
+        # 2-3. Kc and ET correction
+        et_adjusted = interval_et0 * self.get_crop_coefficient() * (1 - (self.shade_pct / 200)) * self.et_correction_factor
+
+        # 4. Water supply
+        current_rain = np.where((interval_hours != 1.0) & (interval_hours > 0), rain * interval_hours, rain)
+        effective_rain = current_rain * self.get_soil_retention_factor()
+
+        # 5. Cumulative balance, clamped at field capacity
+        deficit = np.maximum(0.0, current_deficit + et_adjusted - effective_rain - irrigation_amount)
+
+        over_min = deficit > self.min_amount
+        weather_amount = np.where(over_min, np.minimum(deficit, self.max_amount), 0.0)
+
+        # Standard logic: water above the threshold unless rain is forecasted
+        required = over_min & ~(forecast_rain > 5)
+        amount = np.where(required, weather_amount, 0.0)
+
+        # Forced watering overrides the standard logic
+        if self.force_daily:
+            forced = ~has_watered_today
+            required = required | forced
+            amount = np.where(forced, np.where(weather_amount > self.force_amount, weather_amount, self.force_amount), amount)
+
+        return BatchResult(required, _round_amount(amount), deficit, et_adjusted, effective_rain)
+
+    def decide(self, deficit, forecast_rain, has_watered_today=False):
+        """
+        Watering decision for an already updated deficit: (required, amount).
+        Same rules as calculate_needs, without building the reason.
+        """
+        weather_amount = min(deficit, self.max_amount) if deficit > self.min_amount else 0
+        if self.force_daily and not has_watered_today:
+            return True, _round_amount(weather_amount if weather_amount > self.force_amount else self.force_amount)
+        if deficit > self.min_amount and not forecast_rain > 5:
+            return True, _round_amount(weather_amount)
+        return False, 0
+
 calculator = CalculationEngine()
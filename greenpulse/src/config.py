@@ -4,6 +4,9 @@ import logging
 
 OPTIONS_PATH = "/data/options.json"
 
+# Zone used when no `zones` option is configured (and for legacy rows)
+DEFAULT_ZONE_ID = "default"
+
 class Config:
     _instance = None
 
@@ -27,6 +30,35 @@ class Config:
     def get(self, key, default=None):
         return self.options.get(key, default)
 
+    @property
+    def zones(self):
+        """
+        Configured irrigation zones as dicts with at least `id`, `name` and
+        `mqtt_topic_command`. Settings a zone leaves out fall back to the
+        top-level options. Without a `zones` option there is a single
+        DEFAULT_ZONE_ID zone using the top-level settings and command topic.
+        """
+        command_topic = self.get("mqtt_topic_command", "greenpulse/command")
+        configured = self.get("zones") or []
+        if not configured:
+            return [{"id": DEFAULT_ZONE_ID, "name": "Alapértelmezett", "mqtt_topic_command": command_topic}]
+
+        zones = []
+        seen = set()
+        for zone in configured:
+            zone_id = str(zone.get("id", "")).strip()
+            if not zone_id or zone_id in seen:
+                logging.error(f"Skipping zone with missing or duplicate id: {zone}")
+                continue
+            seen.add(zone_id)
+            zones.append({
+                **{key: value for key, value in zone.items() if value is not None},
+                "id": zone_id,
+                "name": zone.get("name") or zone_id,
+                "mqtt_topic_command": zone.get("mqtt_topic_command") or f"{command_topic}/{zone_id}"
+            })
+        return zones
+
     # Database config (hardcoded for local container)
     @property
     def db_host(self):
@@ -48,6 +80,34 @@ class Config:
     def db_name(self):
         return "greenpulse"
 
+    @property
+    def db_pool_size(self):
+        return int(os.environ.get("GREENPULSE_DB_POOL_SIZE", 5))
+
+    @property
+    def db_pool_timeout(self):
+        return float(os.environ.get("GREENPULSE_DB_POOL_TIMEOUT", 10))
+
+    @property
+    def db_slow_query_ms(self):
+        return float(os.environ.get("GREENPULSE_DB_SLOW_QUERY_MS", 200))
+
+    @property
+    def ingest_queue_size(self):
+        return int(os.environ.get("GREENPULSE_INGEST_QUEUE_SIZE", 1000))
+
+    @property
+    def ingest_batch_size(self):
+        return int(os.environ.get("GREENPULSE_INGEST_BATCH_SIZE", 100))
+
+    @property
+    def ingest_flush_interval(self):
+        return float(os.environ.get("GREENPULSE_INGEST_FLUSH_INTERVAL", 1.0))
+
+    @property
+    def scheduler_jitter(self):
+        return float(os.environ.get("GREENPULSE_SCHEDULER_JITTER", 0))
+
     @property
     def web_port(self):
         return int(os.environ.get("GREENPULSE_WEB_PORT", 8099))
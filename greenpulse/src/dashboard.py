@@ -0,0 +1,155 @@
+import json
+import logging
+import threading
+from datetime import datetime
+from config import config
+from database import db
+
+logger = logging.getLogger("GreenPulse.Dashboard")
+
+HISTORY_SIZE = 3
+
+
+def _parse_raw_data(row):
+    if row and isinstance(row.get("raw_data"), str):
+        try:
+            row["raw_data"] = json.loads(row["raw_data"])
+        except ValueError:
+            row["raw_data"] = {}
+    return row
+
+
+class DashboardState:
+    """
+    Everything the dashboard shows, kept in memory so that rendering it
+    needs neither MariaDB nor OpenWeatherMap.
+
+    The state is loaded from the database once at startup (`rebuild`) and
+    then kept current by the writers: the scheduled calculation records
+    weather and suggestions, the feedback writer records waterings. Every
+    change builds a new snapshot dict with a higher `version` and swaps it
+    in under a lock; readers take the current one without locking and must
+    not modify it.
+    """
+
+    def __init__(self, database, history_size=HISTORY_SIZE):
+        self.db = database
+        self.history_size = history_size
+        self._lock = threading.Lock()
+        self._snapshot = {
+            "version": 0,
+            "updated_at": None,
+            "rebuilt_at": None,
+            "last_suggestion": None,
+            "last_watering": None,
+            "weather_history": [],
+            "current_weather": None,
+            "forecast_weather": None,
+            "zones": self._empty_zones()
+        }
+
+    def _empty_zones(self):
+        return [{"id": zone["id"], "name": zone["name"], "state": None, "last_suggestion": None}
+                for zone in config.zones]
+
+    def snapshot(self):
+        return self._snapshot
+
+    def _replace(self, **changes):
+        # Callers hold self._lock
+        snapshot = dict(self._snapshot, **changes)
+        snapshot["version"] = self._snapshot["version"] + 1
+        snapshot["updated_at"] = datetime.now().replace(microsecond=0)
+        self._snapshot = snapshot
+        return snapshot
+
+    def rebuild(self):
+        """Load the snapshot from the database; the lock keeps writers out until it is in place."""
+        with self._lock:
+            with self.db.cursor(dictionary=True) as cursor:
+                cursor.execute("SELECT * FROM irrigation_logs WHERE event_type='suggestion' ORDER BY timestamp DESC LIMIT 1")
+                last_suggestion = _parse_raw_data(cursor.fetchone())
+
+                cursor.execute("SELECT * FROM irrigation_logs WHERE event_type IN ('watering_end', 'manual') ORDER BY timestamp DESC LIMIT 1")
+                last_watering = cursor.fetchone()
+
+                cursor.execute("SELECT * FROM weather_history ORDER BY timestamp DESC LIMIT %s", (self.history_size,))
+                weather_history = cursor.fetchall()
+
+                cursor.execute("SELECT zone_id, water_deficit, last_calculated FROM system_state")
+                states = {row['zone_id']: row for row in cursor.fetchall()}
+                zones = []
+                for zone in self._empty_zones():
+                    cursor.execute("""
+                        SELECT water_amount, reason, timestamp FROM irrigation_logs
+                        WHERE zone_id = %s AND event_type = 'suggestion'
+                        ORDER BY timestamp DESC LIMIT 1
+                    """, (zone["id"],))
+                    zone["state"] = states.get(zone["id"])
+                    zone["last_suggestion"] = cursor.fetchone()
+                    zones.append(zone)
+
+            snapshot = self._replace(last_suggestion=last_suggestion, last_watering=last_watering,
+                                     weather_history=list(weather_history), zones=zones,
+                                     rebuilt_at=datetime.now().replace(microsecond=0))
+        logger.info(f"Dashboard state loaded from the database (version {snapshot['version']}).")
+        return snapshot
+
+    def record_weather(self, current, forecast, history=()):
+        """Weather of a scheduled run; parts that could not be fetched keep their previous value."""
+        with self._lock:
+            changes = {}
+            if current:
+                changes["current_weather"] = current
+            if forecast:
+                changes["forecast_weather"] = forecast
+            if history:
+                # Same shape as the weather_history rows loaded by rebuild()
+                rows = [dict(day, timestamp=datetime.strptime(day["date"], "%Y-%m-%d").replace(hour=12))
+                        for day in history]
+                rows.sort(key=lambda row: row["timestamp"], reverse=True)
+                known = {row["timestamp"].date() for row in rows}
+                rows += [row for row in self._snapshot["weather_history"] if row["timestamp"].date() not in known]
+                changes["weather_history"] = rows[:self.history_size]
+            if changes:
+                self._replace(**changes)
+
+    def record_suggestions(self, results, calculated_at):
+        """Stored results of a scheduled run: (zone_id, new_deficit, amount, reason, details) tuples."""
+        if not results:
+            return
+        by_zone = {zone_id: (new_deficit, amount, reason) for zone_id, new_deficit, amount, reason, _ in results}
+        with self._lock:
+            zones = []
+            for zone in self._snapshot["zones"]:
+                if zone["id"] in by_zone:
+                    new_deficit, amount, reason = by_zone[zone["id"]]
+                    zone = dict(zone,
+                                state={"zone_id": zone["id"], "water_deficit": new_deficit, "last_calculated": calculated_at},
+                                last_suggestion={"water_amount": amount, "reason": reason, "timestamp": calculated_at})
+                zones.append(zone)
+            # Like the live page, the last zone of the run is shown in the status card
+            zone_id, _, amount, reason, details = results[-1]
+            self._replace(zones=zones, last_suggestion={
+                "timestamp": calculated_at, "zone_id": zone_id, "event_type": "suggestion",
+                "water_amount": amount, "reason": reason, "raw_data": details
+            })
+
+    def record_watering(self, timestamp, zone_id, event_type, amount, notes):
+        with self._lock:
+            last = self._snapshot["last_watering"]
+            if last and last.get("timestamp") and last["timestamp"] > timestamp:
+                return
+            self._replace(last_watering={"timestamp": timestamp, "zone_id": zone_id, "event_type": event_type,
+                                         "water_amount": amount, "notes": notes})
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "version": snapshot["version"],
+            "updated_at": snapshot["updated_at"],
+            "rebuilt_at": snapshot["rebuilt_at"]
+        }
+
+
+dashboard_state = DashboardState(db)
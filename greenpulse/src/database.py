@@ -1,114 +1,791 @@
 import mysql.connector
+import json
 import logging
+import queue
+import re
+import threading
 import time
-from config import config
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+from config import config, DEFAULT_ZONE_ID
+from metrics import DB_QUERY_DURATION, count_query
+from query_log import query_log
 
 logger = logging.getLogger("GreenPulse.DB")
 
+
+_STATEMENT_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE)\s+`?(\w+)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=512)
+def statement_label(query):
+    """Low-cardinality metric label for a statement, e.g. 'SELECT irrigation_logs'."""
+    words = query.split(None, 1)
+    kind = words[0].upper() if words else "?"
+    match = _STATEMENT_TABLE.search(query)
+    return f"{kind} {match.group(1)}" if match else kind
+
+
+class TimedCursor:
+    """
+    Cursor proxy recording latency and row count of every statement it runs.
+
+    A statement is recorded when the next one starts or the cursor is
+    finished, so its duration includes fetching the rows (the cursors are
+    unbuffered) and its rowcount is final. Slow statements are kept in
+    `slow` for Database.cursor() to EXPLAIN after the block.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._pending = None
+        self.slow = []
+
+    def _run(self, method, query, params, explainable):
+        self.finish()
+        count_query()
+        start = time.perf_counter()
+        try:
+            return method(query, params)
+        finally:
+            self._pending = [query, params if explainable else None, explainable, time.perf_counter() - start]
+
+    def execute(self, query, params=None):
+        return self._run(self._cursor.execute, query, params, True)
+
+    def executemany(self, query, seq_params):
+        return self._run(self._cursor.executemany, query, seq_params, False)
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._pending:
+                self._pending[3] += time.perf_counter() - start
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, size=1):
+        return self._fetch(self._cursor.fetchmany, size)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+    def finish(self):
+        """Record the last statement run on this cursor."""
+        if self._pending is None:
+            return
+        query, params, explainable, elapsed = self._pending
+        self._pending = None
+        DB_QUERY_DURATION.labels(statement_label(query)).observe(elapsed)
+        rows = self._cursor.rowcount
+        if query_log.record(query, elapsed * 1000, rows) and explainable:
+            self.slow.append((query, params, elapsed * 1000, rows))
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time."""
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of MariaDB connections.
+
+    At most `size` connections are checked out at once; further callers wait
+    up to `checkout_timeout` seconds. Idle connections that have not been used
+    for `health_check_interval` seconds are pinged before being handed out and
+    replaced if the server dropped them.
+    """
+
+    def __init__(self, factory, size=5, checkout_timeout=10.0, health_check_interval=30.0):
+        self._factory = factory
+        self.size = size
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._created = 0
+        self._discarded = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def acquire(self):
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeout(f"No database connection available within {self.checkout_timeout}s")
+        waited = time.monotonic() - start
+
+        try:
+            conn = self._take_idle()
+            if conn is None:
+                conn = self._factory()
+                with self._lock:
+                    self._created += 1
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            if waited > self._wait_max:
+                self._wait_max = waited
+        return conn
+
+    def _take_idle(self):
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return None
+            if time.monotonic() - last_used < self.health_check_interval or self._is_healthy(conn):
+                return conn
+            logger.warning("Discarding stale pooled database connection.")
+            self._discard(conn)
+
+    def _is_healthy(self, conn):
+        try:
+            return conn.is_connected()
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            self._discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def release(self, conn, broken=False):
+        with self._lock:
+            self._in_use -= 1
+        try:
+            if broken or self._closed:
+                self._discard(conn)
+            else:
+                self._idle.put((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except mysql.connector.Error:
+            broken = not self._is_healthy(conn)
+            raise
+        finally:
+            self.release(conn, broken=broken)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "created": self._created,
+                "discarded": self._discarded,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "wait_avg_ms": round(self._wait_total / self._checkouts * 1000, 2) if self._checkouts else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 2),
+            }
+
+
+# Typed copies of the CalculationEngine details stored with every suggestion
+# row (column -> details key), so analytics never has to parse raw_data.
+SUGGESTION_DETAIL_COLUMNS = {
+    "deficit": "new_deficit",
+    "et0_rate": "et0_rate",
+    "et_adjusted": "et_adjusted",
+    "effective_rain": "effective_rain",
+    "current_rain": "current_rain",
+    "forecast_rain": "forecast_rain",
+    "temperature": "temperature",
+    "humidity": "humidity",
+    "wind_speed": "wind_speed",
+    "interval_hours": "interval_hours",
+}
+
+# Older versions stored some details under different keys
+_LEGACY_DETAIL_KEYS = {"new_deficit": "deficit", "et0_rate": "et0"}
+
+
+def _detail_backfill_sql():
+    assignments = []
+    for column, key in SUGGESTION_DETAIL_COLUMNS.items():
+        value = f"JSON_VALUE(raw_data, '$.{key}')"
+        if key in _LEGACY_DETAIL_KEYS:
+            value = f"COALESCE({value}, JSON_VALUE(raw_data, '$.{_LEGACY_DETAIL_KEYS[key]}'))"
+        assignments.append(f"{column} = {value}")
+    return f"""
+        UPDATE irrigation_logs SET {', '.join(assignments)}
+        WHERE event_type = 'suggestion' AND deficit IS NULL AND raw_data IS NOT NULL
+    """
+
+
+# Incremental daily_summary update for one suggestion row. Assignments run
+# left to right, so end_deficit still sees the previous last_suggestion_at.
+DAILY_SUMMARY_SUGGESTION_UPSERT = """
+    INSERT INTO daily_summary (day, zone_id, et_sum, rain_sum, end_deficit, max_deficit,
+                               suggestion_count, last_suggestion_at)
+    VALUES (%s, %s, %s, %s, %s, %s, 1, %s)
+    ON DUPLICATE KEY UPDATE
+        et_sum = et_sum + VALUES(et_sum),
+        rain_sum = rain_sum + VALUES(rain_sum),
+        end_deficit = IF(last_suggestion_at IS NULL OR VALUES(last_suggestion_at) >= last_suggestion_at,
+                         VALUES(end_deficit), end_deficit),
+        max_deficit = GREATEST(COALESCE(max_deficit, VALUES(max_deficit)), VALUES(max_deficit)),
+        suggestion_count = suggestion_count + 1,
+        last_suggestion_at = GREATEST(COALESCE(last_suggestion_at, VALUES(last_suggestion_at)),
+                                      VALUES(last_suggestion_at))
+"""
+
+
+def _daily_summary_rebuild_sql(ranged=False, archived=True):
+    """
+    Statements recomputing daily_summary from irrigation_logs and, with
+    `archived`, the suggestion rows moved to suggestion_archive (see
+    retention.py). With `ranged` they take the parameters built by
+    Database.rebuild_daily_summary; without, they rebuild every day.
+    """
+    log_range = "AND timestamp BETWEEN %s AND %s" if ranged else ""
+    suggestions = f"""
+        SELECT timestamp, zone_id, et_adjusted, effective_rain, deficit FROM irrigation_logs
+        WHERE event_type = 'suggestion' {log_range}
+    """
+    end_deficit = """
+        (SELECT l.deficit FROM irrigation_logs l
+         WHERE l.zone_id = daily_summary.zone_id AND l.event_type = 'suggestion'
+           AND l.timestamp = daily_summary.last_suggestion_at LIMIT 1)
+    """
+    if archived:
+        # A day can be split between the tables while an archiving run is in progress
+        suggestions += f"""
+        UNION ALL
+        SELECT timestamp, zone_id, et_adjusted, effective_rain, deficit FROM suggestion_archive
+        {'WHERE timestamp BETWEEN %s AND %s' if ranged else ''}
+        """
+        end_deficit = f"""COALESCE({end_deficit},
+        (SELECT a.deficit FROM suggestion_archive a
+         WHERE a.zone_id = daily_summary.zone_id AND a.timestamp = daily_summary.last_suggestion_at LIMIT 1))
+        """
+    return [
+        f"DELETE FROM daily_summary {'WHERE day BETWEEN %s AND %s' if ranged else ''}",
+        f"""
+        INSERT INTO daily_summary (day, zone_id, et_sum, rain_sum, max_deficit, suggestion_count, last_suggestion_at)
+        SELECT DATE(timestamp), zone_id, COALESCE(SUM(et_adjusted), 0), COALESCE(SUM(effective_rain), 0),
+               MAX(deficit), COUNT(*), MAX(timestamp)
+        FROM ({suggestions}) suggestions
+        GROUP BY DATE(timestamp), zone_id
+        """,
+        f"""
+        UPDATE daily_summary SET end_deficit = {end_deficit}
+        WHERE last_suggestion_at IS NOT NULL {'AND day BETWEEN %s AND %s' if ranged else ''}
+        """,
+        f"""
+        INSERT INTO daily_summary (day, zone_id, irrigation_total, irrigation_events)
+        SELECT DATE(timestamp), zone_id, COALESCE(SUM(water_amount), 0), COUNT(*)
+        FROM irrigation_logs
+        WHERE event_type IN ('manual', 'watering_end') {log_range}
+        GROUP BY DATE(timestamp), zone_id
+        ON DUPLICATE KEY UPDATE irrigation_total = VALUES(irrigation_total),
+                                irrigation_events = VALUES(irrigation_events)
+        """,
+    ]
+
+
+# Versioned schema migrations, applied in order by Database._migrate.
+# The applied version is recorded in schema_version. Every statement must be
+# idempotent so that a step interrupted half way can simply run again.
+MIGRATIONS = [
+    (1, "Initial schema", [
+        """
+        CREATE TABLE IF NOT EXISTS irrigation_logs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            event_type ENUM('suggestion', 'watering_start', 'watering_end', 'manual'),
+            water_amount FLOAT,
+            reason TEXT,
+            notes TEXT,
+            raw_data JSON
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS weather_history (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            temp_max FLOAT,
+            temp_min FLOAT,
+            precipitation FLOAT,
+            humidity FLOAT,
+            wind_speed FLOAT,
+            et_value FLOAT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS system_state (
+            id INT PRIMARY KEY,
+            water_deficit FLOAT,
+            last_calculated DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "INSERT IGNORE INTO system_state (id, water_deficit) VALUES (1, 0.0)",
+    ]),
+    (2, "Indexes for event and time range queries", [
+        "CREATE INDEX IF NOT EXISTS idx_irrigation_logs_event_time ON irrigation_logs (event_type, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_weather_history_time ON weather_history (timestamp)",
+    ]),
+    (3, "One weather_history row per day", [
+        # Keep the first row of days stored more than once
+        """
+        DELETE newer FROM weather_history newer
+        JOIN weather_history older
+          ON DATE(newer.timestamp) = DATE(older.timestamp) AND newer.id > older.id
+        """,
+        "ALTER TABLE weather_history ADD COLUMN IF NOT EXISTS day DATE AS (DATE(timestamp)) PERSISTENT",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_weather_history_day ON weather_history (day)",
+    ]),
+    (4, "Typed calculation columns on suggestion rows", [
+        "ALTER TABLE irrigation_logs "
+        + ", ".join(f"ADD COLUMN IF NOT EXISTS {column} FLOAT NULL" for column in SUGGESTION_DETAIL_COLUMNS),
+        _detail_backfill_sql(),
+        "CREATE INDEX IF NOT EXISTS idx_irrigation_logs_event_time_deficit ON irrigation_logs (event_type, timestamp, deficit)",
+    ]),
+    (5, "Keyset index for paging the log", [
+        "CREATE INDEX IF NOT EXISTS idx_irrigation_logs_time_id ON irrigation_logs (timestamp, id)",
+    ]),
+    (6, "Irrigation zones", [
+        # The single legacy row (id = 1) becomes the default zone
+        f"ALTER TABLE system_state ADD COLUMN IF NOT EXISTS zone_id VARCHAR(32) NOT NULL DEFAULT '{DEFAULT_ZONE_ID}'",
+        "ALTER TABLE system_state MODIFY id INT NOT NULL AUTO_INCREMENT",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_system_state_zone ON system_state (zone_id)",
+        f"ALTER TABLE irrigation_logs ADD COLUMN IF NOT EXISTS zone_id VARCHAR(32) NOT NULL DEFAULT '{DEFAULT_ZONE_ID}'",
+        "CREATE INDEX IF NOT EXISTS idx_irrigation_logs_zone_event_time ON irrigation_logs (zone_id, event_type, timestamp)",
+    ]),
+    (7, "Daily summary rollup", [
+        """
+        CREATE TABLE IF NOT EXISTS daily_summary (
+            day DATE NOT NULL,
+            zone_id VARCHAR(32) NOT NULL,
+            et_sum FLOAT NOT NULL DEFAULT 0,
+            rain_sum FLOAT NOT NULL DEFAULT 0,
+            irrigation_total FLOAT NOT NULL DEFAULT 0,
+            irrigation_events INT NOT NULL DEFAULT 0,
+            end_deficit FLOAT NULL,
+            max_deficit FLOAT NULL,
+            suggestion_count INT NOT NULL DEFAULT 0,
+            last_suggestion_at DATETIME NULL,
+            PRIMARY KEY (zone_id, day),
+            KEY idx_daily_summary_day (day)
+        )
+        """,
+        # suggestion_archive only comes with version 8
+        *_daily_summary_rebuild_sql(archived=False),
+    ]),
+    (8, "Archive for compacted suggestion rows", [
+        # Typed columns only: reason and raw_data are what makes old rows large
+        f"""
+        CREATE TABLE IF NOT EXISTS suggestion_archive (
+            id INT PRIMARY KEY,
+            timestamp DATETIME NOT NULL,
+            zone_id VARCHAR(32) NOT NULL,
+            water_amount FLOAT,
+            {', '.join(f'{column} FLOAT NULL' for column in SUGGESTION_DETAIL_COLUMNS)},
+            KEY idx_suggestion_archive_zone_time (zone_id, timestamp)
+        )
+        """,
+    ]),
+    (9, "Water balance ledger", [
+        # Irrigation not yet consumed by a scheduled run, and the waterings of `watered_day`
+        "ALTER TABLE system_state ADD COLUMN IF NOT EXISTS pending_irrigation FLOAT NOT NULL DEFAULT 0",
+        "ALTER TABLE system_state ADD COLUMN IF NOT EXISTS watered_day DATE NULL",
+        "ALTER TABLE system_state ADD COLUMN IF NOT EXISTS waterings_today INT NOT NULL DEFAULT 0",
+        """
+        UPDATE system_state s SET
+            pending_irrigation = (SELECT COALESCE(SUM(l.water_amount), 0) FROM irrigation_logs l
+                                  WHERE l.zone_id = s.zone_id AND l.event_type IN ('manual', 'watering_end')
+                                    AND l.timestamp >= s.last_calculated),
+            waterings_today = (SELECT COUNT(*) FROM irrigation_logs l
+                               WHERE l.zone_id = s.zone_id AND l.event_type IN ('manual', 'watering_end')
+                                 AND l.timestamp >= CURDATE()),
+            watered_day = CURDATE()
+        """,
+    ]),
+    (10, "Time index on suggestion_archive", [
+        # Deficit charts over archived ranges without a zone filter
+        "CREATE INDEX IF NOT EXISTS idx_suggestion_archive_time_deficit ON suggestion_archive (timestamp, deficit)",
+    ]),
+]
+
+
 class Database:
     def __init__(self):
-        self.conn = None
-        self.connect()
+        # Nothing connects at import time: the pool is created by the first
+        # successful connect(), either from the startup probe or on first use.
+        self.pool = None
+        self._change_listeners = []
+        self._connect_lock = threading.Lock()
 
     def connect(self):
-        retries = 30
-        while retries > 0:
+        """
+        One attempt to create the database, run migrations and open the
+        pool. Returns True when the pool is ready; safe to call repeatedly.
+        """
+        with self._connect_lock:
+            if self.pool is not None:
+                return True
             try:
                 # First connect without DB to create it if needed
-                self.conn = mysql.connector.connect(
+                conn = mysql.connector.connect(
                     host=config.db_host,
                     port=config.db_port,
                     user=config.db_user,
-                    password=config.db_password
+                    password=config.db_password,
+                    connection_timeout=5
+                )
+                try:
+                    self._init_db(conn)
+                finally:
+                    conn.close()
+                self.pool = ConnectionPool(
+                    self._new_connection,
+                    size=config.db_pool_size,
+                    checkout_timeout=config.db_pool_timeout
                 )
-                self._init_db()
-                return
+                return True
             except mysql.connector.Error as err:
-                logger.error(f"Database connection failed: {err}. Retrying in 2s...")
-                time.sleep(2)
-                retries -= 1
-        logger.critical("Could not connect to database after retries.")
+                logger.warning(f"Database connection failed: {err}")
+                return False
 
-    def _init_db(self):
-        cursor = self.conn.cursor()
+    def _new_connection(self):
+        return mysql.connector.connect(
+            host=config.db_host,
+            port=config.db_port,
+            user=config.db_user,
+            password=config.db_password,
+            database=config.db_name
+        )
+
+    def _init_db(self, conn):
+        cursor = conn.cursor()
         try:
             cursor.execute(f"CREATE DATABASE IF NOT EXISTS {config.db_name}")
-            self.conn.database = config.db_name
-            
-            # Table: irrigation_logs
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS irrigation_logs (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    event_type ENUM('suggestion', 'watering_start', 'watering_end', 'manual'),
-                    water_amount FLOAT,
-                    reason TEXT,
-                    notes TEXT,
-                    raw_data JSON
-                )
-            """)
-            
-            # Table: weather_history
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS weather_history (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    temp_max FLOAT,
-                    temp_min FLOAT,
-                    precipitation FLOAT,
-                    humidity FLOAT,
-                    wind_speed FLOAT,
-                    et_value FLOAT
-                )
-            """)
-            # Table: system_state
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS system_state (
-                    id INT PRIMARY KEY,
-                    water_deficit FLOAT,
-                    last_calculated DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            cursor.execute("INSERT IGNORE INTO system_state (id, water_deficit) VALUES (1, 0.0)")
-            
-            self.conn.commit()
+            conn.database = config.db_name
+            self._migrate(conn, cursor)
             logger.info("Database initialized successfully.")
         except mysql.connector.Error as err:
+            # connect() then fails and the startup probe retries; the pool is
+            # never opened on a schema that is only partly migrated
             logger.error(f"Failed to initialize database: {err}")
+            raise
         finally:
             cursor.close()
 
-    def get_connection(self):
-        if not self.conn or not self.conn.is_connected():
+    def _migrate(self, conn, cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INT PRIMARY KEY,
+                description VARCHAR(255),
+                applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # Serialize concurrent starts; DDL auto-commits, so the steps themselves
+        # are written to be safe to re-run.
+        cursor.execute("SELECT GET_LOCK('greenpulse_migrate', 60)")
+        cursor.fetchone()
+        try:
+            cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+            current = cursor.fetchone()[0]
+            for version, description, statements in MIGRATIONS:
+                if version <= current:
+                    continue
+                logger.info(f"Applying schema migration {version}: {description}")
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                    (version, description)
+                )
+                conn.commit()
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK('greenpulse_migrate')")
+            cursor.fetchone()
+
+    @contextmanager
+    def connection(self):
+        """Check a connection out of the pool for the duration of the block."""
+        if self.pool is None:
             self.connect()
-        return self.conn
+        if self.pool is None:
+            raise mysql.connector.Error("Database is not available")
+        with self.pool.connection() as conn:
+            yield conn
+
+    @contextmanager
+    def cursor(self, dictionary=False):
+        """
+        Yield a cursor on a pooled connection. The transaction is committed
+        when the block exits normally and rolled back on error.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor(dictionary=dictionary)
+            timed = TimedCursor(cursor)
+            try:
+                yield timed
+                timed.finish()
+                conn.commit()
+            except Exception:
+                timed.finish()
+                try:
+                    conn.rollback()
+                except mysql.connector.Error:
+                    pass
+                raise
+            finally:
+                cursor.close()
+            if timed.slow:
+                self._explain_slow(conn, timed.slow)
+
+    def _explain_slow(self, conn, statements):
+        """Log slow statements with their EXPLAIN plan, on the connection that ran them."""
+        try:
+            for query, params, duration_ms, rows in statements:
+                plan = None
+                try:
+                    cursor = conn.cursor(dictionary=True)
+                    try:
+                        cursor.execute("EXPLAIN " + query, params)
+                        plan = [{column: value.decode() if isinstance(value, (bytes, bytearray)) else value
+                                 for column, value in row.items()} for row in cursor.fetchall()]
+                    finally:
+                        cursor.close()
+                except mysql.connector.Error as e:
+                    logger.error(f"EXPLAIN of slow query failed: {e}")
+                query_log.record_plan(query, duration_ms, rows, plan)
+        finally:
+            # The EXPLAINs run after the commit and open a new transaction.
+            # Ending it here keeps the pooled connection from holding metadata
+            # locks on the explained tables until its next user commits.
+            try:
+                conn.rollback()
+            except mysql.connector.Error as e:
+                logger.error(f"Rollback after EXPLAIN failed: {e}")
+
+    def pool_stats(self):
+        if self.pool is None:
+            return {}
+        return self.pool.stats()
 
     def close(self):
-        if self.conn and self.conn.is_connected():
-            self.conn.close()
+        if self.pool:
+            self.pool.close()
+
+    def add_change_listener(self, callback):
+        """Register callback(table, day) to be called after data is written."""
+        self._change_listeners.append(callback)
+
+    def notify_change(self, table, day=None):
+        day = day or datetime.now().strftime("%Y-%m-%d")
+        for callback in self._change_listeners:
+            try:
+                callback(table, day)
+            except Exception as e:
+                logger.error(f"Change listener failed for {table}: {e}")
+
+    def calculate_zones(self, zone_ids, calculated_at, evaluate):
+        """
+        One scheduled run in a single transaction. The zones' system_state
+        rows are read with SELECT ... FOR UPDATE, so the feedback writer
+        cannot add irrigation between reading and consuming it. `evaluate`
+        is called with {zone_id: {"water_deficit", "last_calculated",
+        "irrigation_amount", "has_watered_today"}} and returns a list of
+        (zone_id, new_deficit, amount, reason, details), which is stored,
+        resetting the consumed pending irrigation. Returns that list.
+
+        Lock order: system_state rows first, daily_summary rows after them.
+        Every transaction writing both (here and FeedbackWriter._flush) must
+        keep it, or two of them can deadlock.
+        """
+        with self.cursor(dictionary=True) as cursor:
+            rows = self._lock_zone_states(cursor, zone_ids)
+            missing = [zone_id for zone_id in zone_ids if zone_id not in rows]
+            if missing:
+                # First run of a new zone
+                cursor.executemany("INSERT IGNORE INTO system_state (zone_id, water_deficit) VALUES (%s, 0.0)",
+                                   [(zone_id,) for zone_id in missing])
+                rows.update(self._lock_zone_states(cursor, missing))
+
+            today = calculated_at.date()
+            states = {zone_id: {
+                "water_deficit": float(row['water_deficit'] or 0),
+                "last_calculated": row['last_calculated'],
+                "irrigation_amount": float(row['pending_irrigation'] or 0),
+                "has_watered_today": row['watered_day'] == today and (row['waterings_today'] or 0) > 0
+            } for zone_id, row in rows.items()}
+
+            results = evaluate(states)
+            if results:
+                self._store_zone_results(cursor, results, calculated_at)
+        if results:
+            self.notify_change("irrigation_logs", calculated_at.strftime("%Y-%m-%d"))
+        return results
 
-    def get_water_deficit(self):
-        cursor = self.get_connection().cursor()
+    def _lock_zone_states(self, cursor, zone_ids):
+        placeholders = ", ".join(["%s"] * len(zone_ids))
+        cursor.execute(f"""
+            SELECT zone_id, water_deficit, last_calculated, pending_irrigation, watered_day, waterings_today
+            FROM system_state WHERE zone_id IN ({placeholders})
+            FOR UPDATE
+        """, tuple(zone_ids))
+        return {row['zone_id']: row for row in cursor.fetchall()}
+
+    def _store_zone_results(self, cursor, results, calculated_at):
+        columns = ", ".join(SUGGESTION_DETAIL_COLUMNS)
+        placeholders = ", ".join(["%s"] * len(SUGGESTION_DETAIL_COLUMNS))
+        cursor.executemany("""
+            UPDATE system_state SET water_deficit = %s, last_calculated = %s, pending_irrigation = 0
+            WHERE zone_id = %s
+        """, [(float(new_deficit), calculated_at, zone_id) for zone_id, new_deficit, _, _, _ in results])
+        cursor.executemany(f"""
+            INSERT INTO irrigation_logs (timestamp, zone_id, event_type, water_amount, reason, raw_data, {columns})
+            VALUES (%s, %s, 'suggestion', %s, %s, %s, {placeholders})
+        """, [
+            (calculated_at, zone_id, amount, reason, json.dumps(details),
+             *[details.get(key) for key in SUGGESTION_DETAIL_COLUMNS.values()])
+            for zone_id, _, amount, reason, details in results
+        ])
+        cursor.executemany(DAILY_SUMMARY_SUGGESTION_UPSERT, [
+            (calculated_at.date(), zone_id, float(details.get("et_adjusted") or 0),
+             float(details.get("effective_rain") or 0), float(new_deficit), float(new_deficit), calculated_at)
+            for zone_id, new_deficit, _, _, details in results
+        ])
+
+    def rebuild_daily_summary(self, from_date=None, to_date=None):
+        """
+        Recompute daily_summary from irrigation_logs and suggestion_archive,
+        for every day or for the days from_date..to_date ('YYYY-MM-DD', both
+        inclusive). Returns the number of summary rows in the range afterwards.
+        """
+        ranged = from_date is not None or to_date is not None
+        from_date = from_date or "1970-01-01"
+        to_date = to_date or "9999-12-31"
+        day_params = (from_date, to_date)
+        time_params = (f"{from_date} 00:00:00", f"{to_date} 23:59:59")
+        statements = _daily_summary_rebuild_sql(ranged)
+        if ranged:
+            params = [day_params, time_params * 2, day_params, time_params]
+        else:
+            params = [None] * len(statements)
+        with self.cursor() as cursor:
+            for statement, statement_params in zip(statements, params):
+                cursor.execute(statement, statement_params)
+            cursor.execute("SELECT COUNT(*) FROM daily_summary WHERE day BETWEEN %s AND %s", day_params)
+            return cursor.fetchone()[0]
+
+    def archive_suggestions(self, cutoff, limit):
+        """
+        Move up to `limit` suggestion rows older than `cutoff` to
+        suggestion_archive in one transaction. Returns (rows moved, bytes of
+        reason/raw_data that were dropped with them).
+        """
+        columns = ", ".join(["id", "timestamp", "zone_id", "water_amount", *SUGGESTION_DETAIL_COLUMNS])
+        with self.cursor() as cursor:
+            cursor.execute("""
+                SELECT id, COALESCE(LENGTH(reason), 0) + COALESCE(LENGTH(raw_data), 0), timestamp
+                FROM irrigation_logs
+                WHERE event_type = 'suggestion' AND timestamp < %s
+                ORDER BY timestamp, id
+                LIMIT %s
+            """, (cutoff, limit))
+            rows = cursor.fetchall()
+            if not rows:
+                return 0, 0
+            ids = [row[0] for row in rows]
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(f"""
+                INSERT IGNORE INTO suggestion_archive ({columns})
+                SELECT {columns} FROM irrigation_logs WHERE id IN ({placeholders})
+            """, ids)
+            cursor.execute(f"DELETE FROM irrigation_logs WHERE id IN ({placeholders})", ids)
+        # The rows are still charted from the archive, but cached chart data is dropped all the same
+        for day in sorted({row[2].strftime("%Y-%m-%d") for row in rows}):
+            self.notify_change("suggestion_archive", day)
+        return len(ids), sum(int(row[1]) for row in rows)
+
+    def table_sizes(self, *tables):
+        """{table: {data_bytes, index_bytes, free_bytes}} from information_schema (InnoDB estimates)."""
+        placeholders = ", ".join(["%s"] * len(tables))
+        with self.cursor(dictionary=True) as cursor:
+            cursor.execute(f"""
+                SELECT table_name AS name, data_length, index_length, data_free
+                FROM information_schema.TABLES
+                WHERE table_schema = DATABASE() AND table_name IN ({placeholders})
+            """, tables)
+            return {row["name"]: {
+                "data_bytes": int(row["data_length"] or 0),
+                "index_bytes": int(row["index_length"] or 0),
+                "free_bytes": int(row["data_free"] or 0)
+            } for row in cursor.fetchall()}
+
+    def analyze_tables(self, *tables):
+        with self.cursor() as cursor:
+            cursor.execute(f"ANALYZE TABLE {', '.join(tables)}")
+            cursor.fetchall()
+
+    def optimize_table(self, table):
+        """Rebuild a table online so that its free space goes back to the filesystem."""
+        with self.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {table} FORCE, ALGORITHM=INPLACE, LOCK=NONE")
+
+    def get_water_deficit(self, zone_id=DEFAULT_ZONE_ID):
         try:
-            cursor.execute("SELECT water_deficit FROM system_state WHERE id = 1")
-            result = cursor.fetchone()
+            with self.cursor() as cursor:
+                cursor.execute("SELECT water_deficit FROM system_state WHERE zone_id = %s", (zone_id,))
+                result = cursor.fetchone()
             if result:
                 return float(result[0])
             return 0.0
         except mysql.connector.Error as err:
             logger.error(f"Error fetching water deficit: {err}")
             return 0.0
-        finally:
-            cursor.close()
 
-    def update_water_deficit(self, new_deficit):
-        cursor = self.get_connection().cursor()
+    def update_water_deficit(self, new_deficit, zone_id=DEFAULT_ZONE_ID):
         try:
-            cursor.execute("UPDATE system_state SET water_deficit = %s, last_calculated = CURRENT_TIMESTAMP WHERE id = 1", (float(new_deficit),))
-            self.get_connection().commit()
+            with self.cursor() as cursor:
+                cursor.execute("UPDATE system_state SET water_deficit = %s, last_calculated = CURRENT_TIMESTAMP WHERE zone_id = %s", (float(new_deficit), zone_id))
         except mysql.connector.Error as err:
             logger.error(f"Error updating water deficit: {err}")
-        finally:
-            cursor.close()
 
 db = Database()
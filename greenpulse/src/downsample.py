@@ -0,0 +1,45 @@
+def lttb(xs, ys, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling of a line series.
+
+    Keeps the first and last point and, for every bucket in between, the
+    point that forms the largest triangle with its neighbours, so peaks and
+    dips survive while the series shrinks to `threshold` points.
+    Points are assumed to be evenly spaced; `xs` (e.g. labels) are only
+    carried along. Returns (xs, ys) as lists.
+    """
+    n = len(ys)
+    if threshold >= n or threshold < 3:
+        return list(xs), list(ys)
+
+    out_x = [xs[0]]
+    out_y = [ys[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        count = next_end - next_start
+        avg_x = sum(range(next_start, next_end)) / count
+        avg_y = sum(ys[next_start:next_end]) / count
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        ax, ay = a, ys[a]
+        best = start
+        best_area = -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - j) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+
+        out_x.append(xs[best])
+        out_y.append(ys[best])
+        a = best
+
+    out_x.append(xs[-1])
+    out_y.append(ys[-1])
+    return out_x, out_y
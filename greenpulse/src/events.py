@@ -0,0 +1,96 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import deque, namedtuple
+
+logger = logging.getLogger("GreenPulse.Events")
+
+
+class Event(namedtuple("Event", ["id", "type", "data"])):
+    def encode(self):
+        """The event in text/event-stream format (`data` is single-line JSON)."""
+        return f"id: {self.id}\nevent: {self.type}\ndata: {self.data}\n\n"
+
+
+class Subscription:
+    """One connected client: a bounded queue living on the web server's event loop."""
+
+    def __init__(self, loop, buffer_size):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=buffer_size)
+        self.dropped = 0
+
+    def _put(self, event):
+        # Runs on self.loop. A client that does not keep up loses its oldest
+        # events instead of holding back the producers.
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class EventHub:
+    """
+    In-process broadcast of dashboard updates to /api/events clients.
+
+    `publish()` may be called from any thread (scheduler jobs, the feedback
+    writer) and never blocks: the event is handed to each client's loop with
+    call_soon_threadsafe. The last `replay_size` events are kept so that a
+    reconnecting EventSource gets what it missed (Last-Event-ID).
+    """
+
+    def __init__(self, buffer_size=100, replay_size=50):
+        self.buffer_size = buffer_size
+        self._subscribers = set()
+        self._recent = deque(maxlen=replay_size)
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._published = 0
+        self._dropped = 0
+
+    def publish(self, event_type, data):
+        with self._lock:
+            event = Event(self._next_id, event_type, json.dumps(data, default=str, ensure_ascii=False))
+            self._next_id += 1
+            self._published += 1
+            self._recent.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, event)
+            except RuntimeError:
+                # The loop is closed (server shut down)
+                self.unsubscribe(subscription)
+        return event
+
+    def subscribe(self, last_event_id=None):
+        """Register a client; call from the event loop that will consume it."""
+        subscription = Subscription(asyncio.get_running_loop(), self.buffer_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+            if last_event_id is not None:
+                for event in self._recent:
+                    if event.id > last_event_id:
+                        subscription._put(event)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.discard(subscription)
+                self._dropped += subscription.dropped
+
+    def stats(self):
+        with self._lock:
+            return {
+                "clients": len(self._subscribers),
+                "published": self._published,
+                "dropped": self._dropped + sum(subscription.dropped for subscription in self._subscribers)
+            }
+
+
+event_hub = EventHub()
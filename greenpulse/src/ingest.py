@@ -0,0 +1,337 @@
+import hashlib
+import json
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+import mysql.connector
+from config import config, DEFAULT_ZONE_ID
+from database import db
+from events import event_hub
+from dashboard import dashboard_state
+
+logger = logging.getLogger("GreenPulse.Ingest")
+
+_STOP = object()
+
+# Errors caused by the rows themselves: retrying the batch cannot help, but
+# the other rows of the batch can still be stored one by one
+ROW_ERRORS = (TypeError, ValueError, mysql.connector.DataError, mysql.connector.IntegrityError,
+              mysql.connector.ProgrammingError)
+
+DAILY_IRRIGATION_UPSERT = """
+    INSERT INTO daily_summary (day, zone_id, irrigation_total, irrigation_events)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE irrigation_total = irrigation_total + VALUES(irrigation_total),
+                            irrigation_events = irrigation_events + VALUES(irrigation_events)
+"""
+
+# Water balance ledger: irrigation waiting for the next scheduled run and the
+# number of waterings on `watered_day` (a message of an earlier day does not
+# move the counter back). Assignments only read columns not yet assigned, as
+# MariaDB applies them left to right.
+IRRIGATION_LEDGER_UPSERT = """
+    INSERT INTO system_state (zone_id, water_deficit, pending_irrigation, watered_day, waterings_today)
+    VALUES (%s, 0.0, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        pending_irrigation = pending_irrigation + VALUES(pending_irrigation),
+        waterings_today = CASE WHEN watered_day = VALUES(watered_day) THEN waterings_today + VALUES(waterings_today)
+                               WHEN watered_day > VALUES(watered_day) THEN waterings_today
+                               ELSE VALUES(waterings_today) END,
+        watered_day = CASE WHEN watered_day > VALUES(watered_day) THEN watered_day ELSE VALUES(watered_day) END
+"""
+
+
+def _amount(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _notes(value):
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else str(value)
+
+
+class FeedbackWriter:
+    """
+    Stores controller feedback messages in irrigation_logs off the MQTT
+    network thread.
+
+    `submit()` only puts the raw message on a bounded queue. A single writer
+    thread drains it and inserts rows with executemany, flushing when a batch
+    is full or `flush_interval` seconds after its first message. When the
+    queue is full, `submit()` drops the message at once and counts it: the
+    feedback topics are subscribed with QoS 0, so waiting would only stall
+    the paho network thread (and its keepalive) without slowing the broker.
+    A failed write is retried up to `max_retries` times; a batch rejected
+    for its data is stored row by row instead, so only the bad messages
+    are dropped.
+
+    Redelivered messages (e.g. after a broker reconnect) are skipped by their
+    `id`/`message_id` field, or by payload hash if they have none, for
+    `dedupe_window` seconds.
+
+    The zone of a message is its `zone_id` (or `zone`) field, else the
+    sub-topic below `feedback_topic`, else `default_zone`. With `zone_ids`
+    given, a message for any other zone is counted as invalid and skipped:
+    its water would otherwise go to an orphan system_state row that no
+    configured zone reads.
+    """
+
+    def __init__(self, database, queue_size=1000, batch_size=100, flush_interval=1.0,
+                 dedupe_window=600, max_retries=3,
+                 feedback_topic=None, default_zone=DEFAULT_ZONE_ID, zone_ids=None):
+        self.db = database
+        self.feedback_topic = feedback_topic
+        self.default_zone = default_zone
+        self.zone_ids = set(zone_ids) if zone_ids is not None else None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dedupe_window = dedupe_window
+        self.max_retries = max_retries
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._seen = OrderedDict()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._counters = {
+            "received": 0,
+            "written": 0,
+            "duplicates": 0,
+            "invalid": 0,
+            "dropped": 0,
+            "failed": 0,
+            "batches": 0
+        }
+        self._flush_ms_total = 0.0
+        self._flush_ms_last = 0.0
+        self._flush_ms_max = 0.0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+        self._thread.start()
+        logger.info(f"Feedback writer started (batch {self.batch_size}, flush {self.flush_interval}s).")
+
+    def stop(self, timeout=10):
+        """Flush everything queued so far and stop the writer thread."""
+        if not self._thread:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, topic, payload):
+        """Queue one raw MQTT message. Safe to call from the paho callback."""
+        try:
+            self._queue.put_nowait((topic, payload, datetime.now()))
+        except queue.Full:
+            with self._lock:
+                self._counters["dropped"] += 1
+                dropped = self._counters["dropped"]
+            # A flood would log every message; the first and every 100th are enough
+            if dropped % 100 == 1:
+                logger.error(f"Feedback queue full ({self._queue.maxsize}), dropping message on {topic} "
+                             f"({dropped} dropped so far)")
+            return False
+        self._count("received")
+        return True
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _run(self):
+        running = True
+        while running:
+            batch = []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while item is not _STOP:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is _STOP:
+                running = False
+            if batch:
+                self._flush(batch)
+
+    def _zone_for(self, topic, payload):
+        zone_id = payload.get('zone_id') or payload.get('zone')
+        if zone_id:
+            return str(zone_id)
+        if self.feedback_topic and topic.startswith(self.feedback_topic + "/"):
+            return topic[len(self.feedback_topic) + 1:]
+        return self.default_zone
+
+    def _prepare(self, batch):
+        """
+        Parse and dedupe a batch, returning irrigation_logs rows and the
+        dedupe key of each row. The keys are only remembered once the rows
+        are stored, so a redelivery of a message that failed is written after all.
+        """
+        rows = []
+        keys = []
+        batch_keys = set()
+        now = time.monotonic()
+        while self._seen and next(iter(self._seen.values())) < now - self.dedupe_window:
+            self._seen.popitem(last=False)
+
+        for topic, raw, received_at in batch:
+            try:
+                payload = json.loads(raw.decode() if isinstance(raw, bytes) else raw)
+                if not isinstance(payload, dict):
+                    raise ValueError("payload is not an object")
+            except ValueError as e:
+                self._count("invalid")
+                logger.error(f"Invalid feedback message on {topic}: {e}")
+                continue
+
+            zone_id = self._zone_for(topic, payload)
+            if self.zone_ids is not None and zone_id not in self.zone_ids:
+                self._count("invalid")
+                logger.error(f"Feedback message on {topic} for unknown zone {zone_id[:64]!r}, skipping it "
+                             f"(configured: {', '.join(sorted(self.zone_ids))})")
+                continue
+
+            message_id = payload.get('id') or payload.get('message_id')
+            if message_id is not None:
+                key = f"{topic}|id|{message_id}"
+            else:
+                key = f"{topic}|sha1|{hashlib.sha1(raw if isinstance(raw, bytes) else raw.encode()).hexdigest()}"
+            if key in self._seen or key in batch_keys:
+                self._count("duplicates")
+                logger.debug(f"Skipping duplicate feedback message on {topic}: {payload}")
+                continue
+            keys.append(key)
+            batch_keys.add(key)
+
+            logger.debug(f"Received message on {topic}: {payload}")
+            event_type = 'manual' if payload.get('type') == 'Manual watering' else 'watering_end'
+            rows.append((received_at, zone_id, event_type, _amount(payload.get('amount')),
+                         _notes(payload.get('notes')), json.dumps(payload)))
+        return rows, keys
+
+    def _flush(self, batch):
+        start = time.monotonic()
+        rows, keys = self._prepare(batch)
+        if not rows:
+            return
+
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                self._write(rows)
+                break
+            except ROW_ERRORS as e:
+                logger.warning(f"Could not store {len(rows)} feedback messages as a batch ({e}), storing them one by one")
+                rows, keys = self._write_each(rows, keys)
+                if not rows:
+                    return
+                break
+            except Exception as e:
+                logger.error(f"Error storing {len(rows)} feedback messages (attempt {attempt}/{self.max_retries}): {e}")
+                if attempt == self.max_retries:
+                    self._count("failed", len(rows))
+                    return
+                time.sleep(min(2 ** attempt, 10))
+
+        now = time.monotonic()
+        for key in keys:
+            self._seen[key] = now
+
+        elapsed_ms = (now - start) * 1000
+        with self._lock:
+            self._counters["written"] += len(rows)
+            self._counters["batches"] += 1
+            self._flush_ms_total += elapsed_ms
+            self._flush_ms_last = elapsed_ms
+            self._flush_ms_max = max(self._flush_ms_max, elapsed_ms)
+        logger.info(f"Stored {len(rows)} feedback events in {elapsed_ms:.0f} ms")
+
+        for day in sorted({row[0].strftime("%Y-%m-%d") for row in rows}):
+            self.db.notify_change("irrigation_logs", day)
+
+        # Live dashboard: the latest stored event of each zone in the batch
+        latest = {}
+        for row in rows:
+            latest[row[1]] = row
+        for received_at, zone_id, event_type, amount, notes, _ in latest.values():
+            dashboard_state.record_watering(received_at, zone_id, event_type, amount, notes)
+            event_hub.publish("watering", {"zone_id": zone_id, "event_type": event_type, "timestamp": received_at,
+                                           "water_amount": amount, "notes": notes})
+
+    def _write(self, rows):
+        """Store rows with their ledger and daily_summary updates in one transaction."""
+        with self.db.cursor() as cursor:
+            cursor.executemany("""
+                INSERT INTO irrigation_logs (timestamp, zone_id, event_type, water_amount, notes, raw_data)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, rows)
+            daily_totals = self._daily_totals(rows)
+            # Lock order system_state -> daily_summary, as in Database.calculate_zones;
+            # the other way round the two transactions could deadlock
+            cursor.executemany(IRRIGATION_LEDGER_UPSERT, [
+                (zone_id, water, day, events) for day, zone_id, water, events in daily_totals
+            ])
+            cursor.executemany(DAILY_IRRIGATION_UPSERT, daily_totals)
+
+    def _write_each(self, rows, keys):
+        """Store rows one at a time, dropping those that fail. Returns the stored rows and their keys."""
+        stored_rows, stored_keys = [], []
+        for row, key in zip(rows, keys):
+            try:
+                self._write([row])
+            except Exception as e:
+                self._count("failed")
+                logger.error(f"Dropping feedback message for zone {row[1]} that cannot be stored: {e}")
+                continue
+            stored_rows.append(row)
+            stored_keys.append(key)
+        return stored_rows, stored_keys
+
+    def _daily_totals(self, rows):
+        """(day, zone_id, water, events) per day and zone of a batch, for daily_summary."""
+        totals = {}
+        for received_at, zone_id, _, amount, _, _ in rows:
+            key = (received_at.date(), zone_id)
+            water, events = totals.get(key, (0.0, 0))
+            totals[key] = (water + amount, events + 1)
+        return [(day, zone_id, water, events) for (day, zone_id), (water, events) in sorted(totals.items())]
+
+    def stats(self):
+        with self._lock:
+            batches = self._counters["batches"]
+            return {
+                **self._counters,
+                "queue_depth": self._queue.qsize(),
+                "queue_size": self._queue.maxsize,
+                "flush_ms_last": round(self._flush_ms_last, 1),
+                "flush_ms_avg": round(self._flush_ms_total / batches, 1) if batches else 0.0,
+                "flush_ms_max": round(self._flush_ms_max, 1)
+            }
+
+
+feedback_writer = FeedbackWriter(
+    db,
+    queue_size=config.ingest_queue_size,
+    batch_size=config.ingest_batch_size,
+    flush_interval=config.ingest_flush_interval,
+    feedback_topic=config.get("mqtt_topic_feedback"),
+    default_zone=config.zones[0]["id"],
+    zone_ids=[zone["id"] for zone in config.zones]
+)
@@ -1,12 +1,18 @@
-import time
 import logging
-import schedule
 from datetime import datetime, timedelta
 from config import config
 from database import db
 from mqtt_client import mqtt_client
 from weather import weather_service
-from calculation import calculator
+from calculation import CalculationEngine
+from ingest import feedback_writer
+from retention import suggestion_archiver
+from metrics import track_job
+from scheduler import scheduler
+from startup import startup
+from events import event_hub
+from dashboard import dashboard_state
+from polling import polling_planner
 
 # Configure logging
 log_level = config.get("log_level", "INFO").upper()
@@ -21,173 +27,159 @@ logging.basicConfig(
 )
 logger = logging.getLogger("GreenPulse.Main")
 
+@track_job("heartbeat")
 def job_heartbeat():
     logger.debug("Sending heartbeat...")
     mqtt_client.publish_heartbeat()
 
-def job_check_weather_and_calculate():
-    logger.info("Starting scheduled check...")
-    
-    # 1. Get Weather Data
-    current = weather_service.get_current_weather()
-    forecast = weather_service.get_forecast()
-    
-    # Get history (simplified: just use what we have or fetch yesterday)
-    # Ideally we store history in DB. For now, let's fetch yesterday's history from OWM if needed
-    # or rely on DB history if we had it running.
-    # Let's fetch last 3 days history from OWM for accuracy
-    history_data = []
-    for i in range(1, 4):
-        date_str = (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d")
-        day_data = weather_service.get_history(date_str)
-        if day_data:
-            history_data.append(day_data)
-            
-            # Save to DB for cache/record
-            try:
-                conn = db.get_connection()
-                cursor = conn.cursor()
-                # Check if exists
-                cursor.execute("SELECT id FROM weather_history WHERE timestamp LIKE %s", (f"{date_str}%",))
-                if not cursor.fetchone():
-                    cursor.execute("""
-                        INSERT INTO weather_history (timestamp, temp_max, temp_min, precipitation, humidity, wind_speed)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                    """, (f"{date_str} 12:00:00", day_data['temp_max'], day_data['temp_min'], 
-                          day_data['precipitation'], day_data['humidity'], day_data['wind_speed']))
-                    conn.commit()
-                cursor.close()
-            except Exception as e:
-                logger.error(f"DB Error saving history: {e}")
+@track_job("archive_suggestions")
+def job_archive_suggestions():
+    suggestion_archiver.run()
 
-    # 2. Get System State
-    current_deficit = 0.0
-    interval_min = config.get("weather_update_interval_min", 60)
-    last_calculated = datetime.now() - timedelta(minutes=interval_min)
-    try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT water_deficit, last_calculated FROM system_state WHERE id = 1")
-        result = cursor.fetchone()
-        if result:
-            current_deficit = float(result[0])
-            if result[1]:
-                last_calculated = result[1]
-        cursor.close()
-    except Exception as e:
-        logger.error(f"DB Error fetching system state: {e}")
+def evaluate_zone(zone, state, current, forecast, now, interval_min):
+    """Run the water balance of one zone. Returns (required, amount, reason, new_deficit, details)."""
+    current_deficit = state.get("water_deficit", 0.0)
+    last_calculated = state.get("last_calculated") or now - timedelta(minutes=interval_min)
 
     # Calculate interval hours
-    now = datetime.now()
     interval_hours = (now - last_calculated).total_seconds() / 3600.0
     if interval_hours <= 0 or interval_hours > 24: # Fallback or too long (e.g. first run)
         interval_hours = interval_min / 60.0
 
-    # Fetch irrigation history since last_calculated
-    irrigation_amount = 0.0
-    try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT SUM(water_amount) as total 
-            FROM irrigation_logs 
-            WHERE event_type IN ('manual', 'watering_end') 
-            AND timestamp >= %s
-        """, (last_calculated,))
-        result = cursor.fetchone()
-        if result and result[0]:
-            irrigation_amount = float(result[0])
-        cursor.close()
-    except Exception as e:
-        logger.error(f"DB Error fetching irrigation history: {e}")
+    return CalculationEngine(zone).calculate_needs(
+        current_deficit, current, forecast, interval_hours,
+        state.get("irrigation_amount", 0.0), state.get("has_watered_today", False)
+    )
+
+@track_job("check_weather_and_calculate")
+def job_check_weather_and_calculate():
+    logger.info("Starting scheduled check...")
+    
+    # 1. Get Weather Data (current, forecast and last 3 days history in parallel).
+    # History days already in weather_history are not fetched from OWM again.
+    # The same weather is used for every zone.
+    weather = weather_service.fetch_all(history_days=3)
+    current = weather.current
+    forecast = weather.forecast
+
+    # 2. Calculate every zone on its locked water balance state and store
+    # the results, all in one transaction (see Database.calculate_zones)
+    zones = config.zones
+    interval_min = config.get("weather_update_interval_min", 60)
+    now = datetime.now()
+    commands = []
+
+    def evaluate(states):
+        results = []
+        commands.clear()
+        for zone in zones:
+            try:
+                required, amount, reason, new_deficit, details = evaluate_zone(
+                    zone, states.get(zone["id"], {}), current, forecast, now, interval_min
+                )
+            except Exception as e:
+                logger.error(f"Calculation failed for zone {zone['id']}: {e}")
+                continue
+            commands.append((required, amount, reason, zone["mqtt_topic_command"]))
+            results.append((zone["id"], new_deficit, amount if required else 0, reason, details))
+        return results
+
+    dashboard_state.record_weather(current, forecast, weather.history)
+    if current or forecast:
+        event_hub.publish("weather", {"current": current, "forecast": forecast})
 
-    # Check if watered today (for forced watering logic)
-    has_watered_today = False
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        today_start = datetime.now().strftime("%Y-%m-%d 00:00:00")
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM irrigation_logs 
-            WHERE event_type IN ('manual', 'watering_end') 
-            AND timestamp >= %s
-        """, (today_start,))
-        result = cursor.fetchone()
-        if result and result[0] > 0:
-            has_watered_today = True
-        cursor.close()
+        results = db.calculate_zones([zone["id"] for zone in zones], now, evaluate)
     except Exception as e:
-        logger.error(f"DB Error checking today's watering: {e}")
+        logger.error(f"DB Error calculating zones: {e}")
+        return
+
+    # 3. Publish the commands once the new state is stored
+    for command in commands:
+        mqtt_client.publish_command(*command)
+    if config.get("adaptive_polling", False):
+        plan_next_check(results, current, forecast, now)
+    if not results:
+        return
 
-    required, amount, reason, new_deficit, details = calculator.calculate_needs(
-        current_deficit, current, forecast, interval_hours, irrigation_amount, has_watered_today
+    # 4. Update the dashboard state and open dashboards
+    dashboard_state.record_suggestions(results, now.replace(microsecond=0))
+    names = {zone["id"]: zone["name"] for zone in zones}
+    for zone_id, new_deficit, amount, reason, details in results:
+        event_hub.publish("suggestion", {
+            "zone_id": zone_id, "zone_name": names.get(zone_id), "timestamp": now.replace(microsecond=0),
+            "water_amount": amount, "reason": reason, "water_deficit": round(new_deficit, 2), "details": details
+        })
+
+def plan_next_check(results, current, forecast, now):
+    """Adaptive polling: move the next weather check closer or further depending on the last results."""
+    zones = {zone["id"]: zone for zone in config.zones}
+    minutes, reason = polling_planner.plan(
+        [(zones[zone_id], new_deficit, details) for zone_id, new_deficit, _, _, details in results if zone_id in zones],
+        current, forecast, now
     )
-    
-    # Save new deficit
+    logger.info(f"Next weather check in {minutes} min: {reason}")
+    scheduler.set_interval("check_weather_and_calculate", minutes * 60, reason)
+
+import asyncio
+import uvicorn
+from web.app import app
+
+_background_tasks = set()
+
+async def warm_up():
+    """Wait for the database, then connect MQTT, run the first calculation and schedule the jobs."""
+    await startup.wait_for("database", db.connect)
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE system_state SET water_deficit = %s, last_calculated = %s WHERE id = 1", (float(new_deficit), now))
-        conn.commit()
-        cursor.close()
+        await asyncio.get_running_loop().run_in_executor(None, dashboard_state.rebuild)
     except Exception as e:
-        logger.error(f"DB Error updating system state: {e}")
-    
-    # 3. Publish Result
-    mqtt_client.publish_command(required, amount, reason)
-    
-    # 4. Log Suggestion to DB
+        # Filled in by the first calculation and feedback messages instead
+        logger.error(f"Loading the dashboard state failed: {e}")
+    event_hub.publish("status", startup.status())
+
+    startup.begin("mqtt")
+    mqtt_client.connect()
+    scheduler.add_job("heartbeat", job_heartbeat, 60, run_immediately=True)
+
+    # Added before the first calculation so that adaptive polling can already move its next run
+    interval = config.get("weather_update_interval_min", 60)
+    scheduler.add_job("check_weather_and_calculate", job_check_weather_and_calculate, interval * 60,
+                      jitter=config.scheduler_jitter)
+    if config.get("adaptive_polling", False):
+        logger.info(f"Adaptive polling between {polling_planner.floor_min} and {polling_planner.ceiling_min} min.")
+
+    startup.begin("first_calculation")
     try:
-        import json
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO irrigation_logs (event_type, water_amount, reason, raw_data)
-            VALUES ('suggestion', %s, %s, %s)
-        """, (amount if required else 0, reason, json.dumps(details)))
-        conn.commit()
-        cursor.close()
+        await asyncio.get_running_loop().run_in_executor(None, job_check_weather_and_calculate)
     except Exception as e:
-        logger.error(f"DB Error saving suggestion: {e}")
+        logger.error(f"First calculation failed: {e}")
+    startup.complete("first_calculation")
 
-import threading
-import uvicorn
-from web.app import app
+    # Daily, small batches; the first run catches up after an update or restart
+    scheduler.add_job("archive_suggestions", job_archive_suggestions, 24 * 3600, jitter=600, run_immediately=True)
+    logger.info(f"Scheduler configured. Interval: {interval} min.")
 
-def run_scheduler():
-    logger.info("Scheduler thread started.")
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+def start_background():
+    scheduler.start()
+    task = asyncio.get_running_loop().create_task(warm_up())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
 
 def main():
     logger.info("GreenPulse starting up...")
     
-    # Initialize DB
-    db.connect()
-    
-    # Initialize MQTT
-    mqtt_client.connect()
-    
-    # Schedule jobs
-    interval = config.get("weather_update_interval_min", 60)
-    schedule.every(interval).minutes.do(job_check_weather_and_calculate)
-    schedule.every(1).minutes.do(job_heartbeat)
-    
-    # Run once immediately
-    job_heartbeat()
-    job_check_weather_and_calculate()
-    
-    logger.info(f"Scheduler configured. Interval: {interval} min.")
+    # Feedback messages are stored by a background writer
+    feedback_writer.start()
     
-    # Start scheduler in background thread
-    scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
-    scheduler_thread.start()
+    # The web server starts at once and reports "warming up" until the
+    # database is reachable; the scheduler runs inside its event loop.
+    app.add_event_handler("startup", start_background)
+    app.add_event_handler("shutdown", scheduler.stop)
     
     # Start Web Server
     logger.info(f"Starting Web Server on port {config.web_port}...")
     uvicorn.run(app, host="0.0.0.0", port=config.web_port, log_level="info")
+    feedback_writer.stop()
 
 if __name__ == "__main__":
     main()
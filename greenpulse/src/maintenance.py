@@ -0,0 +1,60 @@
+"""
+Database maintenance commands, run inside the add-on container:
+
+    python src/maintenance.py rebuild-summary [--from 2024-01-01] [--to 2024-12-31]
+    python src/maintenance.py archive-suggestions [--keep-days 90] [--optimize]
+"""
+import argparse
+import logging
+import time
+
+logger = logging.getLogger("GreenPulse.Maintenance")
+
+
+def rebuild_summary(args):
+    from database import db
+    started = time.perf_counter()
+    rows = db.rebuild_daily_summary(args.from_date, args.to_date)
+    logger.info(f"Rebuilt {rows} daily_summary rows in {time.perf_counter() - started:.1f}s")
+
+
+def archive_suggestions(args):
+    from database import db
+    from retention import suggestion_archiver
+    if args.keep_days is not None:
+        suggestion_archiver.keep_days = args.keep_days
+    # No batch limit and no pause: nothing else is waiting on this process
+    suggestion_archiver.max_batches = float("inf")
+    suggestion_archiver.pause = 0
+    report = suggestion_archiver.run()
+    logger.info(f"Archived {report['rows_archived']} rows, irrigation_logs now {report['live_bytes_after'] / 1e6:.1f} MB "
+                f"({report['live_free_bytes'] / 1e6:.1f} MB free)")
+    if args.optimize:
+        started = time.perf_counter()
+        db.optimize_table("irrigation_logs")
+        sizes = db.table_sizes("irrigation_logs")["irrigation_logs"]
+        logger.info(f"Rebuilt irrigation_logs in {time.perf_counter() - started:.1f}s: "
+                    f"{(sizes['data_bytes'] + sizes['index_bytes']) / 1e6:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GreenPulse database maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("rebuild-summary", help="Recompute daily_summary from irrigation_logs and suggestion_archive")
+    rebuild.add_argument("--from", dest="from_date", default=None, help="First day (YYYY-MM-DD), default: all")
+    rebuild.add_argument("--to", dest="to_date", default=None, help="Last day (YYYY-MM-DD), default: all")
+    rebuild.set_defaults(handler=rebuild_summary)
+
+    archive = commands.add_parser("archive-suggestions", help="Move old suggestion rows to suggestion_archive")
+    archive.add_argument("--keep-days", type=int, default=None, help="Days of suggestions to keep (default: add-on option)")
+    archive.add_argument("--optimize", action="store_true", help="Rebuild irrigation_logs afterwards to release disk space")
+    archive.set_defaults(handler=archive_suggestions)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
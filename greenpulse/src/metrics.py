@@ -0,0 +1,246 @@
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Counters and histograms are updated on the hot path, so an update is one
+dict lookup and a short lock. Values that already exist elsewhere (pool,
+cache and ingest stats) are not duplicated: collectors registered with
+`registry.add_collector` read them only when /metrics is scraped.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers sub-millisecond queries up to slow OWM calls and jobs
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def _render_child(self, values, child):
+        with child._lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = f'le="{_format_value(float(bound))}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, callback):
+        """
+        Register callback() -> iterable of (name, type, documentation, samples)
+        with samples a list of ({label: value}, number), called at scrape time.
+        """
+        self._collectors.append(callback)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for callback in self._collectors:
+            try:
+                families = list(callback())
+            except Exception as e:
+                lines.append(f"# collector {getattr(callback, '__name__', callback)} failed: {_escape(e)}")
+                continue
+            for name, metric_type, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Per-request [count] of database round trips, set by the web middleware.
+# run_io copies the context into its worker thread, so queries made there
+# are counted for the request that started them.
+request_queries = contextvars.ContextVar("greenpulse_request_queries", default=None)
+
+
+def count_query():
+    counter = request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def track_job(name):
+    """Decorator recording the duration (and failures) of a scheduled job."""
+    def wrap(func):
+        histogram = JOB_DURATION.labels(name)
+        failures = JOB_FAILURES.labels(name)
+
+        def run(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                failures.inc()
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        run.__name__ = func.__name__
+        run.__doc__ = func.__doc__
+        return run
+    return wrap
+
+
+JOB_DURATION = registry.histogram(
+    "greenpulse_job_duration_seconds", "Duration of scheduled jobs.", ["job"])
+JOB_FAILURES = registry.counter(
+    "greenpulse_job_failures_total", "Scheduled job runs that raised.", ["job"])
+OWM_REQUEST_DURATION = registry.histogram(
+    "greenpulse_owm_request_duration_seconds", "OpenWeatherMap request latency by endpoint.", ["endpoint"])
+OWM_ERRORS = registry.counter(
+    "greenpulse_owm_errors_total", "Failed OpenWeatherMap requests by endpoint.", ["endpoint"])
+DB_QUERY_DURATION = registry.histogram(
+    "greenpulse_db_query_duration_seconds", "Database statement latency by statement kind and table.", ["statement"])
+HTTP_REQUEST_DURATION = registry.histogram(
+    "greenpulse_http_request_duration_seconds", "HTTP request latency by route.", ["method", "route", "status"])
+HTTP_DB_QUERIES = registry.histogram(
+    "greenpulse_http_db_queries", "Database round trips per HTTP request.", ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21))
+MQTT_PUBLISHED = registry.counter(
+    "greenpulse_mqtt_published_total", "MQTT messages handed to the client.", ["topic"])
+MQTT_PUBLISH_FAILURES = registry.counter(
+    "greenpulse_mqtt_publish_failures_total", "MQTT publishes the client rejected.", ["topic"])
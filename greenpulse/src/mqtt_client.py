@@ -2,6 +2,8 @@ import paho.mqtt.client as mqtt
 import json
 import logging
 from config import config
+from startup import startup
+from metrics import MQTT_PUBLISHED, MQTT_PUBLISH_FAILURES
 
 logger = logging.getLogger("GreenPulse.MQTT")
 
@@ -24,55 +26,54 @@ class MQTTClient:
         self.client.on_message = self.on_message
 
     def connect(self):
+        """Start connecting in the paho network thread, which keeps retrying until the broker is up."""
         try:
-            self.client.connect(self.host, self.port, 60)
+            self.client.connect_async(self.host, self.port, 60)
             self.client.loop_start()
-            logger.info(f"Connected to MQTT broker at {self.host}:{self.port}")
+            logger.info(f"Connecting to MQTT broker at {self.host}:{self.port}")
         except Exception as e:
             logger.error(f"Failed to connect to MQTT: {e}")
 
     def on_connect(self, client, userdata, flags, rc):
         logger.info(f"MQTT Connected with result code {rc}")
-        client.subscribe(self.topic_feedback)
+        if rc == 0:
+            startup.complete("mqtt")
+        # Zones may report on their own sub-topic (<feedback>/<zone_id>)
+        client.subscribe([(self.topic_feedback, 0), (f"{self.topic_feedback}/+", 0)])
 
     def on_message(self, client, userdata, msg):
-        try:
-            payload = json.loads(msg.payload.decode())
-            logger.info(f"Received message on {msg.topic}: {payload}")
-            
-            # Log to database
-            from database import db
-            conn = db.get_connection()
-            if conn:
-                cursor = conn.cursor()
-                event_type = 'manual' if payload.get('type') == 'Manual watering' else 'watering_end'
-                amount = payload.get('amount', 0)
-                notes = payload.get('notes', '')
-                
-                cursor.execute("""
-                    INSERT INTO irrigation_logs (event_type, water_amount, notes, raw_data)
-                    VALUES (%s, %s, %s, %s)
-                """, (event_type, amount, notes, json.dumps(payload)))
-                conn.commit()
-                cursor.close()
-                
-        except Exception as e:
-            logger.error(f"Error processing message: {e}")
+        # Runs on the paho network thread: only hand the message over,
+        # parsing and the database insert happen in the feedback writer.
+        from ingest import feedback_writer
+        feedback_writer.submit(msg.topic, msg.payload)
 
-    def publish_command(self, required, amount, reason):
+    def publish_command(self, required, amount, reason, topic=None):
         payload = {
             "watering_required": required,
             "water_amount_lpm2": amount,
             "reason": reason
         }
-        self.client.publish(self.topic_command, json.dumps(payload), retain=True)
-        logger.info(f"Published command: {payload}")
+        topic = topic or self.topic_command
+        self._publish(topic, json.dumps(payload), retain=True)
+        logger.info(f"Published command to {topic}: {payload}")
 
     def publish_heartbeat(self):
         payload = {
             "status": "online",
             "timestamp": logging.Formatter('%(asctime)s').format(logging.LogRecord(None, None, None, None, None, None, None))
         }
-        self.client.publish(self.topic_heartbeat, json.dumps(payload))
+        self._publish(self.topic_heartbeat, json.dumps(payload))
+
+    def _publish(self, topic, payload, retain=False):
+        MQTT_PUBLISHED.labels(topic).inc()
+        try:
+            info = self.client.publish(topic, payload, retain=retain)
+        except Exception as e:
+            MQTT_PUBLISH_FAILURES.labels(topic).inc()
+            logger.error(f"Failed to publish to {topic}: {e}")
+            return
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            MQTT_PUBLISH_FAILURES.labels(topic).inc()
+            logger.error(f"Failed to publish to {topic}: {mqtt.error_string(info.rc)}")
 
 mqtt_client = MQTTClient()
@@ -0,0 +1,89 @@
+import logging
+from datetime import timedelta
+from calculation import CalculationEngine
+from config import config
+
+logger = logging.getLogger("GreenPulse.Polling")
+
+# Forecast rain above this holds back watering (see CalculationEngine.calculate_needs)
+RAIN_HOLD_MM = 5
+# Poll again when at most this share of the time to the threshold has passed,
+# so that an underestimated ET rate is corrected before the threshold
+SAFETY = 0.5
+
+
+class PollingPlanner:
+    """
+    Chooses the interval of the next weather check from the outcome of the
+    last one: how far each zone's deficit is from its watering threshold,
+    how fast it grows (ET of the last interval) and whether rain is falling
+    or forecast. Near a decision or with rain around it polls at the base
+    interval or the floor; on quiet days it backs off up to the ceiling.
+    """
+
+    def __init__(self, base_min, floor_min=15, ceiling_min=180):
+        self.floor_min = max(1, min(floor_min, ceiling_min))
+        self.ceiling_min = max(ceiling_min, self.floor_min)
+        self.base_min = min(max(base_min, self.floor_min), self.ceiling_min)
+
+    def plan(self, zone_results, current, forecast, now):
+        """
+        `zone_results` is a list of (zone config, new_deficit, details) of the
+        last run. Returns (interval in minutes, reason); the zone needing the
+        earliest check decides.
+        """
+        if not current or not forecast:
+            return self.base_min, "weather data missing, base interval"
+        if (current.get("rain_amount") or 0) > 0:
+            return self.floor_min, f"raining ({current['rain_amount']} mm/h), floor"
+
+        forecast_rain = forecast.get("total_rain_next_24h") or 0
+        candidates = [self._zone_interval(zone, new_deficit, details, forecast_rain, now)
+                      for zone, new_deficit, details in zone_results]
+        if not candidates:
+            return self.ceiling_min, "no zone calculated, ceiling"
+        minutes, reason = min(candidates, key=lambda candidate: candidate[0])
+        if minutes > self.ceiling_min:
+            return self.ceiling_min, f"{reason} (ceiling)"
+        if minutes < self.floor_min:
+            return self.floor_min, f"{reason} (floor)"
+        return round(minutes), reason
+
+    def _zone_interval(self, zone, deficit, details, forecast_rain, now):
+        engine = CalculationEngine(zone)
+        name = engine.zone_id
+        threshold = details.get("min_watering_amount", engine.min_amount)
+
+        if engine.force_daily:
+            # The forced suggestion of the next day is due after midnight
+            midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+            forced = ((midnight - now).total_seconds() / 60 + 1, f"{name}: forced watering due at midnight")
+        else:
+            forced = (float("inf"), "")
+
+        if deficit > threshold:
+            if abs(forecast_rain - RAIN_HOLD_MM) <= RAIN_HOLD_MM / 2:
+                return self.floor_min, (f"{name}: deficit {deficit:.1f} mm above threshold {threshold} mm, "
+                                        f"forecast rain {forecast_rain} mm close to the hold limit of {RAIN_HOLD_MM} mm")
+            return min((self.base_min, f"{name}: deficit {deficit:.1f} mm above threshold {threshold} mm, base interval"),
+                       forced)
+
+        interval_hours = details.get("interval_hours") or 0
+        et_rate = (details.get("et_adjusted") or 0) / interval_hours if interval_hours > 0 else 0
+        if forecast_rain > 0:
+            rain = (self.base_min, f"{name}: rain forecast ({forecast_rain} mm in 24 h), base interval")
+        else:
+            rain = (float("inf"), "")
+        if et_rate <= 0:
+            return min((self.ceiling_min, f"{name}: no evapotranspiration, deficit {deficit:.1f} / {threshold} mm"),
+                       rain, forced)
+
+        hours_left = (threshold - deficit) / et_rate
+        return min((hours_left * 60 * SAFETY,
+                    f"{name}: deficit {deficit:.1f} / {threshold} mm at ET {et_rate:.2f} mm/h, "
+                    f"threshold in ~{hours_left:.1f} h"),
+                   rain, forced)
+
+
+polling_planner = PollingPlanner(config.get("weather_update_interval_min", 60),
+                                 config.get("polling_floor_min", 15), config.get("polling_ceiling_min", 180))
@@ -0,0 +1,128 @@
+"""
+Per-statement timing of everything that runs through Database.cursor().
+
+Statements are grouped by fingerprint (the SQL with literals and parameter
+placeholders replaced by `?`), so the same query with different arguments
+adds up in one entry. Statements slower than the threshold are logged with
+their EXPLAIN plan; /api/debug/queries lists the entries by total time.
+"""
+import logging
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from config import config
+
+logger = logging.getLogger("GreenPulse.QueryLog")
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROW_LIST = re.compile(r"(\(\?(?:, \?)*\))(?:\s*,\s*\1)+")
+_WHITESPACE = re.compile(r"\s+")
+
+# Only these can be EXPLAINed without side effects
+EXPLAINABLE = ("SELECT", "UPDATE", "DELETE")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(query):
+    """'SELECT * FROM t WHERE id = %s AND x IN (1, 2)' -> 'SELECT * FROM t WHERE id = ? AND x IN (?+)'"""
+    text = _PLACEHOLDER.sub("?", query)
+    text = _STRING.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    text = _WHITESPACE.sub(" ", text).strip()
+    text = _ROW_LIST.sub(r"\1, ...", text)
+    return _VALUE_LIST.sub("(?+)", text)
+
+
+class QueryLog:
+    """
+    Thread-safe statement statistics. At most `max_statements` distinct
+    fingerprints are tracked; further ones only count as `untracked`. Slow
+    statements are EXPLAINed at most once per `explain_interval` seconds per
+    fingerprint, so a slow query under load does not double its own cost.
+    """
+
+    def __init__(self, slow_threshold_ms=200.0, max_statements=500, explain_interval=300.0, recent_slow=20):
+        self.slow_threshold_ms = slow_threshold_ms
+        self.max_statements = max_statements
+        self.explain_interval = explain_interval
+        self._stats = {}
+        self._last_explained = {}
+        self._recent_slow = deque(maxlen=recent_slow)
+        self._untracked = 0
+        self._lock = threading.Lock()
+
+    def record(self, query, duration_ms, rows):
+        """Add one execution; returns True if it was slow and should be EXPLAINed."""
+        key = fingerprint(query)
+        slow = self.slow_threshold_ms > 0 and duration_ms >= self.slow_threshold_ms
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                if len(self._stats) >= self.max_statements:
+                    self._untracked += 1
+                    return False
+                entry = self._stats[key] = {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0, "slow": 0}
+            entry["calls"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["rows"] += max(rows or 0, 0)
+            if not slow:
+                return False
+            entry["slow"] += 1
+
+            now = time.monotonic()
+            explain = (key.split(None, 1)[0].upper() in EXPLAINABLE
+                       and now - self._last_explained.get(key, float("-inf")) >= self.explain_interval)
+            if explain:
+                self._last_explained[key] = now
+            else:
+                self._recent_slow.append({"statement": key, "duration_ms": round(duration_ms, 1), "rows": rows,
+                                          "at": time.strftime("%Y-%m-%d %H:%M:%S"), "plan": None})
+                logger.warning(f"Slow query ({duration_ms:.0f} ms, {rows} rows): {key}")
+        return explain
+
+    def record_plan(self, query, duration_ms, rows, plan):
+        """Log a slow statement together with its EXPLAIN rows (list of dicts, or None if it failed)."""
+        key = fingerprint(query)
+        with self._lock:
+            self._recent_slow.append({"statement": key, "duration_ms": round(duration_ms, 1), "rows": rows,
+                                      "at": time.strftime("%Y-%m-%d %H:%M:%S"), "plan": plan})
+        if plan:
+            lines = [" | ".join(f"{column}={value}" for column, value in row.items()) for row in plan]
+            logger.warning(f"Slow query ({duration_ms:.0f} ms, {rows} rows): {key}\n  EXPLAIN: " + "\n  EXPLAIN: ".join(lines))
+        else:
+            logger.warning(f"Slow query ({duration_ms:.0f} ms, {rows} rows): {key}")
+
+    def top(self, limit=20, sort="total_ms"):
+        with self._lock:
+            entries = [{"statement": key, **entry} for key, entry in self._stats.items()]
+            untracked = self._untracked
+            recent = list(self._recent_slow)
+        entries.sort(key=lambda entry: entry[sort], reverse=True)
+        for entry in entries[:limit]:
+            entry["avg_ms"] = round(entry["total_ms"] / entry["calls"], 2)
+            entry["rows_avg"] = round(entry["rows"] / entry["calls"], 1)
+            entry["total_ms"] = round(entry["total_ms"], 1)
+            entry["max_ms"] = round(entry["max_ms"], 1)
+        return {
+            "slow_threshold_ms": self.slow_threshold_ms,
+            "statements": len(entries),
+            "untracked": untracked,
+            "top": entries[:limit],
+            "recent_slow": recent[::-1]
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._last_explained.clear()
+            self._recent_slow.clear()
+            self._untracked = 0
+
+
+query_log = QueryLog(slow_threshold_ms=config.db_slow_query_ms)
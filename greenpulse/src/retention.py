@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from config import config
+from database import db
+
+logger = logging.getLogger("GreenPulse.Retention")
+
+
+class SuggestionArchiver:
+    """
+    Moves suggestion rows older than `keep_days` from irrigation_logs to
+    suggestion_archive, which keeps the typed columns (for backtests) but not
+    the reason text and raw_data JSON. Per-day figures stay in daily_summary,
+    which Database.rebuild_daily_summary recomputes from both tables.
+
+    Rows move in batches of `batch_size`, each in its own short transaction
+    with a `pause` in between, so the scheduler and the feedback writer are
+    never blocked for long. A run stops after `max_batches` and continues on
+    the next one.
+    """
+
+    def __init__(self, database, keep_days=90, batch_size=500, pause=0.2, max_batches=200):
+        self.db = database
+        self.keep_days = keep_days
+        self.batch_size = batch_size
+        self.pause = pause
+        self.max_batches = max_batches
+        self._lock = threading.Lock()
+        self.last_report = None
+
+    def run(self, analyze=True):
+        """Archive everything older than the window (up to max_batches) and return a report."""
+        if not self._lock.acquire(blocking=False):
+            logger.info("Suggestion archiving is already running.")
+            return self.last_report
+        try:
+            started = time.perf_counter()
+            cutoff = (datetime.now() - timedelta(days=self.keep_days)).replace(hour=0, minute=0, second=0, microsecond=0)
+            before = self.db.table_sizes("irrigation_logs", "suggestion_archive")
+            moved = dropped_bytes = batches = 0
+            while batches < self.max_batches:
+                count, payload = self.db.archive_suggestions(cutoff, self.batch_size)
+                if not count:
+                    break
+                moved += count
+                dropped_bytes += payload
+                batches += 1
+                time.sleep(self.pause)
+
+            if moved and analyze:
+                # Refresh the size statistics read below
+                self.db.analyze_tables("irrigation_logs", "suggestion_archive")
+            after = self.db.table_sizes("irrigation_logs", "suggestion_archive") if moved else before
+
+            def used(sizes, table):
+                size = sizes.get(table, {})
+                return size.get("data_bytes", 0) + size.get("index_bytes", 0)
+
+            self.last_report = {
+                "finished_at": datetime.now().isoformat(timespec="seconds"),
+                "cutoff": cutoff.strftime("%Y-%m-%d"),
+                "rows_archived": moved,
+                "batches": batches,
+                "complete": batches < self.max_batches,
+                "payload_bytes_dropped": dropped_bytes,
+                "live_bytes_before": used(before, "irrigation_logs"),
+                "live_bytes_after": used(after, "irrigation_logs"),
+                "reclaimed_bytes": max(used(before, "irrigation_logs") - used(after, "irrigation_logs"), 0),
+                "live_free_bytes": after.get("irrigation_logs", {}).get("free_bytes", 0),
+                "archive_bytes": used(after, "suggestion_archive"),
+                "elapsed_s": round(time.perf_counter() - started, 1)
+            }
+            if moved:
+                logger.info(
+                    f"Archived {moved} suggestion rows older than {self.last_report['cutoff']} in {batches} batches: "
+                    f"irrigation_logs {self.last_report['live_bytes_before'] / 1e6:.1f} MB -> "
+                    f"{self.last_report['live_bytes_after'] / 1e6:.1f} MB, "
+                    f"{dropped_bytes / 1e6:.1f} MB of reason/raw_data dropped, "
+                    f"{self.last_report['live_free_bytes'] / 1e6:.1f} MB free for reuse.")
+            else:
+                logger.debug("No suggestion rows to archive.")
+            return self.last_report
+        finally:
+            self._lock.release()
+
+
+suggestion_archiver = SuggestionArchiver(db, keep_days=config.get("suggestion_retention_days", 90))
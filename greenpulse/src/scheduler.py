@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger("GreenPulse.Scheduler")
+
+
+class Job:
+    def __init__(self, name, func, interval, jitter=0.0, run_immediately=False):
+        self.name = name
+        self.func = func
+        self.interval = float(interval)
+        self.jitter = float(jitter)
+        self.run_immediately = run_immediately
+        self.due = None          # unjittered slot, keeps the job on its grid
+        self.next_run = None     # due + jitter, wall clock seconds
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.missed = 0
+        self.skipped = 0
+        self.last_started = None
+        self.last_duration = None
+        self.last_error = None
+        self.interval_reason = None
+
+    def schedule_after(self, now):
+        """
+        Move to the first slot after `now`. Slots missed while the loop was
+        stalled or the host suspended are coalesced into the run that just
+        happened; a wall clock that jumped backwards restarts the grid.
+        """
+        if self.due is None or self.due - now > self.interval:
+            self.due = now if self.run_immediately and self.due is None else now + self.interval
+        else:
+            missed = int((now - self.due) // self.interval)
+            if missed > 0:
+                self.missed += missed
+                logger.warning(f"Job {self.name} missed {missed} run(s), coalesced into one.")
+            self.due += (max(missed, 0) + 1) * self.interval
+        self.next_run = self.due + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def set_interval(self, interval, now):
+        """Keep the current slot's start and move the next run to `interval` after it (never before `now`)."""
+        interval = float(interval)
+        if self.due is not None:
+            self.due = max(self.due - self.interval + interval, now)
+        self.interval = interval
+        if self.due is not None:
+            self.next_run = self.due + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+
+class Scheduler:
+    """
+    Runs periodic jobs from the uvicorn event loop.
+
+    The loop sleeps until the earliest due job (re-checking the wall clock
+    at least every `max_sleep` seconds, so a suspended host catches up).
+    Jobs are blocking functions and run in a small thread pool; a job that
+    is still running when it is due again is skipped, never run twice.
+    """
+
+    def __init__(self, max_workers=4, max_sleep=60.0):
+        self.max_sleep = max_sleep
+        self._jobs = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scheduler")
+        self._task = None
+        self._event_loop = None
+        self._wakeup = None
+        self._running_tasks = set()
+
+    def add_job(self, name, func, interval, jitter=0.0, run_immediately=False):
+        """Run func() every `interval` seconds, delayed by up to `jitter` seconds each time."""
+        job = Job(name, func, interval, jitter, run_immediately)
+        job.schedule_after(time.time())
+        self._jobs[name] = job
+        if self._wakeup:
+            self._wakeup.set()
+        return job
+
+    def set_interval(self, name, interval, reason=None):
+        """Change the interval of a job; may be called from the job itself (a worker thread)."""
+        try:
+            on_loop = asyncio.get_running_loop() is self._event_loop
+        except RuntimeError:
+            on_loop = False
+        if self._event_loop is not None and not on_loop and not self._event_loop.is_closed():
+            self._event_loop.call_soon_threadsafe(self._set_interval, name, interval, reason)
+        else:
+            self._set_interval(name, interval, reason)
+
+    def _set_interval(self, name, interval, reason):
+        job = self._jobs.get(name)
+        if job is None:
+            return
+        job.interval_reason = reason
+        if job.interval == float(interval):
+            return
+        job.set_interval(interval, time.time())
+        if self._wakeup:
+            self._wakeup.set()
+
+    def start(self):
+        """Start the scheduling loop on the running event loop (e.g. a FastAPI startup handler)."""
+        if self._task and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._event_loop = asyncio.get_running_loop()
+        self._task = self._event_loop.create_task(self._loop())
+        logger.info(f"Scheduler started with {len(self._jobs)} job(s).")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._running_tasks:
+            await asyncio.wait(self._running_tasks, timeout=10)
+        self._executor.shutdown(wait=False)
+
+    async def _loop(self):
+        while True:
+            now = time.time()
+            for job in self._jobs.values():
+                if job.next_run <= now:
+                    self._launch(job, now)
+
+            delay = min((job.next_run for job in self._jobs.values()), default=now + self.max_sleep) - time.time()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=min(max(delay, 0), self.max_sleep))
+            except asyncio.TimeoutError:
+                pass
+
+    def _launch(self, job, now):
+        job.schedule_after(now)
+        if job.running:
+            job.skipped += 1
+            logger.warning(f"Job {job.name} is still running, skipping this run.")
+            return
+        job.running = True
+        task = asyncio.get_running_loop().create_task(self._run(job))
+        self._running_tasks.add(task)
+        task.add_done_callback(self._running_tasks.discard)
+
+    async def _run(self, job):
+        job.last_started = time.time()
+        start = time.perf_counter()
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, job.func)
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e)
+            logger.error(f"Job {job.name} failed: {e}")
+        finally:
+            job.last_duration = time.perf_counter() - start
+            job.runs += 1
+            job.running = False
+
+    def status(self):
+        def iso(timestamp):
+            return datetime.fromtimestamp(timestamp).isoformat(timespec="seconds") if timestamp else None
+
+        return {
+            "running": bool(self._task and not self._task.done()),
+            "jobs": [{
+                "name": job.name,
+                "interval_s": job.interval,
+                "jitter_s": job.jitter,
+                "interval_reason": job.interval_reason,
+                "next_run": iso(job.next_run),
+                "running": job.running,
+                "last_started": iso(job.last_started),
+                "last_duration_s": round(job.last_duration, 3) if job.last_duration is not None else None,
+                "last_error": job.last_error,
+                "runs": job.runs,
+                "failures": job.failures,
+                "missed": job.missed,
+                "skipped": job.skipped
+            } for job in self._jobs.values()]
+        }
+
+
+scheduler = Scheduler()
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger("GreenPulse.Startup")
+
+
+class Startup:
+    """
+    Startup phases and their timings, measured from process start.
+
+    The web server comes up first and reports "warming_up" until the
+    `required` phases are done; the others (MQTT, first calculation) are
+    only timed. A summary is logged once all `expected` phases are done.
+    """
+
+    def __init__(self, required=("database",), expected=("database", "mqtt", "first_calculation")):
+        self.required = tuple(required)
+        self.expected = tuple(expected)
+        self.started = time.monotonic()
+        self._phases = {}
+        self._lock = threading.Lock()
+        self._logged = False
+
+    def begin(self, name):
+        with self._lock:
+            self._phases.setdefault(name, {"started": time.monotonic(), "finished": None, "attempts": 0, "error": None})
+
+    def attempt(self, name, error=None):
+        with self._lock:
+            phase = self._phases[name]
+            phase["attempts"] += 1
+            phase["error"] = error
+
+    def complete(self, name):
+        """Mark a phase done; later calls (e.g. every MQTT reconnect) are ignored."""
+        with self._lock:
+            phase = self._phases.setdefault(name, {"started": self.started, "finished": None, "attempts": 0, "error": None})
+            if phase["finished"] is not None:
+                return
+            phase["finished"] = time.monotonic()
+            phase["error"] = None
+        logger.info(f"Startup phase {name} done in {phase['finished'] - phase['started']:.2f}s "
+                    f"({phase['finished'] - self.started:.2f}s since start).")
+        self._log_summary()
+
+    @property
+    def ready(self):
+        with self._lock:
+            return all(self._phases.get(name, {}).get("finished") for name in self.required)
+
+    def _log_summary(self):
+        with self._lock:
+            if self._logged or any(self._phases.get(name, {}).get("finished") is None for name in self.expected):
+                return
+            self._logged = True
+            phases = [(name, self._phases[name]) for name in self.expected]
+            total = max(phase["finished"] for _, phase in phases) - self.started
+            parts = ", ".join(f"{name} {phase['finished'] - phase['started']:.2f}s" for name, phase in phases)
+        logger.info(f"Startup complete in {total:.2f}s: {parts}")
+
+    async def wait_for(self, name, probe, initial_delay=0.5, max_delay=10.0):
+        """
+        Call the blocking `probe()` in a thread until it returns True, with
+        exponential backoff between attempts, then complete phase `name`.
+        """
+        self.begin(name)
+        loop = asyncio.get_running_loop()
+        delay = initial_delay
+        while True:
+            try:
+                ok = await loop.run_in_executor(None, probe)
+                error = None if ok else "not reachable"
+            except Exception as e:
+                ok, error = False, str(e)
+            self.attempt(name, error)
+            if ok:
+                self.complete(name)
+                return
+            logger.info(f"Waiting for {name} ({error}), retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+    def status(self):
+        now = time.monotonic()
+        with self._lock:
+            phases = {name: {
+                "done": phase["finished"] is not None,
+                "duration_s": round((phase["finished"] or now) - phase["started"], 2),
+                "attempts": phase["attempts"],
+                "error": phase["error"]
+            } for name, phase in self._phases.items()}
+        return {
+            "status": "ready" if self.ready else "warming_up",
+            "uptime_s": round(now - self.started, 1),
+            "phases": phases
+        }
+
+
+startup = Startup()
@@ -1,12 +1,23 @@
 import requests
 import logging
+import threading
 import time
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
 from config import config
+from metrics import OWM_REQUEST_DURATION, OWM_ERRORS
 
 logger = logging.getLogger("GreenPulse.Weather")
 
+# Combined result of one scheduled weather fetch.
+# history is a list of day summaries (missing days are left out).
+WeatherData = namedtuple("WeatherData", ["current", "forecast", "history"])
+
 class WeatherService:
+    BASE_URL = "https://api.openweathermap.org"
+
     def __init__(self):
         self.api_key = config.get("openweathermap_api_key")
         self.lat = config.get("latitude")
@@ -14,87 +25,307 @@ class WeatherService:
         self.units = "metric"
         self.lang = "hu"
 
-    def get_current_weather(self):
-        url = f"https://api.openweathermap.org/data/2.5/weather?lat={self.lat}&lon={self.lon}&appid={self.api_key}&units={self.units}&lang={self.lang}"
+        # (connect, read) timeout for a single OWM call
+        self.timeout = (5, 10)
+        # Upper bound for a whole fetch_all() fan-out
+        self.fetch_timeout = 20
+
+        # Keep-alive session shared by all worker threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=8)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=5, thread_name_prefix="owm")
+
+        # Response cache shared by the scheduler, dashboard and chart API.
+        # Entries are fresh for their TTL and may be served stale for one more
+        # TTL while a background refresh runs.
+        self.cache_ttl = {
+            "current": config.get("weather_cache_ttl_current_min", 10) * 60,
+            "forecast": config.get("weather_cache_ttl_forecast_min", 30) * 60
+        }
+        self._cache = {}
+        self._inflight = {}
+        self._cache_lock = threading.Lock()
+        self._cache_counters = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "errors": 0}
+
+        # Day summaries of past days never change, so once known they are
+        # kept for good: in memory, backed by the weather_history table.
+        self._history = {}
+        self._history_counters = {"memory": 0, "db": 0, "api": 0}
+
+    def _get_json(self, path, **params):
+        params.update({
+            "lat": self.lat,
+            "lon": self.lon,
+            "appid": self.api_key,
+            "units": self.units,
+            "lang": self.lang
+        })
+        start = time.perf_counter()
         try:
-            response = requests.get(url, timeout=10)
+            response = self.session.get(f"{self.BASE_URL}{path}", params=params, timeout=self.timeout)
             response.raise_for_status()
-            data = response.json()
-            return {
-                'temperature': data.get('main', {}).get('temp', 0),
-                'humidity': data.get('main', {}).get('humidity', 50),
-                'wind_speed': data.get('wind', {}).get('speed', 0),
-                'clouds': data.get('clouds', {}).get('all', 0),
-                'is_raining': 'rain' in data and data['rain'].get('1h', 0) > 0,
-                'rain_amount': data.get('rain', {}).get('1h', 0),
-                'description': data.get('weather', [{}])[0].get('description', ''),
-                'visibility': data.get('visibility', 10000) / 1000
-            }
+            return response.json()
+        except Exception:
+            OWM_ERRORS.labels(path).inc()
+            raise
+        finally:
+            OWM_REQUEST_DURATION.labels(path).observe(time.perf_counter() - start)
+
+    def _cached(self, key, loader, allow_stale=True):
+        """
+        Return the cached value for `key`, calling `loader` on a miss.
+        Concurrent misses for the same key share a single loader call.
+        """
+        ttl = self.cache_ttl[key]
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            age = time.monotonic() - entry[1] if entry else None
+            if entry and age < ttl:
+                self._cache_counters["hits"] += 1
+                return entry[0]
+            if entry and allow_stale and age < 2 * ttl:
+                self._cache_counters["stale_hits"] += 1
+                if key not in self._inflight:
+                    self._inflight[key] = Future()
+                    self._executor.submit(self._load, key, loader, self._inflight[key])
+                return entry[0]
+            self._cache_counters["misses"] += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = Future()
+
+        if leader:
+            return self._load(key, loader, flight)
+        return flight.result(timeout=self.fetch_timeout)
+
+    def _load(self, key, loader, flight):
+        value = None
+        try:
+            value = loader()
+        finally:
+            with self._cache_lock:
+                if value is not None:
+                    self._cache[key] = (value, time.monotonic())
+                    self._cache_counters["refreshes"] += 1
+                else:
+                    self._cache_counters["errors"] += 1
+                    # Keep serving the last good value if the upstream call failed
+                    entry = self._cache.get(key)
+                    if entry:
+                        value = entry[0]
+                self._inflight.pop(key, None)
+            flight.set_result(value)
+        return value
+
+    def cache_stats(self):
+        with self._cache_lock:
+            stats = dict(self._cache_counters)
+            lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+            stats["hit_ratio"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 3) if lookups else 0.0
+            stats["age_s"] = {key: round(time.monotonic() - entry[1], 1) for key, entry in self._cache.items()}
+            stats["history"] = dict(self._history_counters)
+        return stats
+
+    def get_current_weather(self, allow_stale=True):
+        return self._cached("current", self._fetch_current, allow_stale)
+
+    def _fetch_current(self):
+        try:
+            return self._parse_current(self._get_json("/data/2.5/weather"))
         except Exception as e:
             logger.error(f"Error fetching current weather: {e}")
             return None
 
-    def get_forecast(self):
-        url = f"https://api.openweathermap.org/data/2.5/forecast?lat={self.lat}&lon={self.lon}&appid={self.api_key}&units={self.units}&lang={self.lang}"
+    def _parse_current(self, data):
+        return {
+            'temperature': data.get('main', {}).get('temp', 0),
+            'humidity': data.get('main', {}).get('humidity', 50),
+            'wind_speed': data.get('wind', {}).get('speed', 0),
+            'clouds': data.get('clouds', {}).get('all', 0),
+            'is_raining': 'rain' in data and data['rain'].get('1h', 0) > 0,
+            'rain_amount': data.get('rain', {}).get('1h', 0),
+            'description': data.get('weather', [{}])[0].get('description', ''),
+            'visibility': data.get('visibility', 10000) / 1000
+        }
+
+    def get_forecast(self, allow_stale=True):
+        return self._cached("forecast", self._fetch_forecast, allow_stale)
+
+    def _fetch_forecast(self):
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            # Process forecast to get next 24h summary
-            # This is a simplified summary
-            # Process forecast to get next 24h and 3 days summary
-            total_rain_24h = 0
-            total_rain_3days = 0
-            temp_max = -float('inf')
-            temp_min = float('inf')
-            total_humidity_24h = 0
-            total_wind_24h = 0
-            
-            # 24h = 8 items (3h steps)
-            # 3 days = 24 items
-            for i, item in enumerate(data.get('list', [])):
-                if i >= 24: break # Limit to 3 days
-                
-                rain = item.get('rain', {}).get('3h', 0)
-                total_rain_3days += rain
-                
-                if i < 8: # First 24h
-                    total_rain_24h += rain
-                    temp = item.get('main', {}).get('temp', 0)
-                    if temp > temp_max: temp_max = temp
-                    if temp < temp_min: temp_min = temp
-                    total_humidity_24h += item.get('main', {}).get('humidity', 0)
-                    total_wind_24h += item.get('wind', {}).get('speed', 0)
-            
-            return {
-                'total_rain_next_24h': round(total_rain_24h, 1),
-                'total_rain_next_3days': round(total_rain_3days, 1),
-                'temp_max_next_24h': temp_max,
-                'temp_min_next_24h': temp_min,
-                'avg_humidity_next_24h': round(total_humidity_24h / 8, 1) if data.get('list') else 50,
-                'avg_wind_speed_next_24h': round(total_wind_24h / 8, 1) if data.get('list') else 0
-            }
+            return self._parse_forecast(self._get_json("/data/2.5/forecast"))
         except Exception as e:
             logger.error(f"Error fetching forecast: {e}")
             return None
 
+    def _parse_forecast(self, data):
+        # Process forecast to get next 24h and 3 days summary
+        total_rain_24h = 0
+        total_rain_3days = 0
+        temp_max = -float('inf')
+        temp_min = float('inf')
+        total_humidity_24h = 0
+        total_wind_24h = 0
+
+        # 24h = 8 items (3h steps)
+        # 3 days = 24 items
+        for i, item in enumerate(data.get('list', [])):
+            if i >= 24: break # Limit to 3 days
+
+            rain = item.get('rain', {}).get('3h', 0)
+            total_rain_3days += rain
+
+            if i < 8: # First 24h
+                total_rain_24h += rain
+                temp = item.get('main', {}).get('temp', 0)
+                if temp > temp_max: temp_max = temp
+                if temp < temp_min: temp_min = temp
+                total_humidity_24h += item.get('main', {}).get('humidity', 0)
+                total_wind_24h += item.get('wind', {}).get('speed', 0)
+
+        return {
+            'total_rain_next_24h': round(total_rain_24h, 1),
+            'total_rain_next_3days': round(total_rain_3days, 1),
+            'temp_max_next_24h': temp_max,
+            'temp_min_next_24h': temp_min,
+            'avg_humidity_next_24h': round(total_humidity_24h / 8, 1) if data.get('list') else 50,
+            'avg_wind_speed_next_24h': round(total_wind_24h / 8, 1) if data.get('list') else 0
+        }
+
     def get_history(self, date_str):
         # date_str in YYYY-MM-DD format
-        url = f"https://api.openweathermap.org/data/3.0/onecall/day_summary?lat={self.lat}&lon={self.lon}&appid={self.api_key}&units={self.units}&lang={self.lang}&date={date_str}"
+        return self.get_history_days([date_str]).get(date_str)
+
+    def get_history_days(self, dates):
+        """
+        Return {date_str: day summary} for past days. Days are looked up in
+        memory, then in weather_history; only days missing from both are
+        fetched from OWM and stored.
+        """
+        found, missing = self._lookup_history(dates)
+        for date_str in missing:
+            day = self._fetch_history(date_str)
+            if day:
+                self._remember_history(day, "api")
+                found[date_str] = day
+        return found
+
+    def _lookup_history(self, dates):
+        found = {}
+        with self._cache_lock:
+            for date_str in dates:
+                if date_str in self._history:
+                    found[date_str] = self._history[date_str]
+                    self._history_counters["memory"] += 1
+        missing = [d for d in dates if d not in found]
+        if missing:
+            for date_str, day in self._load_history(missing).items():
+                self._remember_history(day, "db")
+                found[date_str] = day
+            missing = [d for d in missing if d not in found]
+        return found, missing
+
+    def _remember_history(self, day, source):
+        if source == "api":
+            self._store_history(day)
+        with self._cache_lock:
+            self._history[day['date']] = day
+            self._history_counters[source] += 1
+            # Only the last few days are ever asked for
+            for old in sorted(self._history)[:-31]:
+                del self._history[old]
+
+    def _load_history(self, dates):
+        from database import db
+        first = min(dates)
+        last = (datetime.strptime(max(dates), "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        days = {}
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            return {
-                'date': date_str,
-                'temp_max': data.get('temperature', {}).get('max', 0),
-                'temp_min': data.get('temperature', {}).get('min', 0),
-                'precipitation': data.get('precipitation', {}).get('total', 0),
-                'wind_speed': data.get('wind', {}).get('max', {}).get('speed', 0),
-                'humidity': data.get('humidity', {}).get('afternoon', 50)
-            }
+            with db.cursor(dictionary=True) as cursor:
+                cursor.execute("""
+                    SELECT timestamp, temp_max, temp_min, precipitation, humidity, wind_speed
+                    FROM weather_history
+                    WHERE timestamp >= %s AND timestamp < %s
+                """, (first, last))
+                rows = cursor.fetchall()
+        except Exception as e:
+            logger.error(f"DB Error loading weather history: {e}")
+            return days
+        for row in rows:
+            date_str = row['timestamp'].strftime("%Y-%m-%d")
+            if date_str in dates:
+                days[date_str] = {
+                    'date': date_str,
+                    'temp_max': row['temp_max'],
+                    'temp_min': row['temp_min'],
+                    'precipitation': row['precipitation'],
+                    'wind_speed': row['wind_speed'],
+                    'humidity': row['humidity']
+                }
+        return days
+
+    def _store_history(self, day):
+        from database import db
+        try:
+            with db.cursor() as cursor:
+                cursor.execute("""
+                    INSERT IGNORE INTO weather_history (timestamp, temp_max, temp_min, precipitation, humidity, wind_speed)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (f"{day['date']} 12:00:00", day['temp_max'], day['temp_min'],
+                      day['precipitation'], day['humidity'], day['wind_speed']))
+            db.notify_change("weather_history", day['date'])
+        except Exception as e:
+            logger.error(f"DB Error saving history: {e}")
+
+    def _fetch_history(self, date_str):
+        try:
+            return self._parse_history(date_str, self._get_json("/data/3.0/onecall/day_summary", date=date_str))
         except Exception as e:
             logger.error(f"Error fetching history for {date_str}: {e}")
             return None
 
+    def _parse_history(self, date_str, data):
+        return {
+            'date': date_str,
+            'temp_max': data.get('temperature', {}).get('max', 0),
+            'temp_min': data.get('temperature', {}).get('min', 0),
+            'precipitation': data.get('precipitation', {}).get('total', 0),
+            'wind_speed': data.get('wind', {}).get('max', {}).get('speed', 0),
+            'humidity': data.get('humidity', {}).get('afternoon', 50)
+        }
+
+    def fetch_all(self, history_days=3):
+        """
+        Fetch current weather, forecast and the last `history_days` day
+        summaries concurrently. Calls that fail or do not finish within
+        `fetch_timeout` are reported as missing (None / left out of history).
+        Current weather and forecast come from the cache only while fresh;
+        history days already known are not requested again.
+        """
+        start = time.monotonic()
+        dates = [(datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(1, history_days + 1)]
+
+        current_future = self._executor.submit(self.get_current_weather, False)
+        forecast_future = self._executor.submit(self.get_forecast, False)
+        known, missing = self._lookup_history(dates)
+        history_futures = [self._executor.submit(self.get_history_days, [d]) for d in missing]
+
+        all_futures = [current_future, forecast_future] + history_futures
+        _, not_done = wait(all_futures, timeout=self.fetch_timeout)
+        for future in not_done:
+            future.cancel()
+        if not_done:
+            logger.warning(f"{len(not_done)} weather request(s) did not finish within {self.fetch_timeout}s")
+
+        def result(future):
+            return future.result() if future not in not_done else None
+
+        for future in history_futures:
+            known.update(result(future) or {})
+        history = [known[d] for d in dates if d in known]
+        logger.debug(f"Weather fetch finished in {time.monotonic() - start:.2f}s")
+        return WeatherData(result(current_future), result(forecast_future), history)
+
 weather_service = WeatherService()
@@ -1,85 +1,141 @@
-from fastapi import FastAPI, Request, Form
+from fastapi import FastAPI, Request, Form, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response, PlainTextResponse, StreamingResponse
 import uvicorn
+import asyncio
+import contextvars
+import json
 import logging
+import os
 import threading
 import time
-import schedule
+from concurrent.futures import ThreadPoolExecutor
 from database import db
 from config import config
-# Import the scheduler jobs from the original main logic (which we will move/import)
-# To avoid circular imports, we might need to restructure.
-# For now, let's assume we copy the scheduler logic here or import it.
-
-# We need to refactor the scheduler logic into a separate module or class
-# Let's assume we have a `scheduler_service.py` that has `start_scheduler()`
-# But for now, I'll define the app and we'll fix the imports in the next step.
+from weather import weather_service
+from ingest import feedback_writer
+from retention import suggestion_archiver
+from web import charts, logs
+from web.chart_cache import ChartCache
+import backtest
+import metrics
+from query_log import query_log
+from scheduler import scheduler
+from startup import startup
+from events import event_hub
+from dashboard import dashboard_state
 
 app = FastAPI()
 
+class MetricsMiddleware:
+    """Records latency and DB round trips of every HTTP request by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = [500]
+        queries = [0]
+        token = metrics.request_queries.set(queries)
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.request_queries.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                path = route.path
+            elif scope["path"].startswith("/static/"):
+                path = "/static"
+            else:
+                path = "unmatched"
+            metrics.HTTP_REQUEST_DURATION.labels(scope["method"], path, str(status[0])).observe(time.perf_counter() - start)
+            metrics.HTTP_DB_QUERIES.labels(path).observe(queries[0])
+
+app.add_middleware(MetricsMiddleware)
+
+WEB_DIR = os.path.dirname(os.path.abspath(__file__))
+
 # Mount static files
-app.mount("/static", StaticFiles(directory="/app/src/web/static"), name="static")
+app.mount("/static", StaticFiles(directory=os.path.join(WEB_DIR, "static")), name="static")
 
 # Templates
-templates = Jinja2Templates(directory="/app/src/web/templates")
+templates = Jinja2Templates(directory=os.path.join(WEB_DIR, "templates"))
 
 logger = logging.getLogger("GreenPulse.Web")
 
-@app.get("/", response_class=HTMLResponse)
-async def read_root(request: Request):
-    # Get latest status
-    conn = db.get_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    # Last suggestion
-    cursor.execute("SELECT * FROM irrigation_logs WHERE event_type='suggestion' ORDER BY timestamp DESC LIMIT 1")
-    last_suggestion = cursor.fetchone()
-    
-    # Last watering
-    cursor.execute("SELECT * FROM irrigation_logs WHERE event_type IN ('watering_end', 'manual') ORDER BY timestamp DESC LIMIT 1")
-    last_watering = cursor.fetchone()
-    
-    # Recent weather history (Limit to 3 as requested)
-    cursor.execute("SELECT * FROM weather_history ORDER BY timestamp DESC LIMIT 3")
-    weather_history = cursor.fetchall()
-    
-    cursor.close()
-
-    # Fetch current weather and forecast for display
-    from weather import weather_service
-    current_weather = None
-    forecast_weather = None
+# Blocking DB calls run here instead of on the event loop, so one slow query
+# does not stall every other request.
+IO_TIMEOUT = 15
+io_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="web-io")
+
+async def run_io(func, *args, timeout=IO_TIMEOUT):
+    loop = asyncio.get_running_loop()
+    # Run in a copy of the request context so DB round trips are counted per request
+    context = contextvars.copy_context()
     try:
-        current_weather = weather_service.get_current_weather()
-        forecast_weather = weather_service.get_forecast()
-    except Exception as e:
-        logger.error(f"Error fetching weather for dashboard: {e}")
+        return await asyncio.wait_for(loop.run_in_executor(io_executor, context.run, func, *args), timeout)
+    except asyncio.TimeoutError:
+        logger.error(f"{func.__name__} did not finish within {timeout}s")
+        raise HTTPException(status_code=504, detail="Backend timeout")
 
-    import json
-    if last_suggestion and last_suggestion.get('raw_data'):
-        try:
-            last_suggestion['raw_data'] = json.loads(last_suggestion['raw_data'])
-        except:
-            last_suggestion['raw_data'] = {}
-    
+# Serialized chart responses; dropped when data inside their range is written
+chart_cache = ChartCache(live_ttl=weather_service.cache_ttl["current"])
+db.add_change_listener(chart_cache.invalidate)
+
+@app.get("/", response_class=HTMLResponse)
+async def read_root(request: Request):
+    # Rendered from the in-memory snapshot only: no database or OWM round trip
+    snapshot = dashboard_state.snapshot()
     return templates.TemplateResponse(request, "index.html", {
-        "last_suggestion": last_suggestion,
-        "last_watering": last_watering,
-        "weather_history": weather_history,
-        "current_weather": current_weather,
-        "forecast_weather": forecast_weather
+        "last_suggestion": snapshot["last_suggestion"],
+        "last_watering": snapshot["last_watering"],
+        "weather_history": snapshot["weather_history"],
+        # The per-zone overview is only shown when more than one zone is configured
+        "zones": snapshot["zones"] if len(snapshot["zones"]) > 1 else [],
+        "current_weather": snapshot["current_weather"],
+        "forecast_weather": snapshot["forecast_weather"],
+        "warming_up": None if startup.ready else startup.status()
     })
 
 @app.get("/logs", response_class=HTMLResponse)
 async def read_logs(request: Request):
-    conn = db.get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM irrigation_logs ORDER BY timestamp DESC LIMIT 300")
-    logs = cursor.fetchall()
-    cursor.close()
-    return templates.TemplateResponse(request, "logs.html", {"logs": logs})
+    # Rows are loaded page by page from /api/logs
+    return templates.TemplateResponse(request, "logs.html", {
+        "event_types": logs.EVENT_TYPES,
+        "zones": config.zones if len(config.zones) > 1 else []
+    })
+
+@app.get("/api/logs")
+async def get_logs(cursor: str = None, limit: int = logs.DEFAULT_LIMIT, event_type: str = None,
+                   from_date: str = None, to_date: str = None, important: bool = False,
+                   include_raw: bool = False, zone: str = None):
+    from datetime import datetime
+
+    event_types = [t for t in (event_type or "").split(",") if t]
+    if any(t not in logs.EVENT_TYPES for t in event_types):
+        raise HTTPException(status_code=400, detail="Unknown event_type")
+    try:
+        for value in (from_date, to_date):
+            if value:
+                datetime.strptime(value, "%Y-%m-%d")
+        if cursor:
+            logs.decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date or cursor")
+    limit = min(max(limit, 1), logs.MAX_LIMIT)
+
+    return await run_io(logs.load_logs, limit, cursor, event_types, from_date, to_date, important, include_raw, zone)
 
 @app.get("/settings", response_class=HTMLResponse)
 async def read_settings(request: Request):
@@ -87,10 +143,13 @@ async def read_settings(request: Request):
 
 @app.get("/analytics", response_class=HTMLResponse)
 async def read_analytics(request: Request):
-    return templates.TemplateResponse(request, "analytics.html", {})
+    return templates.TemplateResponse(request, "analytics.html", {
+        "zones": config.zones if len(config.zones) > 1 else []
+    })
 
 @app.get("/api/chart-data")
-async def get_chart_data(from_date: str = None, to_date: str = None):
+async def get_chart_data(request: Request, from_date: str = None, to_date: str = None, resolution: str = "auto",
+                         max_points: int = charts.DEFAULT_MAX_POINTS, zone: str = None):
     from datetime import datetime, timedelta
 
     # Default: last 30 days
@@ -107,69 +166,185 @@ async def get_chart_data(from_date: str = None, to_date: str = None):
         from_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
         to_date = datetime.now().strftime("%Y-%m-%d")
 
-    from_dt = f"{from_date} 00:00:00"
-    to_dt   = f"{to_date} 23:59:59"
-
-    conn = db.get_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    # 1. Weather History – filtered by date range, sorted ascending
-    cursor.execute(
-        "SELECT * FROM weather_history WHERE timestamp BETWEEN %s AND %s ORDER BY timestamp ASC",
-        (from_dt, to_dt)
-    )
-    weather_data = cursor.fetchall()
-
-    # 2. Irrigation History – same date range
-    cursor.execute(
-        """SELECT * FROM irrigation_logs
-           WHERE event_type IN ('manual', 'watering_end')
-             AND timestamp BETWEEN %s AND %s
-           ORDER BY timestamp ASC""",
-        (from_dt, to_dt)
-    )
-    irrigation_data = cursor.fetchall()
-
-    # 3. Suggestion History - for water deficit chart
-    cursor.execute(
-        """SELECT timestamp, raw_data FROM irrigation_logs
-           WHERE event_type = 'suggestion'
-             AND timestamp BETWEEN %s AND %s
-           ORDER BY timestamp ASC""",
-        (from_dt, to_dt)
-    )
-    suggestion_data = cursor.fetchall()
-
-    cursor.close()
-
-    # Append today's live data if today is within range and not yet in DB
-    from weather import weather_service
-    today_str = datetime.now().strftime("%Y-%m-%d")
-    if from_date <= today_str <= to_date:
-        has_today = any(
-            str(d['timestamp']).startswith(today_str) for d in weather_data
-        )
-        if not has_today:
-            try:
-                current = weather_service.get_current_weather()
-                if current:
-                    weather_data.append({
-                        "timestamp": f"{today_str} 12:00:00",
-                        "temp_max": current.get('temperature', 0),
-                        "temp_min": current.get('temperature', 0),
-                        "precipitation": current.get('rain_amount', 0),
-                        "humidity": current.get('humidity', 0),
-                        "wind_speed": current.get('wind_speed', 0)
-                    })
-            except Exception as e:
-                logger.error(f"Error fetching current weather for chart: {e}")
+    if from_date > to_date:
+        from_date, to_date = to_date, from_date
+    if resolution not in charts.RESOLUTIONS:
+        resolution = "auto"
+    max_points = min(max(max_points, 10), 5000)
+
+    if zone and zone not in [z["id"] for z in config.zones]:
+        raise HTTPException(status_code=400, detail="Unknown zone")
+
+    key = (from_date, to_date, resolution, max_points, zone)
+    entry = chart_cache.get(key)
+    if entry is None:
+        data = await run_io(charts.load_chart_data, from_date, to_date, resolution, max_points, zone)
+        body = json.dumps(data, separators=(",", ":"), default=str).encode()
+        entry = chart_cache.put(key, from_date, to_date, body)
+
+    headers = {
+        "ETag": entry["etag"],
+        "Last-Modified": entry["last_modified"],
+        "Cache-Control": "no-cache"
+    }
+    if request.headers.get("if-none-match") == entry["etag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+BACKTEST_TIMEOUT = 120
+MAX_BACKTEST_SCENARIOS = 256
 
+def _run_backtest(from_date, to_date, zone, scenarios, start_deficit, max_points):
+    zone = backtest.zone_settings(zone)
+    inputs = backtest.load_inputs(from_date, to_date, zone["id"])
+    return backtest.run_scenarios(inputs, scenarios, start_deficit=start_deficit, max_points=max_points, zone=zone)
+
+@app.post("/api/backtest")
+async def post_backtest(request: Request):
+    """
+    Replay a date range with one or more parameter sets, e.g.
+    {"from_date": "2025-04-01", "to_date": "2025-10-31",
+     "scenarios": [{"et_correction_factor": 0.8}, {"et_correction_factor": 1.2}]}
+    or a "grid" of values to sweep: {"grid": {"soil_type": ["Homokos", "Vályog"]}}.
+    """
+    from datetime import datetime, timedelta
+
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+    to_date = body.get("to_date") or datetime.now().strftime("%Y-%m-%d")
+    from_date = body.get("from_date") or (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d")
+    zone = body.get("zone")
+    try:
+        datetime.strptime(from_date, "%Y-%m-%d")
+        datetime.strptime(to_date, "%Y-%m-%d")
+        scenarios = list(body.get("scenarios") or [])
+        grid = body.get("grid") or {}
+        # Checked before expanding: a few long value lists multiply to millions of combinations
+        if len(scenarios) + backtest.grid_size(grid) > MAX_BACKTEST_SCENARIOS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BACKTEST_SCENARIOS} scenarios")
+        scenarios = [backtest.validate_params(params) for params in scenarios + backtest.expand_grid(grid) if params] or [{}]
+        start_deficit = float(body.get("start_deficit", 0.0))
+        max_points = min(max(int(body.get("max_points", backtest.DEFAULT_MAX_POINTS)), 10), 5000)
+    except (ValueError, TypeError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if zone and zone not in [z["id"] for z in config.zones]:
+        raise HTTPException(status_code=400, detail="Unknown zone")
+    if from_date > to_date:
+        from_date, to_date = to_date, from_date
+
+    results = await run_io(_run_backtest, from_date, to_date, zone, scenarios, start_deficit, max_points,
+                           timeout=BACKTEST_TIMEOUT)
+    return {"from_date": from_date, "to_date": to_date, "zone": zone, "results": results}
+
+@app.get("/api/stats")
+async def get_stats():
     return {
-        "weather": weather_data,
-        "irrigation": irrigation_data,
-        "suggestions": suggestion_data,
-        "from_date": from_date,
-        "to_date": to_date
+        "db_pool": db.pool_stats(),
+        "weather_cache": weather_service.cache_stats(),
+        "chart_cache": chart_cache.stats(),
+        "feedback_ingest": feedback_writer.stats(),
+        "suggestion_retention": suggestion_archiver.last_report,
+        "events": event_hub.stats(),
+        "dashboard": dashboard_state.stats()
     }
 
-# We will add the startup event in main.py or here if this becomes the entry point.
+@app.get("/api/health")
+async def get_health():
+    status = startup.status()
+    return Response(json.dumps(status), status_code=200 if status["status"] == "ready" else 503,
+                    media_type="application/json", headers={} if status["status"] == "ready" else {"Retry-After": "5"})
+
+SSE_KEEPALIVE_SECONDS = 15
+
+@app.get("/api/events")
+async def stream_events(request: Request):
+    """Server-sent dashboard updates: status, weather, suggestion and watering events."""
+    try:
+        last_event_id = int(request.headers.get("last-event-id", ""))
+    except ValueError:
+        last_event_id = None
+    subscription = event_hub.subscribe(last_event_id)
+
+    async def stream():
+        try:
+            # The current state first, so a page rendered while warming up
+            # notices that startup finished before it connected
+            yield f"retry: 5000\nevent: status\ndata: {json.dumps(startup.status())}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Keeps proxies (e.g. the ingress) from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                yield event.encode()
+        finally:
+            event_hub.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/scheduler")
+async def get_scheduler_status():
+    return scheduler.status()
+
+QUERY_SORT_KEYS = ("total_ms", "max_ms", "calls", "rows", "slow")
+
+@app.get("/api/debug/queries")
+async def get_query_stats(limit: int = 20, sort: str = "total_ms"):
+    if sort not in QUERY_SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(QUERY_SORT_KEYS)}")
+    return query_log.top(max(1, min(limit, 200)), sort)
+
+@app.delete("/api/debug/queries")
+async def reset_query_stats():
+    query_log.reset()
+    return {"status": "ok"}
+
+def _collect_stats():
+    """Existing pool, cache and ingest counters as metric families, read at scrape time."""
+    pool = db.pool_stats()
+    if pool:
+        yield ("greenpulse_db_pool_connections", "gauge", "Pooled database connections by state.",
+               [({"state": "in_use"}, pool["in_use"]), ({"state": "idle"}, pool["idle"])])
+        yield ("greenpulse_db_pool_checkouts_total", "counter", "Connections checked out of the pool.",
+               [({}, pool["checkouts"])])
+        yield ("greenpulse_db_pool_timeouts_total", "counter", "Checkouts that timed out waiting for a connection.",
+               [({}, pool["timeouts"])])
+
+    weather = weather_service.cache_stats()
+    charts_stats = chart_cache.stats()
+    yield ("greenpulse_cache_lookups_total", "counter", "Cache lookups by cache and result.", [
+        ({"cache": "weather", "result": "hit"}, weather["hits"]),
+        ({"cache": "weather", "result": "stale_hit"}, weather["stale_hits"]),
+        ({"cache": "weather", "result": "miss"}, weather["misses"]),
+        ({"cache": "chart", "result": "hit"}, charts_stats["hits"]),
+        ({"cache": "chart", "result": "miss"}, charts_stats["misses"]),
+    ])
+    yield ("greenpulse_cache_hit_ratio", "gauge", "Share of cache lookups served from the cache.", [
+        ({"cache": "weather"}, weather["hit_ratio"]),
+        ({"cache": "chart"}, charts_stats["hit_ratio"]),
+    ])
+
+    events = event_hub.stats()
+    yield ("greenpulse_event_clients", "gauge", "Connected /api/events clients.", [({}, events["clients"])])
+    yield ("greenpulse_events_dropped_total", "counter", "Events dropped for clients that did not keep up.",
+           [({}, events["dropped"])])
+
+    ingest = feedback_writer.stats()
+    yield ("greenpulse_feedback_messages_total", "counter", "MQTT feedback messages by outcome.", [
+        ({"result": key}, ingest[key]) for key in ("received", "written", "duplicates", "invalid", "dropped", "failed")
+    ])
+    yield ("greenpulse_feedback_queue_depth", "gauge", "Feedback messages waiting to be stored.",
+           [({}, ingest["queue_depth"])])
+    yield ("greenpulse_feedback_flush_seconds_last", "gauge", "Duration of the last feedback batch insert.",
+           [({}, ingest["flush_ms_last"] / 1000)])
+
+metrics.registry.add_collector(_collect_stats)
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
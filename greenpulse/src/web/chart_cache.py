@@ -0,0 +1,77 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from email.utils import formatdate
+
+
+class ChartCache:
+    """
+    LRU of serialized /api/chart-data responses.
+
+    Past days never change, so an entry is only dropped when data for a day
+    inside its range is written (see Database.notify_change) or when it
+    covers today and is older than `live_ttl` (today's row is live weather).
+    """
+
+    def __init__(self, max_entries=64, live_ttl=600):
+        self.max_entries = max_entries
+        self.live_ttl = live_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, key):
+        now = time.time()
+        today = datetime.now().strftime("%Y-%m-%d")
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry["to_date"] >= today and now - entry["created"] > self.live_ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def put(self, key, from_date, to_date, body):
+        created = time.time()
+        entry = {
+            "body": body,
+            "etag": '"' + hashlib.md5(body).hexdigest()[:16] + '"',
+            "last_modified": formatdate(created, usegmt=True),
+            "created": created,
+            "from_date": from_date,
+            "to_date": to_date
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, table=None, day=None):
+        """Drop entries whose range contains `day` (all entries if None)."""
+        with self._lock:
+            stale = [key for key, entry in self._entries.items()
+                     if day is None or entry["from_date"] <= day <= entry["to_date"]]
+            for key in stale:
+                del self._entries[key]
+            self._invalidations += len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "invalidations": self._invalidations,
+                "hit_ratio": round(self._hits / lookups, 3) if lookups else 0.0
+            }
@@ -0,0 +1,193 @@
+import logging
+from datetime import datetime
+from database import db
+from config import config
+from weather import weather_service
+from downsample import lttb
+
+logger = logging.getLogger("GreenPulse.Web")
+
+RESOLUTIONS = ("raw", "hourly", "daily", "weekly")
+
+# SQL bucket label per resolution ('%' doubled for the connector's paramstyle)
+BUCKET_SQL = {
+    "raw": "DATE_FORMAT(timestamp, '%%Y-%%m-%%d %%H:%%i:%%s')",
+    "hourly": "DATE_FORMAT(timestamp, '%%Y-%%m-%%d %%H:00')",
+    "daily": "DATE_FORMAT(timestamp, '%%Y-%%m-%%d')",
+    "weekly": "DATE_FORMAT(timestamp - INTERVAL WEEKDAY(timestamp) DAY, '%%Y-%%m-%%d')",
+}
+
+# The same buckets over daily_summary.day, for day or coarser resolutions
+DAY_BUCKET_SQL = {
+    "daily": "DATE_FORMAT(day, '%%Y-%%m-%%d')",
+    "weekly": "DATE_FORMAT(day - INTERVAL WEEKDAY(day) DAY, '%%Y-%%m-%%d')",
+}
+
+DEFAULT_MAX_POINTS = 500
+
+
+def pick_resolution(from_date, to_date, resolution="auto", max_points=DEFAULT_MAX_POINTS):
+    """
+    Return (series_resolution, deficit_resolution) for a date range.
+    'auto' keeps bar series at one bucket per day while that fits the point
+    budget, and shows the deficit line hourly for ranges up to a month.
+    """
+    if resolution in RESOLUTIONS:
+        return resolution, resolution
+    days = (datetime.strptime(to_date, "%Y-%m-%d") - datetime.strptime(from_date, "%Y-%m-%d")).days + 1
+    series = "daily" if days <= max_points else "weekly"
+    deficit = "hourly" if days <= 31 else series
+    return series, deficit
+
+
+def _round(value, digits=2):
+    return round(float(value), digits) if value is not None else None
+
+
+def load_chart_data(from_date, to_date, resolution="auto", max_points=DEFAULT_MAX_POINTS, zone_id=None):
+    """
+    Chart series for a date range. Irrigation and deficit are limited to
+    `zone_id` when given; otherwise irrigation is summed over all zones and
+    the deficit is the worst zone's.
+
+    Daily and weekly buckets and the range totals are read from the
+    daily_summary rollup (one row per zone and day); only hourly and raw
+    buckets scan irrigation_logs, and for the deficit also the suggestion
+    rows moved to suggestion_archive (see retention.py).
+    """
+    series_res, deficit_res = pick_resolution(from_date, to_date, resolution, max_points)
+    bucket = BUCKET_SQL[series_res]
+    from_dt = f"{from_date} 00:00:00"
+    to_dt = f"{to_date} 23:59:59"
+    zone_sql = "AND zone_id = %s" if zone_id else ""
+    zone_params = (zone_id,) if zone_id else ()
+
+    with db.cursor(dictionary=True) as cursor:
+        # 1. Weather history per bucket
+        cursor.execute(f"""
+            SELECT {bucket} AS bucket,
+                   MAX(temp_max) AS temp_max, MIN(temp_min) AS temp_min,
+                   SUM(precipitation) AS precipitation,
+                   AVG(humidity) AS humidity, AVG(wind_speed) AS wind_speed
+            FROM weather_history
+            WHERE timestamp BETWEEN %s AND %s
+            GROUP BY bucket ORDER BY bucket
+        """, (from_dt, to_dt))
+        weather_rows = cursor.fetchall()
+
+        # 2. Irrigation per bucket
+        if series_res in DAY_BUCKET_SQL:
+            cursor.execute(f"""
+                SELECT {DAY_BUCKET_SQL[series_res]} AS bucket, SUM(irrigation_total) AS water_amount,
+                       SUM(irrigation_events) AS events
+                FROM daily_summary
+                WHERE day BETWEEN %s AND %s AND irrigation_events > 0 {zone_sql}
+                GROUP BY bucket ORDER BY bucket
+            """, (from_date, to_date, *zone_params))
+        else:
+            cursor.execute(f"""
+                SELECT {bucket} AS bucket, SUM(water_amount) AS water_amount, COUNT(*) AS events
+                FROM irrigation_logs
+                WHERE event_type IN ('manual', 'watering_end')
+                  AND timestamp BETWEEN %s AND %s {zone_sql}
+                GROUP BY bucket ORDER BY bucket
+            """, (from_dt, to_dt, *zone_params))
+        irrigation_rows = cursor.fetchall()
+
+        # 3. Water deficit (peak per bucket)
+        if deficit_res in DAY_BUCKET_SQL:
+            cursor.execute(f"""
+                SELECT {DAY_BUCKET_SQL[deficit_res]} AS bucket, MAX(max_deficit) AS deficit
+                FROM daily_summary
+                WHERE day BETWEEN %s AND %s AND suggestion_count > 0 {zone_sql}
+                GROUP BY bucket ORDER BY bucket
+            """, (from_date, to_date, *zone_params))
+        else:
+            # Both parts are served from covering indexes
+            cursor.execute(f"""
+                SELECT {BUCKET_SQL[deficit_res]} AS bucket, MAX(deficit) AS deficit
+                FROM (
+                    SELECT timestamp, deficit FROM irrigation_logs
+                    WHERE event_type = 'suggestion' AND timestamp BETWEEN %s AND %s {zone_sql}
+                    UNION ALL
+                    SELECT timestamp, deficit FROM suggestion_archive
+                    WHERE timestamp BETWEEN %s AND %s {zone_sql}
+                ) suggestions
+                GROUP BY bucket ORDER BY bucket
+            """, (from_dt, to_dt, *zone_params, from_dt, to_dt, *zone_params))
+        deficit_rows = cursor.fetchall()
+
+        # 4. Range totals, independent of the bucket size
+        cursor.execute("""
+            SELECT COUNT(*) AS days, SUM(precipitation) AS total_rain, AVG(temp_max) AS avg_temp
+            FROM weather_history
+            WHERE timestamp BETWEEN %s AND %s
+        """, (from_dt, to_dt))
+        weather_summary = cursor.fetchone()
+        cursor.execute(f"""
+            SELECT SUM(irrigation_total) AS total_irrigation,
+                   COUNT(DISTINCT CASE WHEN irrigation_total > 0 THEN day END) AS irrigation_days
+            FROM daily_summary
+            WHERE day BETWEEN %s AND %s {zone_sql}
+        """, (from_date, to_date, *zone_params))
+        irrigation_summary = cursor.fetchone()
+
+    weather = {"t": [], "temp_max": [], "temp_min": [], "precipitation": [], "humidity": [], "wind_speed": []}
+    for row in weather_rows:
+        weather["t"].append(row['bucket'])
+        for key in ("temp_max", "temp_min", "precipitation", "humidity", "wind_speed"):
+            weather[key].append(_round(row[key]))
+
+    days = weather_summary['days'] or 0
+    total_rain = float(weather_summary['total_rain'] or 0)
+    avg_temp = weather_summary['avg_temp']
+
+    # Append today's live data if today is within range and not yet in DB
+    today_str = datetime.now().strftime("%Y-%m-%d")
+    if series_res != "weekly" and from_date <= today_str <= to_date:
+        has_today = any(t.startswith(today_str) for t in weather["t"])
+        if not has_today:
+            try:
+                current = weather_service.get_current_weather()
+                if current:
+                    weather["t"].append(today_str if series_res == "daily" else f"{today_str} 12:00")
+                    weather["temp_max"].append(current.get('temperature', 0))
+                    weather["temp_min"].append(current.get('temperature', 0))
+                    weather["precipitation"].append(current.get('rain_amount', 0))
+                    weather["humidity"].append(current.get('humidity', 0))
+                    weather["wind_speed"].append(current.get('wind_speed', 0))
+                    total_rain += current.get('rain_amount', 0)
+                    avg_temp = ((float(avg_temp or 0) * days) + current.get('temperature', 0)) / (days + 1)
+            except Exception as e:
+                logger.error(f"Error fetching current weather for chart: {e}")
+
+    irrigation = {
+        "t": [row['bucket'] for row in irrigation_rows],
+        "water_amount": [_round(row['water_amount']) for row in irrigation_rows],
+        "events": [row['events'] for row in irrigation_rows],
+    }
+
+    deficit_t = [row['bucket'] for row in deficit_rows if row['deficit'] is not None]
+    deficit_v = [_round(row['deficit']) for row in deficit_rows if row['deficit'] is not None]
+    deficit_t, deficit_v = lttb(deficit_t, deficit_v, max_points)
+
+    return {
+        "from_date": from_date,
+        "to_date": to_date,
+        "zone": zone_id,
+        "resolution": series_res,
+        "deficit_resolution": deficit_res,
+        "weather": weather,
+        "irrigation": irrigation,
+        "deficit": {
+            "t": deficit_t,
+            "v": deficit_v,
+            "threshold": config.get("min_watering_amount", 5)
+        },
+        "summary": {
+            "total_rain": _round(total_rain, 1),
+            "total_irrigation": _round(irrigation_summary['total_irrigation'] or 0, 1),
+            "irrigation_days": irrigation_summary['irrigation_days'] or 0,
+            "avg_temp": _round(avg_temp, 1)
+        }
+    }
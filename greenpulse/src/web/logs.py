@@ -0,0 +1,78 @@
+import base64
+import json
+from datetime import datetime
+from database import db
+
+EVENT_TYPES = ("suggestion", "watering_start", "watering_end", "manual")
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+BASE_COLUMNS = "id, timestamp, zone_id, event_type, water_amount, reason, notes"
+
+
+def encode_cursor(row):
+    raw = f"{row['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return (timestamp, id) from a page cursor, or raise ValueError."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    timestamp, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+    return datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S"), int(row_id)
+
+
+def load_logs(limit=DEFAULT_LIMIT, cursor=None, event_types=None, from_date=None, to_date=None,
+              only_important=False, include_raw=False, zone_id=None):
+    """
+    One page of irrigation_logs, newest first. Pages are addressed by a
+    (timestamp, id) keyset cursor, so every page costs the same index range
+    scan no matter how deep in the history it is.
+    """
+    conditions = []
+    params = []
+    if zone_id:
+        conditions.append("zone_id = %s")
+        params.append(zone_id)
+    if event_types:
+        conditions.append(f"event_type IN ({', '.join(['%s'] * len(event_types))})")
+        params.extend(event_types)
+    if from_date:
+        conditions.append("timestamp >= %s")
+        params.append(f"{from_date} 00:00:00")
+    if to_date:
+        conditions.append("timestamp <= %s")
+        params.append(f"{to_date} 23:59:59")
+    if only_important:
+        # Watering events and suggestions that actually asked for water
+        conditions.append("(event_type <> 'suggestion' OR water_amount > 0)")
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        conditions.append("(timestamp < %s OR (timestamp = %s AND id < %s))")
+        params.extend([timestamp, timestamp, row_id])
+
+    columns = BASE_COLUMNS + (", raw_data" if include_raw else "")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    with db.cursor(dictionary=True) as db_cursor:
+        db_cursor.execute(f"""
+            SELECT {columns} FROM irrigation_logs
+            {where}
+            ORDER BY timestamp DESC, id DESC
+            LIMIT %s
+        """, (*params, limit + 1))
+        rows = db_cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+
+    if include_raw:
+        for row in rows:
+            if row.get('raw_data'):
+                try:
+                    row['raw_data'] = json.loads(row['raw_data'])
+                except ValueError:
+                    pass
+
+    return {"items": rows, "next_cursor": next_cursor}
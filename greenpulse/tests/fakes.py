@@ -0,0 +1,117 @@
+"""
+Stand-ins shared by the tests.
+
+FakeDatabase replaces database.Database: statements are recorded instead of
+run, and results come from `one_row` / `rows` or from a `script` of results
+consumed in order. `import_with_database(db, ...)` imports src modules with
+`from database import db` bound to it; afterwards sys.modules is restored,
+so neither the stub nor the modules bound to it leak into other test files.
+"""
+import importlib
+import os
+import sys
+import time
+import types
+from contextlib import contextmanager
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+if SRC not in sys.path:
+    sys.path.append(SRC)
+
+import metrics
+
+
+class FakeCursor:
+    def __init__(self, database, dictionary=False):
+        self.database = database
+        self.dictionary = dictionary
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        # Counted like database.TimedCursor does, for the per-request metrics
+        metrics.count_query()
+        self.database.queries += 1
+        self.database.last_query = (query, params)
+        time.sleep(self.database.delay)
+
+    def executemany(self, query, rows):
+        metrics.count_query()
+        self.database.queries += 1
+        self.database.executed.append((query, list(rows)))
+        time.sleep(self.database.delay)
+
+    def fetchone(self):
+        if self.database.script:
+            return self.database.script.pop(0)
+        return self.database.one_row
+
+    def fetchall(self):
+        if self.database.script:
+            return self.database.script.pop(0)
+        return self.database.rows
+
+
+class FakeDatabase:
+    def __init__(self, script=None, pool=None):
+        self.delay = 0
+        self.queries = 0
+        self.last_query = None
+        self.one_row = None
+        self.rows = []
+        self.script = list(script or [])
+        self.executed = []
+        self.changes = []
+        self.listeners = []
+        self.pool = pool or {}
+
+    @contextmanager
+    def cursor(self, dictionary=False):
+        yield FakeCursor(self, dictionary)
+
+    def written(self, table):
+        """Row lists passed to executemany by the statements on `table`, in order."""
+        return [rows for query, rows in self.executed if table in query]
+
+    def pool_stats(self):
+        return dict(self.pool)
+
+    def add_change_listener(self, callback):
+        self.listeners.append(callback)
+
+    def notify_change(self, table, day=None):
+        self.changes.append((table, day))
+        for callback in self.listeners:
+            callback(table, day)
+
+
+def _from_src(module):
+    # Namespace packages such as `web` have no __file__, only a __path__
+    location = getattr(module, "__file__", None) or next(iter(getattr(module, "__path__", [])), "")
+    return location.startswith(SRC)
+
+
+@contextmanager
+def database_stub(db, fresh=()):
+    """
+    `from database import db` yields `db` inside the block and the modules
+    `fresh` are imported anew. Afterwards sys.modules is as it was before:
+    src modules imported inside the block are dropped.
+    """
+    saved = {name: sys.modules.pop(name) for name in ("database", *fresh) if name in sys.modules}
+    before = set(sys.modules)
+    stub = types.ModuleType("database")
+    stub.db = db
+    sys.modules["database"] = stub
+    try:
+        yield stub
+    finally:
+        for name in set(sys.modules) - before:
+            if name == "database" or _from_src(sys.modules[name]):
+                del sys.modules[name]
+        sys.modules.update(saved)
+
+
+def import_with_database(db, *names):
+    """Import the src modules `names` against `db` and return them."""
+    with database_stub(db, fresh=names):
+        return [importlib.import_module(name) for name in names]
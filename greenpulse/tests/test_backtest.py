@@ -0,0 +1,116 @@
+import unittest
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import numpy as np
+import calculation
+from calculation import CalculationEngine
+import backtest
+from backtest import ReplayInputs, simulate, run_scenarios, expand_grid, grid_size, validate_params
+
+
+def hourly_inputs(hours, seed=7):
+    """Synthetic hourly weather: warm days, an occasional shower."""
+    rng = np.random.default_rng(seed)
+    start = datetime(2023, 4, 1)
+    stamps = [start + timedelta(hours=i) for i in range(hours)]
+    hour_of_day = np.arange(hours) % 24
+    return ReplayInputs(
+        timestamps=[t.strftime("%Y-%m-%d %H:%M") for t in stamps],
+        day=np.array([t.toordinal() for t in stamps], dtype=np.int64),
+        temperature=26 + 8 * np.sin((hour_of_day - 8) / 24 * 2 * np.pi) + rng.normal(0, 2, hours),
+        humidity=rng.uniform(20, 60, hours),
+        wind_speed=rng.uniform(0, 8, hours),
+        rain_amount=np.where(rng.random(hours) < 0.005, rng.uniform(0.5, 6, hours), 0.0),
+        forecast_rain=np.where(rng.random(hours) < 0.1, 8.0, 0.0),
+        interval_hours=np.ones(hours),
+        logged_water=0.0
+    )
+
+
+class TestBacktest(unittest.TestCase):
+    def test_matches_step_by_step_scheduler(self):
+        inputs = hourly_inputs(24 * 20)
+        params = {"et_correction_factor": 1.5, "min_watering_amount": 3.0}
+        result = simulate(inputs, params, max_points=len(inputs.timestamps))
+
+        engine = CalculationEngine(params)
+        deficit, irrigation, watered_day, total = 0.0, 0.0, None, 0.0
+        curve = []
+        for i in range(len(inputs.timestamps)):
+            required, amount, _, deficit, _ = engine.calculate_needs(
+                deficit,
+                {'temperature': inputs.temperature[i], 'humidity': inputs.humidity[i],
+                 'wind_speed': inputs.wind_speed[i], 'rain_amount': inputs.rain_amount[i]},
+                {'total_rain_next_24h': inputs.forecast_rain[i]},
+                inputs.interval_hours[i], irrigation, watered_day == inputs.day[i]
+            )
+            curve.append(round(deficit, 2))
+            irrigation = amount if required else 0.0
+            if required and amount > 0:
+                total += amount
+                watered_day = inputs.day[i]
+
+        self.assertGreater(result["waterings"], 0)
+        self.assertAlmostEqual(result["total_water"], round(total, 1))
+        self.assertEqual(result["curve"]["v"], curve)
+
+    def test_years_of_hourly_steps_are_fast(self):
+        inputs = hourly_inputs(24 * 365 * 3)
+        start = time.perf_counter()
+        result = simulate(inputs, {"soil_type": "Homokos"})
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(result["steps"], 24 * 365 * 3)
+        self.assertEqual(len(result["curve"]["v"]), backtest.DEFAULT_MAX_POINTS)
+
+    def test_process_pool_sweep_matches_serial_run(self):
+        inputs = hourly_inputs(24 * 30)
+        scenarios = expand_grid({"et_correction_factor": ["0.8", "1.2"], "soil_type": ["Homokos", "Agyagos"]})
+        self.assertEqual(len(scenarios), 4)
+        parallel = run_scenarios(inputs, scenarios, workers=2)
+        serial = run_scenarios(inputs, scenarios, workers=1)
+        for a, b in zip(parallel, serial):
+            self.assertEqual(a["params"], b["params"])
+            self.assertEqual(a["total_water"], b["total_water"])
+            self.assertEqual(a["curve"], b["curve"])
+
+    def test_zone_settings_are_the_base_of_each_scenario(self):
+        inputs = hourly_inputs(24 * 30)
+        zone = {"id": "back", "name": "Hátsó kert", "soil_type": "Homokos", "shade_percentage": 80}
+
+        def curve(result):
+            return result["total_water"], result["curve"]
+
+        explicit = simulate(inputs, {"soil_type": "Homokos", "shade_percentage": 80})
+        self.assertEqual(curve(simulate(inputs, {}, zone=zone)), curve(explicit))
+        self.assertNotEqual(curve(simulate(inputs, {})), curve(explicit))
+        # Scenario overrides win over the zone
+        self.assertEqual(curve(simulate(inputs, {"shade_percentage": 0.0}, zone=zone)),
+                         curve(simulate(inputs, {"soil_type": "Homokos"})))
+        pooled = run_scenarios(inputs, [{}, {"et_correction_factor": "1.2"}], workers=2, zone=zone)
+        self.assertEqual(curve(pooled[0]), curve(explicit))
+
+    def test_unknown_zone_is_rejected(self):
+        self.assertEqual(backtest.zone_settings()["id"], backtest.zone_settings(None)["id"])
+        with self.assertRaises(ValueError):
+            backtest.zone_settings("no-such-zone")
+
+    def test_grid_size_without_expanding(self):
+        grid = {"et_correction_factor": ["0.8", "1.2"], "soil_type": ["Homokos", "Agyagos", "Vályog"], "shade_percentage": 20}
+        self.assertEqual(grid_size(grid), len(expand_grid(grid)))
+        self.assertEqual(grid_size({}), 1)
+        self.assertEqual(grid_size({name: list(range(100)) for name in backtest.PARAMETERS}), 100 ** len(backtest.PARAMETERS))
+
+    def test_unknown_parameter_is_rejected(self):
+        self.assertEqual(validate_params({"force_daily_watering": "true"}), {"force_daily_watering": True})
+        with self.assertRaises(ValueError):
+            validate_params({"latitude": 47.5})
+
+
+if __name__ == '__main__':
+    unittest.main()
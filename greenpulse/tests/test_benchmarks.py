@@ -0,0 +1,94 @@
+import unittest
+import sys
+import os
+
+# Add benchmarks and src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../benchmarks')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from fakes import import_with_database
+from bench import compare
+from standins import SQLiteDatabase
+
+# web.charts and ingest import the `db` singleton; the statements run on SQLite here
+charts, ingest = import_with_database(None, "web.charts", "ingest")
+
+
+def results(**medians):
+    return {"results": {name: {"median_ms": value} for name, value in medians.items()}}
+
+
+class TestCompare(unittest.TestCase):
+    def test_slowdown_over_threshold_is_a_regression(self):
+        rows, regressed = compare(results(a=10.0, b=10.0), results(a=11.0, b=12.0), threshold=0.15)
+        self.assertTrue(regressed)
+        self.assertEqual({row[0]: row[4] for row in rows}, {"a": "ok", "b": "REGRESSION"})
+
+    def test_new_missing_and_faster(self):
+        rows, regressed = compare(results(a=10.0, gone=1.0), results(a=5.0, added=1.0))
+        self.assertFalse(regressed)
+        self.assertEqual({row[0]: row[4] for row in rows}, {"a": "faster", "added": "new", "gone": "missing"})
+
+
+class TestSQLiteStandIn(unittest.TestCase):
+    def test_runs_mariadb_chart_statements(self):
+        BUCKET_SQL = charts.BUCKET_SQL
+        db = SQLiteDatabase()
+        db.seed(20)
+        with db.cursor(dictionary=True) as cursor:
+            cursor.execute(f"""
+                SELECT {BUCKET_SQL['weekly']} AS bucket, MAX(deficit) AS deficit
+                FROM irrigation_logs
+                WHERE event_type = 'suggestion' AND timestamp BETWEEN %s AND %s
+                GROUP BY bucket ORDER BY bucket
+            """, ("2000-01-01 00:00:00", "2100-01-01 00:00:00"))
+            rows = cursor.fetchall()
+        self.assertGreaterEqual(len(rows), 3)
+        self.assertRegex(rows[0]["bucket"], r"^\d{4}-\d{2}-\d{2}$")
+
+    def test_daily_summary_upsert_and_day_buckets(self):
+        DAILY_IRRIGATION_UPSERT, DAY_BUCKET_SQL = ingest.DAILY_IRRIGATION_UPSERT, charts.DAY_BUCKET_SQL
+        db = SQLiteDatabase()
+        db.seed(20)
+        with db.cursor() as cursor:
+            cursor.execute("SELECT day, irrigation_total, irrigation_events FROM daily_summary ORDER BY day DESC LIMIT 1")
+            day, total, events = cursor.fetchone()
+            cursor.executemany(DAILY_IRRIGATION_UPSERT, [(day, "default", 2.5, 1), (day, "back", 1.0, 1)])
+        with db.cursor(dictionary=True) as cursor:
+            cursor.execute("SELECT zone_id, irrigation_total, irrigation_events FROM daily_summary WHERE day = %s "
+                           "ORDER BY zone_id", (day,))
+            self.assertEqual(cursor.fetchall(), [
+                {"zone_id": "back", "irrigation_total": 1.0, "irrigation_events": 1},
+                {"zone_id": "default", "irrigation_total": total + 2.5, "irrigation_events": events + 1},
+            ])
+            cursor.execute(f"""
+                SELECT {DAY_BUCKET_SQL['weekly']} AS bucket, MAX(max_deficit) AS deficit
+                FROM daily_summary WHERE day BETWEEN %s AND %s GROUP BY bucket ORDER BY bucket
+            """, ("2000-01-01", "2100-01-01"))
+            rows = cursor.fetchall()
+        self.assertGreaterEqual(len(rows), 3)
+        self.assertRegex(rows[0]["bucket"], r"^\d{4}-\d{2}-\d{2}$")
+
+    def test_irrigation_ledger_upsert(self):
+        from datetime import date
+        IRRIGATION_LEDGER_UPSERT = ingest.IRRIGATION_LEDGER_UPSERT
+        db = SQLiteDatabase()
+        db.seed(1)
+        with db.cursor() as cursor:
+            cursor.executemany(IRRIGATION_LEDGER_UPSERT, [
+                ("default", 2.0, date(2026, 7, 1), 1),
+                ("default", 3.0, date(2026, 7, 2), 2),
+                ("default", 1.0, date(2026, 7, 1), 1),   # late message of the day before
+                ("default", 0.5, date(2026, 7, 2), 1),
+                ("back", 4.0, date(2026, 7, 2), 1),
+            ])
+        with db.cursor(dictionary=True) as cursor:
+            cursor.execute("SELECT zone_id, pending_irrigation, watered_day, waterings_today FROM system_state "
+                           "ORDER BY zone_id")
+            rows = cursor.fetchall()
+        self.assertEqual([(row["zone_id"], row["pending_irrigation"], str(row["watered_day"]), row["waterings_today"])
+                          for row in rows], [("back", 4.0, "2026-07-02", 1), ("default", 6.5, "2026-07-02", 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -23,7 +23,18 @@ class MockConfig:
         return self.data.get(key, default)
 
 import config
-config.config = MockConfig()
+
+_original_configs = None
+
+def setUpModule():
+    # The mock stays inside this module: modules imported by other test
+    # files read their settings from config.config at import time
+    global _original_configs
+    _original_configs = config.config, calculation.config
+    config.config = MockConfig()
+
+def tearDownModule():
+    config.config, calculation.config = _original_configs
 
 class TestCalculation(unittest.TestCase):
     def setUp(self):
@@ -193,5 +204,104 @@ class TestSoilTypes(unittest.TestCase):
         print(f"Soil Test (Clay): Loam Amt={amt_l}, Clay Amt={amt_c}")
         self.assertLess(amt_c, amt_l, "Clay soil should require less water")
 
+class TestBatchCalculation(unittest.TestCase):
+    def setUp(self):
+        self.mock_config = MockConfig()
+        self.mock_config.data.update({"soil_type": "Homokos", "shade_percentage": 30, "et_correction_factor": 1.3})
+        calculation.config = self.mock_config
+
+    def assert_matches_scalar(self, engine, samples):
+        columns = list(zip(*samples))
+        batch = engine.calculate_needs_batch(*columns)
+        for i, (deficit, temp, humidity, wind, rain, forecast_rain, hours, irrigation, watered) in enumerate(samples):
+            required, amount, _, new_deficit, _ = engine.calculate_needs(
+                deficit,
+                {'temperature': temp, 'humidity': humidity, 'wind_speed': wind, 'rain_amount': rain},
+                {'total_rain_next_24h': forecast_rain},
+                hours, irrigation, watered
+            )
+            self.assertEqual(bool(batch.required[i]), required, samples[i])
+            self.assertEqual(batch.amount[i], amount, samples[i])
+            self.assertEqual(batch.new_deficit[i], new_deficit, samples[i])
+
+    def samples(self):
+        import itertools
+        return list(itertools.product(
+            [0.0, 4.0, 12.0, 40.0],     # starting deficit
+            [5.0, 10.0, 28.0, 38.0],    # temperature
+            [20.0, 90.0],               # humidity
+            [0.0, 12.0],                # wind speed
+            [0.0, 1.5],                 # rain (1h)
+            [0.0, 8.0],                 # forecast rain
+            [0.0, 1.0, 3.0],            # interval hours
+            [0.0, 10.0],                # irrigation
+            [False, True]               # watered today
+        ))
+
+    def test_matches_scalar_path(self):
+        for grass in ("Univerzális keverék", "Sportfű", "Szárazságtűrő"):
+            self.mock_config.data["grass_type"] = grass
+            self.assert_matches_scalar(CalculationEngine(), self.samples())
+
+    def test_matches_scalar_path_with_forced_watering(self):
+        self.mock_config.data.update({"force_daily_watering": True, "force_watering_amount": 6.0})
+        self.assert_matches_scalar(CalculationEngine(), self.samples())
+
+    def test_scalars_are_broadcast(self):
+        import numpy as np
+        engine = CalculationEngine()
+        batch = engine.calculate_needs_batch(np.array([0.0, 30.0]), 30, 40, 3, 0, 0, 1.0)
+        self.assertEqual(batch.required.tolist(), [False, True])
+        self.assertEqual(batch.amount[1], 25.0)
+
+    def test_half_way_amounts_round_the_same(self):
+        import numpy as np
+        # No ET at 0 °C: the amount is the starting deficit, rounded to 0.1 mm.
+        # round() and np.round() differ on 0.35-style values, 5.25 is an exact binary half
+        deficits = [5.25, 5.35, 6.45, 7.15, 12.05, 24.95]
+        engine = CalculationEngine()
+        batch = engine.calculate_needs_batch(np.array(deficits), 0, 50, 0, 0, 0, 1.0)
+        expected = [5.3, 5.4, 6.5, 7.2, 12.1, 25.0]
+        self.assertEqual(batch.amount.tolist(), expected)
+        for deficit, amount in zip(deficits, expected):
+            _, scalar_amount, _, _, _ = engine.calculate_needs(
+                deficit, {'temperature': 0, 'humidity': 50, 'wind_speed': 0, 'rain_amount': 0},
+                {'total_rain_next_24h': 0}, 1.0)
+            self.assertEqual(scalar_amount, amount, deficit)
+            self.assertEqual(engine.decide(deficit, 0), (True, amount))
+
+class TestZones(unittest.TestCase):
+    def setUp(self):
+        self.mock_config = MockConfig()
+        calculation.config = self.mock_config
+
+    def test_zone_overrides_top_level_settings(self):
+        engine = CalculationEngine({"id": "shady", "soil_type": "Agyagos", "shade_percentage": 60, "grass_type": None})
+        self.assertEqual(engine.zone_id, "shady")
+        self.assertEqual(engine.soil_type, "Agyagos")
+        self.assertEqual(engine.shade_pct, 60)
+        self.assertEqual(engine.grass_type, "Univerzális keverék")
+        self.assertEqual(engine.min_amount, 5)
+
+    def test_zone_list_from_options(self):
+        from config import Config, DEFAULT_ZONE_ID
+        options = Config().options
+        try:
+            Config().options = {"mqtt_topic_command": "gp/command"}
+            self.assertEqual(Config().zones, [{"id": DEFAULT_ZONE_ID, "name": "Alapértelmezett", "mqtt_topic_command": "gp/command"}])
+
+            Config().options["zones"] = [
+                {"id": "front", "name": "Előkert", "soil_type": "Homokos"},
+                {"id": "back", "mqtt_topic_command": "garden/back"},
+                {"id": "front"}
+            ]
+            zones = Config().zones
+            self.assertEqual([zone["id"] for zone in zones], ["front", "back"])
+            self.assertEqual(zones[0]["mqtt_topic_command"], "gp/command/front")
+            self.assertEqual(zones[1]["mqtt_topic_command"], "garden/back")
+            self.assertEqual(zones[1]["name"], "back")
+        finally:
+            Config().options = options
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+import sys
+import os
+import types
+import threading
+from unittest import mock
+from datetime import datetime
+
+from fakes import FakeDatabase, import_with_database
+
+# dashboard imports `db` from database; the tests pass their own stand-in
+dashboard, = import_with_database(None, "dashboard")
+DashboardState = dashboard.DashboardState
+
+
+class TestDashboardState(unittest.TestCase):
+    def setUp(self):
+        zones = [{"id": "front", "name": "Előkert"}, {"id": "back", "name": "Hátsókert"}]
+        patcher = mock.patch.object(dashboard, "config", types.SimpleNamespace(zones=zones))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.state = DashboardState(None)
+
+    def test_rebuild_from_database(self):
+        suggestion_time = datetime(2026, 7, 1, 12, 0)
+        self.state.db = FakeDatabase(script=[
+            {"timestamp": suggestion_time, "water_amount": 4.0, "reason": "Hiány", "raw_data": '{"et0": 5.1}'},
+            {"timestamp": datetime(2026, 6, 30, 6, 0), "water_amount": 10.0, "notes": "ok"},
+            [{"timestamp": datetime(2026, 6, 30, 12, 0), "temp_max": 30.0}],
+            [{"zone_id": "front", "water_deficit": 3.5, "last_calculated": suggestion_time}],
+            {"water_amount": 4.0, "reason": "Hiány", "timestamp": suggestion_time},
+            None
+        ])
+        self.state.rebuild()
+
+        snapshot = self.state.snapshot()
+        self.assertEqual(snapshot["version"], 1)
+        self.assertEqual(snapshot["last_suggestion"]["raw_data"], {"et0": 5.1})
+        self.assertEqual(snapshot["last_watering"]["water_amount"], 10.0)
+        self.assertEqual(len(snapshot["weather_history"]), 1)
+        self.assertEqual(snapshot["zones"][0]["state"]["water_deficit"], 3.5)
+        self.assertIsNone(snapshot["zones"][1]["last_suggestion"])
+
+    def test_writers_replace_the_snapshot(self):
+        before = self.state.snapshot()
+        now = datetime(2026, 7, 2, 8, 0)
+        self.state.record_suggestions([("back", 2.5, 0, "Elég nedves", {"et0": 3.0})], now)
+        self.state.record_weather({"temperature": 21.0}, None, [
+            {"date": "2026-07-01", "temp_max": 28.0}, {"date": "2026-06-30", "temp_max": 30.0}])
+        self.state.record_watering(now, "front", "manual", 8.0, "Kézi")
+        self.state.record_watering(datetime(2026, 7, 1), "front", "manual", 1.0, "régebbi")
+
+        snapshot = self.state.snapshot()
+        self.assertEqual(snapshot["version"], 3)
+        self.assertEqual(before["version"], 0)
+        self.assertIsNone(before["last_suggestion"])
+        self.assertEqual(snapshot["last_suggestion"]["raw_data"], {"et0": 3.0})
+        self.assertEqual(snapshot["zones"][1]["state"]["water_deficit"], 2.5)
+        self.assertIsNone(snapshot["zones"][0]["state"])
+        self.assertEqual(snapshot["current_weather"], {"temperature": 21.0})
+        self.assertIsNone(snapshot["forecast_weather"])
+        self.assertEqual([row["timestamp"].day for row in snapshot["weather_history"]], [1, 30])
+        self.assertEqual(snapshot["last_watering"]["notes"], "Kézi")
+
+    def test_concurrent_writers_lose_no_version(self):
+        def write(n):
+            for i in range(200):
+                self.state.record_watering(datetime(2026, 7, 1, n, 0, i % 60), "front", "manual", i, "")
+
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Older events are ignored, so the last watering is the latest one written
+        self.assertEqual(self.state.snapshot()["last_watering"]["timestamp"], datetime(2026, 7, 1, 3, 0, 59))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,269 @@
+import unittest
+import sys
+import os
+import threading
+import time
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import mysql.connector
+import database
+
+MIGRATIONS = [
+    (1, "One", ["CREATE TABLE one"]),
+    (2, "Two", ["CREATE TABLE two", "CREATE INDEX two_index"]),
+    (3, "Three", ["CREATE TABLE three"]),
+]
+
+
+class MigrationCursor:
+    """Answers the runner's bookkeeping queries and records everything else."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.result = None
+
+    def execute(self, query, params=None):
+        query = " ".join(query.split())
+        self.connection.log.append(query)
+        if query in self.connection.failing:
+            raise mysql.connector.Error(f"failed: {query}")
+        if query.startswith("SELECT COALESCE(MAX(version)"):
+            self.result = (max(self.connection.applied, default=0),)
+        elif query.startswith("INSERT INTO schema_version"):
+            self.connection.applied.append(params[0])
+        else:
+            self.result = (1,)
+
+    def fetchone(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class MigrationConnection:
+    def __init__(self, applied=(), failing=()):
+        self.applied = list(applied)
+        self.failing = set(failing)
+        self.log = []
+        self.commits = 0
+        self.database = None
+
+    def cursor(self, dictionary=False):
+        return MigrationCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def close(self):
+        pass
+
+    def statements(self):
+        return [query for query in self.log if query.startswith(("CREATE TABLE one", "CREATE TABLE two",
+                                                                   "CREATE INDEX", "CREATE TABLE three"))]
+
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        self.original_migrations = database.MIGRATIONS
+        self.original_connect = database.mysql.connector.connect
+        database.MIGRATIONS = MIGRATIONS
+
+    def tearDown(self):
+        database.MIGRATIONS = self.original_migrations
+        database.mysql.connector.connect = self.original_connect
+
+    def migrate(self, connection):
+        database.Database()._migrate(connection, connection.cursor())
+
+    def test_pending_versions_are_applied_in_order(self):
+        connection = MigrationConnection()
+        self.migrate(connection)
+        self.assertEqual(connection.statements(),
+                         ["CREATE TABLE one", "CREATE TABLE two", "CREATE INDEX two_index", "CREATE TABLE three"])
+        self.assertEqual(connection.applied, [1, 2, 3])
+        self.assertEqual(connection.commits, 3)
+        self.assertEqual(connection.log[-1], "SELECT RELEASE_LOCK('greenpulse_migrate')")
+
+    def test_applied_versions_are_skipped(self):
+        connection = MigrationConnection(applied=[1, 2])
+        self.migrate(connection)
+        self.assertEqual(connection.statements(), ["CREATE TABLE three"])
+        self.assertEqual(connection.applied, [1, 2, 3])
+
+    def test_failure_stops_the_run_and_the_connect(self):
+        connection = MigrationConnection(applied=[1], failing=["CREATE INDEX two_index"])
+        database.mysql.connector.connect = lambda **kwargs: connection
+        db = database.Database()
+
+        self.assertFalse(db.connect())
+        self.assertIsNone(db.pool)
+        # Version 2 is not recorded and version 3 never starts; the lock is released
+        self.assertEqual(connection.statements(), ["CREATE TABLE two", "CREATE INDEX two_index"])
+        self.assertEqual(connection.applied, [1])
+        self.assertEqual(connection.log[-1], "SELECT RELEASE_LOCK('greenpulse_migrate')")
+
+        connection.failing.clear()
+        self.assertTrue(db.connect())
+        self.assertEqual(connection.applied, [1, 2, 3])
+        db.pool.close()
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.alive = True
+        self.closed = False
+        self.pings = 0
+
+    def is_connected(self):
+        self.pings += 1
+        return self.alive
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnector:
+    """Connection factory for ConnectionPool that keeps every connection it made."""
+
+    def __init__(self):
+        self.created = []
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            connection = FakeConnection(len(self.created))
+            self.created.append(connection)
+            return connection
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.connector = FakeConnector()
+
+    def pool(self, **kwargs):
+        return database.ConnectionPool(self.connector, **kwargs)
+
+    def test_checkout_waits_and_times_out(self):
+        pool = self.pool(size=1, checkout_timeout=0.2)
+        first = pool.acquire()
+        start = time.monotonic()
+        with self.assertRaises(database.PoolTimeout):
+            pool.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+        # A connection released while waiting is handed to the waiter
+        threading.Timer(0.1, pool.release, (first,)).start()
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual(len(self.connector.created), 1)
+
+    def test_stale_connection_is_pinged_and_replaced(self):
+        pool = self.pool(size=2, health_check_interval=0.05)
+        connection = pool.acquire()
+        pool.release(connection)
+        # Recently used: handed out again without a ping
+        self.assertIs(pool.acquire(), connection)
+        self.assertEqual(connection.pings, 0)
+        pool.release(connection)
+
+        time.sleep(0.1)
+        connection.alive = False
+        replacement = pool.acquire()
+        self.assertIsNot(replacement, connection)
+        self.assertEqual(connection.pings, 1)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()["discarded"], 1)
+
+    def test_connection_broken_in_use_is_discarded(self):
+        pool = self.pool(size=1)
+        with self.assertRaises(mysql.connector.Error):
+            with pool.connection() as connection:
+                connection.alive = False
+                raise mysql.connector.Error("Lost connection to MySQL server during query")
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()["idle"], 0)
+
+        # A query error on a healthy connection keeps it
+        with self.assertRaises(mysql.connector.Error):
+            with pool.connection() as healthy:
+                raise mysql.connector.Error("Duplicate entry")
+        self.assertIsNot(healthy, connection)
+        self.assertFalse(healthy.closed)
+        with pool.connection() as again:
+            self.assertIs(again, healthy)
+        self.assertEqual(pool.stats()["in_use"], 0)
+
+    def test_pool_never_grows_above_its_size(self):
+        pool = self.pool(size=3, checkout_timeout=5)
+        in_use = []
+        peak = []
+        lock = threading.Lock()
+
+        def worker():
+            for _ in range(5):
+                with pool.connection() as connection:
+                    with lock:
+                        in_use.append(connection)
+                        peak.append(len(in_use))
+                    time.sleep(0.005)
+                    with lock:
+                        in_use.remove(connection)
+
+        threads = [threading.Thread(target=worker) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(max(peak), 3)
+        self.assertLessEqual(len(self.connector.created), 3)
+        stats = pool.stats()
+        self.assertEqual(stats["checkouts"], 50)
+        self.assertEqual(stats["in_use"], 0)
+        self.assertLessEqual(stats["idle"], 3)
+
+
+class ExplainConnection:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.log = []
+
+    def cursor(self, dictionary=False):
+        connection = self
+
+        class Cursor:
+            def execute(self, query, params=None):
+                connection.log.append(query)
+                if connection.fail:
+                    raise mysql.connector.Error("EXPLAIN denied")
+
+            def fetchall(self):
+                return [{"table": "irrigation_logs", "type": "range", "Extra": b"Using index"}]
+
+            def close(self):
+                pass
+        return Cursor()
+
+    def rollback(self):
+        self.log.append("ROLLBACK")
+
+
+class TestExplainSlow(unittest.TestCase):
+    def test_explain_transaction_is_ended(self):
+        for fail in (False, True):
+            connection = ExplainConnection(fail)
+            database.Database()._explain_slow(connection, [
+                ("SELECT * FROM irrigation_logs WHERE id = %s", (1,), 450.0, 1),
+                ("SELECT * FROM daily_summary", None, 320.0, 10),
+            ])
+            # The pooled connection must not go back with the EXPLAINs' transaction open
+            self.assertEqual(connection.log, ["EXPLAIN SELECT * FROM irrigation_logs WHERE id = %s",
+                                              "EXPLAIN SELECT * FROM daily_summary", "ROLLBACK"])
+
+
+if __name__ == '__main__':
+    unittest.main()
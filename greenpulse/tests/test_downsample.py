@@ -0,0 +1,36 @@
+import unittest
+import sys
+import os
+import math
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from downsample import lttb
+
+
+class TestLTTB(unittest.TestCase):
+    def test_short_series_unchanged(self):
+        xs, ys = lttb(["a", "b", "c"], [1, 2, 3], 10)
+        self.assertEqual(xs, ["a", "b", "c"])
+        self.assertEqual(ys, [1, 2, 3])
+
+    def test_reduces_to_threshold_and_keeps_endpoints(self):
+        ys = [math.sin(i / 50.0) for i in range(8760)]
+        xs = list(range(8760))
+        out_x, out_y = lttb(xs, ys, 500)
+        self.assertEqual(len(out_x), 500)
+        self.assertEqual(out_x[0], 0)
+        self.assertEqual(out_x[-1], 8759)
+        self.assertEqual(out_x, sorted(out_x))
+
+    def test_keeps_spike(self):
+        ys = [0.0] * 1000
+        ys[437] = 25.0
+        out_x, out_y = lttb(list(range(1000)), ys, 50)
+        self.assertIn(437, out_x)
+        self.assertEqual(max(out_y), 25.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
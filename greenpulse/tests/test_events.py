@@ -0,0 +1,74 @@
+import unittest
+import sys
+import os
+import json
+import asyncio
+import threading
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from events import Event, EventHub
+
+
+class TestEventHub(unittest.TestCase):
+    def test_encode(self):
+        event = Event(7, "suggestion", '{"zone_id": 1}')
+        self.assertEqual(event.encode(), 'id: 7\nevent: suggestion\ndata: {"zone_id": 1}\n\n')
+
+    def test_publish_reaches_subscribers(self):
+        async def run():
+            hub = EventHub()
+            first, second = hub.subscribe(), hub.subscribe()
+            hub.publish("watering", {"zone_id": 1, "water_amount": 5.0})
+            events = [await asyncio.wait_for(s.get(), 1) for s in (first, second)]
+            hub.unsubscribe(first)
+            hub.unsubscribe(second)
+            return events, hub.stats()
+
+        events, stats = asyncio.run(run())
+        self.assertEqual([e.type for e in events], ["watering", "watering"])
+        self.assertEqual(json.loads(events[0].data)["water_amount"], 5.0)
+        self.assertEqual(stats, {"clients": 0, "published": 1, "dropped": 0})
+
+    def test_publish_from_another_thread(self):
+        async def run():
+            hub = EventHub()
+            subscription = hub.subscribe()
+            thread = threading.Thread(target=hub.publish, args=("weather", {"current": {"temperature": 21.5}}))
+            thread.start()
+            thread.join()
+            return await asyncio.wait_for(subscription.get(), 1)
+
+        self.assertEqual(asyncio.run(run()).type, "weather")
+
+    def test_slow_client_drops_oldest(self):
+        async def run():
+            hub = EventHub(buffer_size=3)
+            subscription = hub.subscribe()
+            for i in range(5):
+                hub.publish("suggestion", {"n": i})
+            await asyncio.sleep(0)
+            received = [json.loads((await subscription.get()).data)["n"] for _ in range(3)]
+            return received, subscription.dropped, hub.stats()["dropped"]
+
+        received, dropped, total = asyncio.run(run())
+        self.assertEqual(received, [2, 3, 4])
+        self.assertEqual(dropped, 2)
+        self.assertEqual(total, 2)
+
+    def test_reconnect_replays_missed_events(self):
+        async def run():
+            hub = EventHub(replay_size=10)
+            for i in range(4):
+                hub.publish("suggestion", {"n": i})
+            subscription = hub.subscribe(last_event_id=2)
+            return [(await subscription.get()).id for _ in range(2)], subscription.queue.empty()
+
+        ids, empty = asyncio.run(run())
+        self.assertEqual(ids, [3, 4])
+        self.assertTrue(empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,217 @@
+import unittest
+import sys
+import os
+import json
+import time
+from contextlib import contextmanager
+
+import mysql.connector
+
+from fakes import FakeDatabase, import_with_database
+
+# ingest imports the `db` singleton; the tests pass their own database instead
+ingest, = import_with_database(None, "ingest")
+FeedbackWriter = ingest.FeedbackWriter
+
+
+def message(**payload):
+    return json.dumps(payload).encode()
+
+
+class FailingDatabase(FakeDatabase):
+    """Raises on the first `failures` cursors, like a database that is down."""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def cursor(self, dictionary=False):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database is down")
+        return super().cursor(dictionary)
+
+
+class RejectingDatabase(FakeDatabase):
+    """Rejects every statement with a row whose notes are "reject", like a strict mode data error."""
+
+    @contextmanager
+    def cursor(self, dictionary=False):
+        with super().cursor(dictionary) as cursor:
+            executemany = cursor.executemany
+
+            def checked(query, rows):
+                rows = list(rows)
+                if any("reject" in row for row in rows):
+                    raise mysql.connector.DataError("Data too long for column")
+                executemany(query, rows)
+            cursor.executemany = checked
+            yield cursor
+
+
+class TestFeedbackWriter(unittest.TestCase):
+    def test_burst_is_written_in_batches(self):
+        database = FakeDatabase()
+        writer = FeedbackWriter(database, batch_size=10, flush_interval=5)
+        for i in range(25):
+            writer.submit("feedback", message(id=i, amount=1.5))
+        writer.start()
+        writer.stop()
+
+        self.assertEqual([len(batch) for batch in database.written("irrigation_logs")], [10, 10, 5])
+        row = database.written("irrigation_logs")[0][0]
+        self.assertEqual(row[1:5], ("default", "watering_end", 1.5, ""))
+        stats = writer.stats()
+        self.assertEqual(stats["written"], 25)
+        self.assertEqual(stats["batches"], 3)
+        self.assertEqual(stats["queue_depth"], 0)
+        self.assertEqual(database.changes[0][0], "irrigation_logs")
+        # Each batch adds its irrigation to the zone's pending ledger amount
+        ledger = database.written("system_state")
+        self.assertEqual([(zone_id, water, events) for batch in ledger for zone_id, water, _, events in batch],
+                         [("default", 15.0, 10), ("default", 15.0, 10), ("default", 7.5, 5)])
+
+    def test_partial_batch_is_flushed_after_interval(self):
+        database = FakeDatabase()
+        writer = FeedbackWriter(database, batch_size=100, flush_interval=0.1)
+        writer.start()
+        writer.submit("feedback", message(type="Manual watering", amount=3))
+        time.sleep(0.5)
+        self.assertEqual(len(database.written("irrigation_logs")), 1)
+        self.assertEqual(database.written("irrigation_logs")[0][0][2], "manual")
+        writer.stop()
+
+    def test_redelivered_messages_are_skipped(self):
+        database = FakeDatabase()
+        writer = FeedbackWriter(database)
+        writer.submit("feedback", message(id="a", amount=1))
+        writer.submit("feedback", message(id="a", amount=1))
+        writer.submit("feedback", message(amount=2))
+        writer.submit("feedback", message(amount=2))
+        writer.submit("feedback", b"not json")
+        writer.start()
+        writer.stop()
+
+        self.assertEqual(sum(len(batch) for batch in database.written("irrigation_logs")), 2)
+        stats = writer.stats()
+        self.assertEqual(stats["duplicates"], 2)
+        self.assertEqual(stats["invalid"], 1)
+
+    def test_zone_from_payload_or_sub_topic(self):
+        database = FakeDatabase()
+        writer = FeedbackWriter(database, feedback_topic="greenpulse/feedback", default_zone="front")
+        writer.submit("greenpulse/feedback", message(id=1, zone_id="back"))
+        writer.submit("greenpulse/feedback/side", message(id=2))
+        writer.submit("greenpulse/feedback", message(id=3))
+        writer.start()
+        writer.stop()
+        self.assertEqual([row[1] for row in database.written("irrigation_logs")[0]], ["back", "side", "front"])
+
+    def test_unknown_zone_is_skipped(self):
+        database = FakeDatabase()
+        writer = FeedbackWriter(database, feedback_topic="greenpulse/feedback", default_zone="front",
+                                zone_ids=["front", "back"])
+        writer.submit("greenpulse/feedback", message(id=1, zone_id="back", amount=1))
+        writer.submit("greenpulse/feedback/side", message(id=2, amount=2))
+        writer.submit("greenpulse/feedback", message(id=3, zone_id="x" * 100, amount=3))
+        writer.submit("greenpulse/feedback", message(id=4, amount=4))
+        writer.start()
+        writer.stop()
+
+        self.assertEqual([row[1] for row in database.written("irrigation_logs")[0]], ["back", "front"])
+        self.assertEqual(sorted(row[0] for row in database.written("system_state")[0]), ["back", "front"])
+        self.assertEqual(writer.stats()["invalid"], 2)
+
+    def test_daily_summary_totals_per_zone(self):
+        database = FakeDatabase()
+        writer = FeedbackWriter(database, feedback_topic="feedback")
+        writer.submit("feedback", message(amount=2.5))
+        writer.submit("feedback", message(amount="1.5", notes="x"))
+        writer.submit("feedback/back", message(amount=4))
+        writer.submit("feedback/back", message(amount="n/a"))
+        writer.start()
+        writer.stop()
+
+        summary, = database.written("daily_summary")
+        self.assertEqual([row[1:] for row in summary], [("back", 4.0, 2), ("default", 4.0, 2)])
+
+    def test_ledger_is_locked_before_daily_summary(self):
+        # Same lock order as Database.calculate_zones, which locks system_state first
+        database = FakeDatabase()
+        writer = FeedbackWriter(database)
+        writer.submit("feedback", message(amount=1))
+        writer.start()
+        writer.stop()
+        tables = [table for query, _ in database.executed
+                  for table in ("irrigation_logs", "system_state", "daily_summary") if f"INTO {table}" in query]
+        self.assertEqual(tables, ["irrigation_logs", "system_state", "daily_summary"])
+
+    def test_bad_amount_is_stored_as_zero(self):
+        database = FakeDatabase()
+        writer = FeedbackWriter(database)
+        writer.submit("feedback", message(id=1, amount="n/a"))
+        writer.submit("feedback", message(id=2, amount=2))
+        writer.start()
+        writer.stop()
+        self.assertEqual([row[3] for row in database.written("irrigation_logs")[0]], [0.0, 2.0])
+
+    def test_structured_notes_are_stored_as_text(self):
+        database = FakeDatabase()
+        writer = FeedbackWriter(database)
+        writer.submit("feedback", message(id=1, notes={"valve": 2}))
+        writer.submit("feedback", message(id=2, notes=["a", "b"]))
+        writer.submit("feedback", message(id=3, notes=None))
+        writer.submit("feedback", message(id=4, notes=7))
+        writer.start()
+        writer.stop()
+        self.assertEqual([row[4] for row in database.written("irrigation_logs")[0]],
+                         ['{"valve": 2}', '["a", "b"]', '', '7'])
+
+    def test_row_the_database_rejects_only_drops_itself(self):
+        database = RejectingDatabase()
+        writer = FeedbackWriter(database, max_retries=3)
+        writer.submit("feedback", message(id=1, amount=1))
+        writer.submit("feedback", message(id=2, amount=2, notes="reject"))
+        writer.submit("feedback", message(id=3, amount=3))
+        start = time.monotonic()
+        writer.start()
+        writer.stop()
+
+        # Stored one by one at once, without the retry back-off
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual([row[3] for batch in database.written("irrigation_logs") for row in batch], [1.0, 3.0])
+        stats = writer.stats()
+        self.assertEqual((stats["written"], stats["failed"]), (2, 1))
+        self.assertEqual(sum(water for batch in database.written("system_state") for _, water, _, _ in batch), 4.0)
+
+        # The rejected message was not remembered as seen
+        writer.submit("feedback", message(id=2, amount=2))
+        writer.start()
+        writer.stop()
+        self.assertEqual(writer.stats()["written"], 3)
+
+    def test_redelivery_of_a_failed_batch_is_written(self):
+        database = FailingDatabase(failures=1)
+        writer = FeedbackWriter(database, max_retries=1)
+        writer.submit("feedback", message(id="a", amount=1))
+        writer.start()
+        writer.stop()
+        self.assertEqual(writer.stats()["failed"], 1)
+
+        writer.submit("feedback", message(id="a", amount=1))
+        writer.start()
+        writer.stop()
+        self.assertEqual(len(database.written("irrigation_logs")), 1)
+        self.assertEqual(writer.stats()["duplicates"], 0)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        writer = FeedbackWriter(FakeDatabase(), queue_size=2)
+        start = time.monotonic()
+        results = [writer.submit("feedback", message(id=i)) for i in range(4)]
+        self.assertLess(time.monotonic() - start, 0.05)
+        self.assertEqual(results, [True, True, False, False])
+        self.assertEqual(writer.stats()["dropped"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import sys
+import os
+import asyncio
+
+from fakes import FakeDatabase, import_with_database
+
+import metrics
+import httpx
+
+POOL = {"size": 2, "in_use": 1, "idle": 1, "checkouts": 7, "timeouts": 0}
+
+# web.app needs a `db` object; use an in-memory stand-in instead of MariaDB
+web_app, web_logs = import_with_database(FakeDatabase(pool=POOL), "web.app", "web.logs")
+
+class TestRegistry(unittest.TestCase):
+    def test_counter_and_histogram_exposition(self):
+        registry = metrics.Registry()
+        requests = registry.counter("test_requests_total", "Requests.", ["path"])
+        latency = registry.histogram("test_latency_seconds", "Latency.", buckets=(0.1, 1.0))
+        requests.labels('/a"b').inc()
+        requests.labels('/a"b').inc(2)
+        latency.observe(0.05)
+        latency.observe(0.5)
+        latency.observe(5)
+
+        text = registry.render()
+        self.assertIn("# TYPE test_requests_total counter", text)
+        self.assertIn('test_requests_total{path="/a\\"b"} 3', text)
+        self.assertIn('test_latency_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('test_latency_seconds_bucket{le="1"} 2', text)
+        self.assertIn('test_latency_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn("test_latency_seconds_count 3", text)
+        self.assertIn("test_latency_seconds_sum 5.55", text)
+
+    def test_failing_collector_does_not_break_scrape(self):
+        registry = metrics.Registry()
+        registry.counter("test_ok_total", "Ok.").inc()
+
+        def broken():
+            raise RuntimeError("boom")
+        registry.add_collector(broken)
+        text = registry.render()
+        self.assertIn("test_ok_total 1", text)
+        self.assertIn("collector broken failed", text)
+
+    def test_track_job_counts_failures(self):
+        @metrics.track_job("test_job")
+        def job():
+            raise ValueError("fail")
+
+        with self.assertRaises(ValueError):
+            job()
+        self.assertEqual(metrics.JOB_FAILURES.labels("test_job").value, 1)
+        self.assertEqual(metrics.JOB_DURATION.labels("test_job").count, 1)
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.original_db = web_app.db, web_logs.db
+        web_app.db = web_logs.db = FakeDatabase(pool=POOL)
+        web_app.chart_cache.invalidate()
+
+    def tearDown(self):
+        web_app.db, web_logs.db = self.original_db
+
+    def get(self, *paths):
+        async def scenario():
+            transport = httpx.ASGITransport(app=web_app.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return [await client.get(path) for path in paths]
+        return asyncio.run(scenario())
+
+    def test_requests_are_recorded_by_route_with_db_round_trips(self):
+        before = metrics.HTTP_DB_QUERIES.labels("/api/logs")
+        count_before, sum_before = before.count, before.sum
+
+        logs, scrape = self.get("/api/logs?limit=5", "/metrics")
+        self.assertEqual(logs.status_code, 200)
+        self.assertEqual(scrape.status_code, 200)
+        self.assertTrue(scrape.headers["content-type"].startswith("text/plain"))
+
+        self.assertEqual(before.count, count_before + 1)
+        self.assertGreaterEqual(before.sum - sum_before, 1)
+        text = scrape.text
+        self.assertIn('greenpulse_http_request_duration_seconds_count{method="GET",route="/api/logs",status="200"}', text)
+        self.assertIn('greenpulse_db_pool_connections{state="in_use"} 1', text)
+        self.assertIn('greenpulse_cache_hit_ratio{cache="weather"}', text)
+        self.assertIn('greenpulse_feedback_queue_depth', text)
+
+if __name__ == '__main__':
+    unittest.main()
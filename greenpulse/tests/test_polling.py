@@ -0,0 +1,63 @@
+import unittest
+import sys
+import os
+from datetime import datetime
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from polling import PollingPlanner
+
+NOW = datetime(2026, 7, 1, 10, 0)
+DRY = {"temperature": 25, "humidity": 50, "wind_speed": 1, "rain_amount": 0}
+
+
+def details(et_per_hour, threshold=5, interval_hours=1.0):
+    return {"et_adjusted": et_per_hour * interval_hours, "interval_hours": interval_hours,
+            "min_watering_amount": threshold}
+
+
+class TestPollingPlanner(unittest.TestCase):
+    def setUp(self):
+        self.planner = PollingPlanner(60, floor_min=15, ceiling_min=180)
+        self.zone = {"id": "front", "force_daily_watering": False}
+
+    def plan(self, deficit, zone_details, current=DRY, forecast_rain=0):
+        return self.planner.plan([(self.zone, deficit, zone_details)], current,
+                                 {"total_rain_next_24h": forecast_rain}, NOW)
+
+    def test_quiet_day_backs_off_to_ceiling(self):
+        minutes, reason = self.plan(0.0, details(0.1))
+        self.assertEqual(minutes, 180)
+        self.assertIn("threshold in ~50.0 h", reason)
+
+    def test_polls_more_often_near_threshold(self):
+        # 1 mm left at 0.25 mm/h: threshold in 4 h, checked again after half of it
+        minutes, reason = self.plan(4.0, details(0.25))
+        self.assertEqual(minutes, 120)
+        minutes, _ = self.plan(4.9, details(0.25))
+        self.assertEqual(minutes, 15)
+
+    def test_rain(self):
+        self.assertEqual(self.plan(0.0, details(0.1), forecast_rain=2)[0], 60)
+        self.assertEqual(self.plan(0.0, details(0.1), current=dict(DRY, rain_amount=0.4))[0], 15)
+        # Above the threshold the forecast decides whether watering is held back
+        minutes, reason = self.plan(8.0, details(0.2), forecast_rain=4.5)
+        self.assertEqual(minutes, 15)
+        self.assertIn("hold limit", reason)
+        self.assertEqual(self.plan(8.0, details(0.2))[0], 60)
+
+    def test_missing_weather_keeps_base_interval(self):
+        self.assertEqual(self.planner.plan([(self.zone, 3.0, {})], None, None, NOW),
+                         (60, "weather data missing, base interval"))
+
+    def test_earliest_zone_decides(self):
+        back = {"id": "back", "force_daily_watering": True}
+        minutes, reason = self.planner.plan([(self.zone, 0.0, details(0.1)), (back, 0.0, details(0.0))],
+                                            DRY, {"total_rain_next_24h": 0}, datetime(2026, 7, 1, 23, 30))
+        self.assertEqual(minutes, 31)
+        self.assertTrue(reason.startswith("back: forced watering"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from query_log import QueryLog, fingerprint
+
+
+class TestFingerprint(unittest.TestCase):
+    def test_literals_and_placeholders_are_normalized(self):
+        self.assertEqual(
+            fingerprint("SELECT *\n  FROM irrigation_logs WHERE zone_id = %s AND event_type = 'manual' LIMIT 50"),
+            "SELECT * FROM irrigation_logs WHERE zone_id = ? AND event_type = ? LIMIT ?")
+
+    def test_value_lists_collapse(self):
+        self.assertEqual(fingerprint("SELECT a FROM t WHERE id IN (%s, %s, %s)"),
+                         fingerprint("SELECT a FROM t WHERE id IN (1, 2)"))
+        self.assertEqual(fingerprint("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)"),
+                         "INSERT INTO t (a, b) VALUES (?+), ...")
+
+
+class TestQueryLog(unittest.TestCase):
+    def test_top_orders_by_total_time(self):
+        log = QueryLog(slow_threshold_ms=0)
+        for _ in range(3):
+            log.record("SELECT a FROM t WHERE id = %s", 10.0, 1)
+        log.record("SELECT b FROM u", 25.0, 100)
+
+        report = log.top(limit=5)
+        self.assertEqual([entry["statement"] for entry in report["top"]],
+                         ["SELECT a FROM t WHERE id = ?", "SELECT b FROM u"])
+        self.assertEqual(report["top"][0]["calls"], 3)
+        self.assertEqual(report["top"][0]["avg_ms"], 10.0)
+        self.assertEqual(log.top(sort="max_ms")["top"][0]["statement"], "SELECT b FROM u")
+
+    def test_slow_statements_are_explained_once_per_interval(self):
+        log = QueryLog(slow_threshold_ms=100, explain_interval=300)
+        self.assertFalse(log.record("SELECT a FROM t", 50.0, 1))
+        self.assertTrue(log.record("SELECT a FROM t", 150.0, 1))
+        self.assertFalse(log.record("SELECT a FROM t", 150.0, 1))
+        self.assertFalse(log.record("INSERT INTO t (a) VALUES (%s)", 500.0, 1))
+
+        log.record_plan("SELECT a FROM t", 150.0, 1, [{"table": "t", "type": "ALL", "rows": 90000}])
+        report = log.top()
+        by_statement = {entry["statement"]: entry for entry in report["top"]}
+        self.assertEqual(by_statement["SELECT a FROM t"]["slow"], 2)
+        self.assertEqual(len(report["recent_slow"]), 3)
+        self.assertEqual(report["recent_slow"][0]["plan"][0]["type"], "ALL")
+
+    def test_distinct_statements_are_bounded(self):
+        log = QueryLog(max_statements=2)
+        for table in ("a", "b", "c", "d"):
+            log.record(f"SELECT x FROM {table}", 1.0, 0)
+        report = log.top()
+        self.assertEqual(report["statements"], 2)
+        self.assertEqual(report["untracked"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
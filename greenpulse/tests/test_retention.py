@@ -0,0 +1,123 @@
+import unittest
+import sys
+import os
+
+# Add benchmarks and src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../benchmarks')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from datetime import datetime, timedelta
+from fakes import import_with_database
+from standins import SQLiteDatabase
+from database import Database
+
+# retention imports the `db` singleton; the tests pass their own database instead
+retention, = import_with_database(None, "retention")
+SuggestionArchiver = retention.SuggestionArchiver
+
+
+class ArchivingDatabase:
+    """Holds `pending` old suggestion rows, each 1000 bytes of live table."""
+
+    def __init__(self, pending):
+        self.pending = pending
+        self.batches = []
+        self.analyzed = False
+
+    def archive_suggestions(self, cutoff, limit):
+        count = min(limit, self.pending)
+        self.pending -= count
+        if count:
+            self.batches.append(count)
+        return count, count * 400
+
+    def table_sizes(self, *tables):
+        return {
+            "irrigation_logs": {"data_bytes": 1000 * self.pending + 5000, "index_bytes": 0, "free_bytes": 0},
+            "suggestion_archive": {"data_bytes": 0, "index_bytes": 0, "free_bytes": 0}
+        }
+
+    def analyze_tables(self, *tables):
+        self.analyzed = True
+
+
+class TestSuggestionArchiver(unittest.TestCase):
+    def test_moves_in_batches_and_reports_space(self):
+        database = ArchivingDatabase(pending=1200)
+        report = SuggestionArchiver(database, keep_days=30, batch_size=500, pause=0).run()
+
+        self.assertEqual(database.batches, [500, 500, 200])
+        self.assertTrue(database.analyzed)
+        self.assertEqual(report["rows_archived"], 1200)
+        self.assertTrue(report["complete"])
+        self.assertEqual(report["payload_bytes_dropped"], 1200 * 400)
+        self.assertEqual(report["live_bytes_before"] - report["live_bytes_after"], 1200 * 1000)
+        self.assertEqual(report["reclaimed_bytes"], 1200 * 1000)
+
+    def test_run_is_bounded_and_resumes(self):
+        database = ArchivingDatabase(pending=1200)
+        archiver = SuggestionArchiver(database, batch_size=500, pause=0, max_batches=2)
+        self.assertFalse(archiver.run()["complete"])
+        report = archiver.run()
+        self.assertEqual(report["rows_archived"], 200)
+        self.assertEqual(database.pending, 0)
+
+    def test_nothing_to_do(self):
+        database = ArchivingDatabase(pending=0)
+        report = SuggestionArchiver(database, pause=0).run()
+        self.assertEqual(report["rows_archived"], 0)
+        self.assertFalse(database.analyzed)
+
+
+class TestArchiveAndRebuild(unittest.TestCase):
+    """The real Database statements, run on the SQLite stand-in."""
+
+    def summary(self, db):
+        with db.cursor() as cursor:
+            cursor.execute("SELECT * FROM daily_summary ORDER BY zone_id, day")
+            return cursor.fetchall()
+
+    def test_rebuild_keeps_archived_days(self):
+        db = SQLiteDatabase()
+        db.seed(10)
+        Database.rebuild_daily_summary(db)
+        expected = self.summary(db)
+
+        cutoff = (datetime.now() - timedelta(days=4)).replace(hour=0, minute=0, second=0, microsecond=0)
+        # Small batches leave a day split between the two tables on the way
+        while Database.archive_suggestions(db, cutoff, 50)[0]:
+            Database.rebuild_daily_summary(db)
+            self.assertEqual(self.summary(db), expected)
+        self.assertGreater(db.count("suggestion_archive"), 100)
+        self.assertEqual(db.count("irrigation_logs", f"event_type = 'suggestion' AND timestamp < '{cutoff}'"), 0)
+
+        Database.rebuild_daily_summary(db)
+        self.assertEqual(self.summary(db), expected)
+        archived_day = (cutoff - timedelta(days=2)).strftime("%Y-%m-%d")
+        self.assertEqual(Database.rebuild_daily_summary(db, archived_day, archived_day), 1)
+        self.assertEqual(self.summary(db), expected)
+
+    def test_archived_days_stay_on_the_hourly_chart(self):
+        db = SQLiteDatabase()
+        db.seed(10)
+        changes = []
+        db.add_change_listener(lambda table, day: changes.append((table, day)))
+        charts, = import_with_database(db, "web.charts")
+        cutoff = (datetime.now() - timedelta(days=4)).replace(hour=0, minute=0, second=0, microsecond=0)
+        from_date = (cutoff - timedelta(days=3)).strftime("%Y-%m-%d")
+        to_date = (cutoff + timedelta(days=1)).strftime("%Y-%m-%d")
+        expected = charts.load_chart_data(from_date, to_date)
+        self.assertEqual(expected["deficit_resolution"], "hourly")
+        self.assertEqual(len(expected["deficit"]["t"]), 5 * 24)
+
+        while Database.archive_suggestions(db, cutoff, 500)[0]:
+            pass
+        self.assertEqual(charts.load_chart_data(from_date, to_date), expected)
+        self.assertEqual(len(charts.load_chart_data(from_date, to_date, "raw")["deficit"]["t"]), 5 * 24)
+        # Cached charts of the archived days are dropped
+        self.assertIn(("suggestion_archive", from_date), changes)
+        self.assertNotIn(("suggestion_archive", to_date), changes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+import sys
+import os
+import time
+import asyncio
+import threading
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from scheduler import Job, Scheduler
+
+
+class TestJobSchedule(unittest.TestCase):
+    def scheduled(self, job, now):
+        job.schedule_after(now)
+        return job.next_run
+
+    def test_first_run_immediately_or_after_interval(self):
+        self.assertEqual(self.scheduled(Job("a", None, 60, run_immediately=True), 1000), 1000)
+        self.assertEqual(self.scheduled(Job("a", None, 60), 1000), 1060)
+
+    def test_missed_runs_are_coalesced_on_the_grid(self):
+        job = Job("a", None, 60)
+        job.schedule_after(1000)          # due 1060
+        job.schedule_after(1060 + 250)    # stalled over four slots
+        self.assertEqual(job.due, 1360)
+        self.assertEqual(job.missed, 4)
+
+    def test_clock_jumping_back_restarts_grid(self):
+        job = Job("a", None, 60)
+        job.schedule_after(10_000)
+        job.schedule_after(5_000)
+        self.assertEqual(job.due, 5_060)
+
+    def test_jitter_only_delays(self):
+        job = Job("a", None, 60, jitter=5)
+        for now in (1000, 1060, 1120):
+            job.schedule_after(now)
+            self.assertGreaterEqual(job.next_run, job.due)
+            self.assertLessEqual(job.next_run, job.due + 5)
+        self.assertEqual(job.due, 1180)
+
+    def test_set_interval_moves_next_run_from_current_slot(self):
+        job = Job("a", None, 60)
+        job.schedule_after(1000)          # slot 1000, next due 1060
+        job.set_interval(600, 1010)
+        self.assertEqual(job.next_run, 1600)
+        job.set_interval(5, 1010)         # never in the past
+        self.assertEqual(job.next_run, 1010)
+
+
+class TestScheduler(unittest.TestCase):
+    def run_for(self, scheduler, seconds):
+        async def scenario():
+            scheduler.start()
+            await asyncio.sleep(seconds)
+            await scheduler.stop()
+        asyncio.run(scenario())
+
+    def test_jobs_run_and_report_status(self):
+        scheduler = Scheduler()
+        calls = []
+        scheduler.add_job("fast", lambda: calls.append(time.monotonic()), 0.1, run_immediately=True)
+        self.run_for(scheduler, 0.35)
+
+        self.assertGreaterEqual(len(calls), 3)
+        status, = scheduler.status()["jobs"]
+        self.assertEqual(status["name"], "fast")
+        self.assertEqual(status["runs"], len(calls))
+        self.assertIsNotNone(status["next_run"])
+        self.assertIsNotNone(status["last_duration_s"])
+
+    def test_slow_job_never_overlaps(self):
+        scheduler = Scheduler()
+        active = []
+        overlaps = []
+        lock = threading.Lock()
+
+        def slow():
+            with lock:
+                if active:
+                    overlaps.append(True)
+                active.append(1)
+            time.sleep(0.25)
+            with lock:
+                active.pop()
+
+        scheduler.add_job("slow", slow, 0.05, run_immediately=True)
+        self.run_for(scheduler, 0.4)
+        status, = scheduler.status()["jobs"]
+        self.assertEqual(overlaps, [])
+        self.assertGreater(status["skipped"], 0)
+
+    def test_job_can_change_its_own_interval(self):
+        scheduler = Scheduler()
+        calls = []
+
+        def adaptive():
+            calls.append(1)
+            scheduler.set_interval("adaptive", 10, "quiet")
+        scheduler.add_job("adaptive", adaptive, 0.05, run_immediately=True)
+        self.run_for(scheduler, 0.3)
+        status, = scheduler.status()["jobs"]
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(status["interval_s"], 10)
+        self.assertEqual(status["interval_reason"], "quiet")
+
+    def test_failures_are_recorded(self):
+        scheduler = Scheduler()
+
+        def broken():
+            raise RuntimeError("boom")
+        scheduler.add_job("broken", broken, 10, run_immediately=True)
+        self.run_for(scheduler, 0.1)
+        status, = scheduler.status()["jobs"]
+        self.assertEqual(status["failures"], 1)
+        self.assertEqual(status["last_error"], "boom")
+
+
+if __name__ == '__main__':
+    unittest.main()
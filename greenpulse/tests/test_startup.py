@@ -0,0 +1,46 @@
+import unittest
+import sys
+import os
+import asyncio
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from startup import Startup
+
+
+class TestStartup(unittest.TestCase):
+    def test_probe_is_retried_with_backoff_until_ready(self):
+        startup = Startup(required=("database",), expected=("database",))
+        attempts = []
+
+        def probe():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise ConnectionError("refused")
+            return True
+
+        self.assertEqual(startup.status()["status"], "warming_up")
+        asyncio.run(startup.wait_for("database", probe, initial_delay=0.01, max_delay=0.02))
+
+        status = startup.status()
+        self.assertTrue(startup.ready)
+        self.assertEqual(status["status"], "ready")
+        self.assertEqual(status["phases"]["database"]["attempts"], 3)
+        self.assertIsNone(status["phases"]["database"]["error"])
+
+    def test_optional_phases_do_not_block_readiness(self):
+        startup = Startup(required=("database",))
+        startup.begin("mqtt")
+        startup.complete("database")
+        self.assertTrue(startup.ready)
+        self.assertFalse(startup.status()["phases"]["mqtt"]["done"])
+
+        startup.complete("mqtt")
+        first = startup.status()["phases"]["mqtt"]["duration_s"]
+        startup.complete("mqtt")  # reconnects do not move the timing
+        self.assertEqual(startup.status()["phases"]["mqtt"]["duration_s"], first)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import sys
+import os
+import time
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from weather import WeatherService
+
+
+class SlowService(WeatherService):
+    """WeatherService whose OWM calls are replaced by fixed-latency fakes."""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.calls = []
+        self.stored_days = {}
+
+    def _get_json(self, path, **params):
+        self.calls.append(path)
+        time.sleep(self.delay)
+        if path.endswith("day_summary"):
+            return {"temperature": {"max": 25, "min": 12}, "precipitation": {"total": 1.5}}
+        if path.endswith("forecast"):
+            return {"list": [{"main": {"temp": 20, "humidity": 60}, "rain": {"3h": 1.0}}] * 8}
+        return {"main": {"temp": 21, "humidity": 55}, "wind": {"speed": 3}}
+
+    # weather_history stand-in
+    def _load_history(self, dates):
+        return {d: self.stored_days[d] for d in dates if d in self.stored_days}
+
+    def _store_history(self, day):
+        self.stored_days[day['date']] = day
+
+
+class TestFetchAll(unittest.TestCase):
+    def test_calls_run_concurrently(self):
+        service = SlowService(delay=0.3)
+        start = time.monotonic()
+        result = service.fetch_all(history_days=3)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(len(service.calls), 5)
+        # Five sequential calls would take 1.5s
+        self.assertLess(elapsed, 0.9)
+        self.assertEqual(result.current['temperature'], 21)
+        self.assertEqual(result.forecast['total_rain_next_24h'], 8.0)
+        self.assertEqual(len(result.history), 3)
+        self.assertEqual(result.history[0]['precipitation'], 1.5)
+
+    def test_slow_calls_are_reported_missing(self):
+        service = SlowService(delay=0.5)
+        service.fetch_timeout = 0.1
+        result = service.fetch_all(history_days=1)
+        self.assertIsNone(result.current)
+        self.assertIsNone(result.forecast)
+        self.assertEqual(result.history, [])
+
+
+class TestWeatherCache(unittest.TestCase):
+    def test_fresh_entries_are_reused(self):
+        service = SlowService(delay=0)
+        service.get_current_weather()
+        service.get_current_weather()
+        service.get_forecast()
+        self.assertEqual(service.calls.count("/data/2.5/weather"), 1)
+        stats = service.cache_stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 2)
+
+    def test_concurrent_misses_share_one_call(self):
+        service = SlowService(delay=0.2)
+        futures = [service._executor.submit(service.get_forecast) for _ in range(4)]
+        results = [f.result() for f in futures]
+        self.assertEqual(service.calls.count("/data/2.5/forecast"), 1)
+        self.assertTrue(all(r == results[0] for r in results))
+
+    def test_stale_entry_served_while_refreshing(self):
+        service = SlowService(delay=0.2)
+        service.cache_ttl["current"] = 0.1
+        first = service.get_current_weather()
+        time.sleep(0.15)
+
+        start = time.monotonic()
+        stale = service.get_current_weather()
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertEqual(stale, first)
+        self.assertEqual(service.cache_stats()["stale_hits"], 1)
+
+        # A caller that needs fresh data waits for the running refresh
+        service.get_current_weather(allow_stale=False)
+        self.assertEqual(service.calls.count("/data/2.5/weather"), 2)
+
+
+class TestHistoryLookup(unittest.TestCase):
+    def test_known_days_are_not_fetched_again(self):
+        service = SlowService(delay=0)
+        service.fetch_all(history_days=3)
+        service.fetch_all(history_days=3)
+        self.assertEqual(service.calls.count("/data/3.0/onecall/day_summary"), 3)
+        self.assertEqual(service.cache_stats()["history"]["memory"], 3)
+
+    def test_days_stored_in_db_are_not_fetched(self):
+        service = SlowService(delay=0)
+        service.stored_days["2026-01-01"] = {'date': "2026-01-01", 'precipitation': 4.0}
+        days = service.get_history_days(["2026-01-01", "2026-01-02"])
+        self.assertEqual(days["2026-01-01"]['precipitation'], 4.0)
+        self.assertEqual(days["2026-01-02"]['precipitation'], 1.5)
+        self.assertEqual(service.calls.count("/data/3.0/onecall/day_summary"), 1)
+        self.assertIn("2026-01-02", service.stored_days)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,230 @@
+import unittest
+import sys
+import os
+import time
+import asyncio
+from collections import defaultdict
+
+from fakes import FakeDatabase, import_with_database
+
+import httpx
+
+# web.app needs a `db` object; use an in-memory stand-in instead of MariaDB
+fake_db = FakeDatabase()
+web_app, web_logs = import_with_database(fake_db, "web.app", "web.logs")
+
+
+async def timed_get(client, path):
+    start = time.monotonic()
+    response = await client.get(path)
+    return response, time.monotonic() - start
+
+
+class TestEventLoopNotBlocked(unittest.TestCase):
+    def setUp(self):
+        web_app.db = fake_db
+        fake_db.delay = 0
+        self.original_current = web_app.weather_service.get_current_weather
+        self.original_forecast = web_app.weather_service.get_forecast
+
+    def tearDown(self):
+        web_app.weather_service.get_current_weather = self.original_current
+        web_app.weather_service.get_forecast = self.original_forecast
+
+    def run_requests(self, paths):
+        async def scenario():
+            transport = httpx.ASGITransport(app=web_app.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(*(timed_get(client, p) for p in paths))
+        return asyncio.run(scenario())
+
+    def test_slow_backend_does_not_delay_other_requests(self):
+        def slow_weather(*args):
+            time.sleep(1.0)
+            return None
+        web_app.weather_service.get_current_weather = slow_weather
+        web_app.weather_service.get_forecast = slow_weather
+        fake_db.delay = 1.0
+
+        (dashboard, dashboard_time), (logs, logs_time) = self.run_requests(["/", "/api/logs"])
+
+        self.assertEqual(dashboard.status_code, 200)
+        self.assertEqual(logs.status_code, 200)
+        self.assertGreaterEqual(logs_time, 1.0)
+        # The dashboard is rendered from memory, without DB or OWM calls
+        self.assertLess(dashboard_time, 0.5)
+
+    def test_parallel_requests_are_not_serialized(self):
+        fake_db.delay = 0.3
+        results = self.run_requests(["/api/logs"] * 4)
+        self.assertTrue(all(r.status_code == 200 for r, _ in results))
+        # Four serialized requests would need 1.2s
+        self.assertLess(max(t for _, t in results), 0.9)
+
+
+class TestChartCache(unittest.TestCase):
+    def setUp(self):
+        web_app.db = fake_db
+        fake_db.delay = 0
+        fake_db.one_row = defaultdict(lambda: None)
+        web_app.chart_cache.invalidate()
+
+    def tearDown(self):
+        fake_db.one_row = None
+
+    def get(self, path, headers=None):
+        async def scenario():
+            transport = httpx.ASGITransport(app=web_app.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.get(path, headers=headers)
+        return asyncio.run(scenario())
+
+    def test_past_range_is_served_from_cache(self):
+        path = "/api/chart-data?from_date=2025-01-01&to_date=2025-12-31"
+        first = self.get(path)
+        queries = fake_db.queries
+        second = self.get(path)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(fake_db.queries, queries)
+        self.assertIn("Last-Modified", second.headers)
+
+    def test_if_none_match_returns_304(self):
+        path = "/api/chart-data?from_date=2025-01-01&to_date=2025-01-31"
+        etag = self.get(path).headers["ETag"]
+        response = self.get(path, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_write_inside_range_invalidates(self):
+        path = "/api/chart-data?from_date=2025-01-01&to_date=2025-01-31"
+        self.get(path)
+        fake_db.notify_change("weather_history", "2025-03-01")
+        queries = fake_db.queries
+        self.get(path)
+        self.assertEqual(fake_db.queries, queries)
+
+        fake_db.notify_change("weather_history", "2025-01-15")
+        self.get(path)
+        self.assertGreater(fake_db.queries, queries)
+
+
+class TestLogsApi(unittest.TestCase):
+    def setUp(self):
+        web_app.db = fake_db
+        fake_db.delay = 0
+
+    def tearDown(self):
+        fake_db.rows = []
+
+    def test_cursor_round_trip(self):
+        from datetime import datetime
+        encode_cursor, decode_cursor = web_logs.encode_cursor, web_logs.decode_cursor
+        cursor = encode_cursor({"timestamp": datetime(2026, 5, 4, 13, 54, 5), "id": 1234})
+        self.assertEqual(decode_cursor(cursor), (datetime(2026, 5, 4, 13, 54, 5), 1234))
+
+    def test_page_has_next_cursor_and_seeks_past_it(self):
+        from datetime import datetime, timedelta
+        load_logs = web_logs.load_logs
+        start = datetime(2026, 5, 4, 12, 0, 0)
+        fake_db.rows = [{"id": 100 - i, "timestamp": start - timedelta(hours=i), "event_type": "suggestion"}
+                        for i in range(3)]
+
+        page = load_logs(limit=2, event_types=["suggestion"])
+        self.assertEqual(len(page["items"]), 2)
+        self.assertIsNotNone(page["next_cursor"])
+        query, params = fake_db.last_query
+        self.assertNotIn("raw_data", query)
+        self.assertEqual(params[-1], 3)
+
+        fake_db.rows = fake_db.rows[2:]
+        page = load_logs(limit=2, cursor=page["next_cursor"])
+        query, params = fake_db.last_query
+        self.assertIn("timestamp < %s OR (timestamp = %s AND id < %s)", query)
+        self.assertEqual(params[:3], (start - timedelta(hours=1), start - timedelta(hours=1), 99))
+        self.assertIsNone(page["next_cursor"])
+
+    def test_invalid_filters_are_rejected(self):
+        async def scenario():
+            transport = httpx.ASGITransport(app=web_app.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(
+                    client.get("/api/logs?event_type=bogus"),
+                    client.get("/api/logs?cursor=not-a-cursor")
+                )
+        for response in asyncio.run(scenario()):
+            self.assertEqual(response.status_code, 400)
+
+
+class TestWarmingUp(unittest.TestCase):
+    def setUp(self):
+        web_app.db = fake_db
+        self.original_startup = web_app.startup
+        self.original_current = web_app.weather_service.get_current_weather
+        self.original_forecast = web_app.weather_service.get_forecast
+        web_app.weather_service.get_current_weather = lambda *args: None
+        web_app.weather_service.get_forecast = lambda *args: None
+
+    def tearDown(self):
+        web_app.startup = self.original_startup
+        web_app.weather_service.get_current_weather = self.original_current
+        web_app.weather_service.get_forecast = self.original_forecast
+
+    def get(self, path):
+        async def scenario():
+            transport = httpx.ASGITransport(app=web_app.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.get(path)
+        return asyncio.run(scenario())
+
+    def test_dashboard_and_health_before_and_after_database(self):
+        from startup import Startup
+        web_app.startup = Startup()
+        queries = fake_db.queries
+
+        health = self.get("/api/health")
+        self.assertEqual(health.status_code, 503)
+        self.assertEqual(health.json()["status"], "warming_up")
+        dashboard = self.get("/")
+        self.assertEqual(dashboard.status_code, 200)
+        self.assertIn("Indítás folyamatban", dashboard.text)
+        self.assertEqual(fake_db.queries, queries)
+
+        web_app.startup.complete("database")
+        self.assertEqual(self.get("/api/health").status_code, 200)
+        dashboard = self.get("/")
+        self.assertNotIn("Indítás folyamatban", dashboard.text)
+        self.assertEqual(fake_db.queries, queries)
+
+
+class TestBacktestLimits(unittest.TestCase):
+    def test_oversized_grid_is_rejected_before_expanding(self):
+        grid = {name: [str(value) for value in range(50)] for name in ("et_correction_factor", "min_watering_amount",
+                                                                        "max_watering_amount", "shade_percentage")}
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=web_app.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post("/api/backtest", json={"grid": grid})
+        start = time.monotonic()
+        response = asyncio.run(scenario())
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(web_app.MAX_BACKTEST_SCENARIOS), response.json()["detail"])
+        # 50 ** 4 combinations would take seconds to build and validate
+        self.assertLess(time.monotonic() - start, 0.5)
+
+
+class TestChartResolution(unittest.TestCase):
+    def test_auto_resolution(self):
+        from web.charts import pick_resolution
+        self.assertEqual(pick_resolution("2026-05-01", "2026-05-30"), ("daily", "hourly"))
+        self.assertEqual(pick_resolution("2025-05-01", "2026-04-30"), ("daily", "daily"))
+        self.assertEqual(pick_resolution("2021-01-01", "2026-01-01"), ("weekly", "weekly"))
+
+    def test_explicit_resolution(self):
+        from web.charts import pick_resolution
+        self.assertEqual(pick_resolution("2021-01-01", "2026-01-01", "hourly"), ("hourly", "hourly"))
+
+
+if __name__ == '__main__':
+    unittest.main()